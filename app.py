@@ -1,6 +1,5 @@
 # portada.py  (o incluir al inicio de app.py)
 import streamlit as st
-import pandas as pd
 # Links a las fuentes
 LINK_DELITOS = "https://data.buenosaires.gob.ar/dataset/delitos"
 LINK_COMUNAS = "https://data.buenosaires.gob.ar/dataset/comunas"
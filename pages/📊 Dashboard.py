@@ -1,10 +1,11 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-from utils.data_loader import load_data, filter_data
+from utils.data_loader import load_data, load_metadata, filter_data, COLUMNAS_ANALISIS
+from utils.anomalies import detect_anomalies, UMBRAL_Z
+from utils.profiles import NIVELES, profiles_for_level, profile_matrix, similar_units
 from utils.geo_utils import load_geojson
+from utils.ui_utils import render_download, render_validation_report
+from utils.charts import bar_chart, line_chart, heatmap_chart, DIAS_ORDEN, MESES_ORDEN
 
 # Configuración de la página
 st.set_page_config(page_title="Dashboard de Delitos CABA", page_icon="📊", layout="wide")
@@ -14,6 +15,7 @@ st.title("📊 Dashboard de Análisis de Delitos - CABA 2024")
 COLOR_PRIMARIO = "#1f77b4"  # Azul
 COLOR_SECUNDARIO = "#2c3e50"  # Gris oscuro
 COLOR_ACENTO = "#e74c3c"  # Rojo
+ESCALA_COLORES = [COLOR_PRIMARIO, COLOR_ACENTO]
 
 # Estilos CSS personalizados
 st.markdown(f"""
@@ -59,16 +61,19 @@ st.markdown(f"""
 </style>
 """, unsafe_allow_html=True)
 
-# Cargar datos
-df = load_data()
+# Cargar datos (sólo las columnas que usa la página: sin coordenadas)
+df = load_data(COLUMNAS_ANALISIS)
 
 if df is not None:
+    # Opciones de los filtros desde la metadata precalculada (sin recorrer el dataset)
+    metadata = load_metadata()
+    
     # Sidebar con filtros
     with st.sidebar:
         st.markdown("### 🔍 Filtros")
         
         # Selector de tipo de delito
-        tipos_delito = sorted(df['tipo'].unique().tolist())
+        tipos_delito = metadata['dimensiones']['tipo']['valores']
         selected_tipos = st.multiselect(
             "Tipos de delito", 
             tipos_delito, 
@@ -77,7 +82,7 @@ if df is not None:
         )
         
         # Selector de comuna
-        comunas = sorted(df['comuna'].unique().tolist())
+        comunas = metadata['dimensiones']['comuna']['valores']
         selected_comunas = st.multiselect(
             "Comunas", 
             comunas, 
@@ -86,8 +91,8 @@ if df is not None:
         )
         
         # Selector de rango de fechas
-        min_date = df['fecha'].min().date()
-        max_date = df['fecha'].max().date()
+        min_date = metadata['fecha_min']
+        max_date = metadata['fecha_max']
         
         fecha_rango = st.date_input(
             "Rango de fechas",
@@ -116,17 +121,20 @@ if df is not None:
             (df['comuna'].isin(selected_comunas))
         ]
     
+    # Identifica el contenido de df_filtered (para las descargas)
+    filtros = (tuple(selected_tipos), tuple(selected_comunas), tuple(fecha_rango))
+    
     # Cálculos para los nuevos KPIs
     # Día con más delitos
-    dia_mas_delitos = df_filtered.groupby('dia')['cantidad'].sum().reset_index()
+    dia_mas_delitos = df_filtered.groupby('dia', observed=True)['cantidad'].sum().reset_index()
     dia_mas_delitos = dia_mas_delitos.sort_values('cantidad', ascending=False).iloc[0]
     
     # Franja horaria con más delitos
-    franja_mas_delitos = df_filtered.groupby('franja')['cantidad'].sum().reset_index()
+    franja_mas_delitos = df_filtered.groupby('franja', observed=True)['cantidad'].sum().reset_index()
     franja_mas_delitos = franja_mas_delitos.sort_values('cantidad', ascending=False).iloc[0]
     
     # Barrio con más delitos
-    barrio_mas_delitos = df_filtered.groupby('barrio')['cantidad'].sum().reset_index()
+    barrio_mas_delitos = df_filtered.groupby('barrio', observed=True)['cantidad'].sum().reset_index()
     barrio_mas_delitos = barrio_mas_delitos.sort_values('cantidad', ascending=False).iloc[0]
     
     # KPIs principales
@@ -179,39 +187,47 @@ if df is not None:
     with col1:
         # Gráfico de barras por tipo de delito (reemplaza el de torta)
         st.markdown("#### Por Tipo de Delito")
-        delitos_por_tipo = df_filtered.groupby('tipo')['cantidad'].sum().reset_index()
-        delitos_por_tipo = delitos_por_tipo.sort_values('cantidad', ascending=False)
+        delitos_por_tipo = df_filtered.groupby('tipo', observed=True)['cantidad'].sum().sort_values(ascending=False)
         
-        fig_barras_tipo = px.bar(
-            delitos_por_tipo, 
-            x='tipo', 
-            y='cantidad', 
-            title='Distribución por Tipo de Delito',
-            labels={'tipo': 'Tipo de Delito', 'cantidad': 'Cantidad de Delitos'},
-            color='cantidad',
-            color_continuous_scale=[COLOR_PRIMARIO, COLOR_ACENTO]
+        fig_barras_tipo = bar_chart(
+            delitos_por_tipo.index,
+            delitos_por_tipo.values,
+            'Distribución por Tipo de Delito',
+            'Tipo de Delito', 'Cantidad de Delitos',
+            escala=ESCALA_COLORES,
+            tickangle=45
         )
-        fig_barras_tipo.update_xaxes(tickangle=45)
         st.plotly_chart(fig_barras_tipo, use_container_width=True)
     
     with col2:
         # Gráfico de barras por comuna
         st.markdown("#### Por Comuna")
-        df_comuna = df_filtered.groupby('comuna')['cantidad'].sum().reset_index()
-        df_comuna = df_comuna.sort_values('cantidad', ascending=False)
+        df_comuna = df_filtered.groupby('comuna', observed=True)['cantidad'].sum().sort_values(ascending=False)
         
-        fig_comuna = px.bar(
-            df_comuna, 
-            x='comuna', 
-            y='cantidad', 
-            title='Delitos por Comuna',
-            labels={'comuna': 'Comuna', 'cantidad': 'Cantidad de Delitos'},
-            color='cantidad',
-            color_continuous_scale=[COLOR_PRIMARIO, COLOR_ACENTO]
+        fig_comuna = bar_chart(
+            df_comuna.index,
+            df_comuna.values,
+            'Delitos por Comuna',
+            'Comuna', 'Cantidad de Delitos',
+            escala=ESCALA_COLORES,
+            tickangle=45
         )
-        fig_comuna.update_xaxes(tickangle=45)
         st.plotly_chart(fig_comuna, use_container_width=True)
     
+    # Días atípicos de las series (comuna, tipo) seleccionadas, a partir de
+    # las líneas de base incrementales (ver utils/anomalies.py)
+    anomalias = detect_anomalies()
+    if anomalias is not None:
+        anomalias = anomalias[
+            anomalias['tipo'].isin(selected_tipos) &
+            anomalias['comuna'].isin(selected_comunas)
+        ]
+        if len(fecha_rango) == 2:
+            anomalias = anomalias[
+                (anomalias['fecha'] >= pd.to_datetime(fecha_inicio)) &
+                (anomalias['fecha'] <= pd.to_datetime(fecha_fin))
+            ]
+    
     # Segunda fila: Análisis temporal
     st.markdown("---")
     st.markdown("### 📅 Análisis Temporal")
@@ -227,25 +243,47 @@ if df is not None:
         # Agregar media móvil de 7 días
         df_temporal['media_movil'] = df_temporal['cantidad'].rolling(window=7).mean()
         
-        fig_temporal = px.line(
-            df_temporal, 
-            x='fecha', 
-            y='cantidad', 
-            title='Evolución Diaria de Delitos',
-            labels={'fecha': 'Fecha', 'cantidad': 'Cantidad de Delitos'},
-            color_discrete_sequence=[COLOR_PRIMARIO]
+        fig_temporal = line_chart(
+            df_temporal['fecha'],
+            df_temporal['cantidad'],
+            'Evolución Diaria de Delitos',
+            'Fecha', 'Cantidad de Delitos',
+            color=COLOR_PRIMARIO
         )
         
+        # Trazas como dicts, igual que en utils/charts.py: la página no
+        # importa plotly
         fig_temporal.add_trace(
-            go.Scatter(
-                x=df_temporal['fecha'], 
-                y=df_temporal['media_movil'],
+            dict(
+                type='scatter',
+                x=df_temporal['fecha'].to_numpy(), 
+                y=df_temporal['media_movil'].to_numpy(),
                 mode='lines',
                 name='Media Móvil (7 días)',
                 line=dict(color=COLOR_ACENTO, dash='dash')
             )
         )
         
+        # Marcar los días con alguna serie atípica sobre el total del día
+        if anomalias is not None and not anomalias.empty:
+            detalle = anomalias.assign(
+                texto=anomalias['comuna'].map('Comuna {}'.format) + ' · ' + anomalias['tipo']
+                + ': ' + anomalias['cantidad'].astype(str) + ' (esperado ' + anomalias['esperado'].astype(str) + ')'
+            ).groupby('fecha')['texto'].agg('<br>'.join)
+            dias_atipicos = df_temporal.set_index('fecha')['cantidad'].reindex(detalle.index)
+            fig_temporal.add_trace(
+                dict(
+                    type='scatter',
+                    x=dias_atipicos.index.to_numpy(),
+                    y=dias_atipicos.to_numpy(),
+                    mode='markers',
+                    name='Día atípico',
+                    marker=dict(color='red', size=9, symbol='x'),
+                    text=detalle.to_numpy(),
+                    hovertemplate='%{x|%d/%m/%Y}<br>%{text}<extra></extra>'
+                )
+            )
+        
         st.plotly_chart(fig_temporal, use_container_width=True)
     
     with col2:
@@ -253,8 +291,7 @@ if df is not None:
         st.markdown("#### Por Día y Franja Horaria")
         
         # Crear matriz de datos para el heatmap
-        dias_orden = ['LUNES', 'MARTES', 'MIÉRCOLES', 'JUEVES', 'VIERNES', 'SÁBADO', 'DOMINGO']
-        df_heatmap = df_filtered.groupby(['dia', 'franja'])['cantidad'].sum().reset_index()
+        df_heatmap = df_filtered.groupby(['dia', 'franja'], observed=True)['cantidad'].sum().reset_index()
         
         # Convertir a formato de matriz
         heatmap_data = pd.pivot_table(
@@ -262,22 +299,95 @@ if df is not None:
             values='cantidad', 
             index='dia', 
             columns='franja', 
-            fill_value=0
+            fill_value=0,
+            observed=True
         )
         
         # Reordenar los días
-        heatmap_data = heatmap_data.reindex(dias_orden)
+        heatmap_data = heatmap_data.reindex(DIAS_ORDEN)
         
-        fig_heatmap = px.imshow(
-            heatmap_data,
-            labels=dict(x="Franja Horaria", y="Día de la Semana", color="Cantidad de Delitos"),
-            title="Distribución por Día y Franja Horaria",
-            aspect="auto",
-            color_continuous_scale=[COLOR_PRIMARIO, COLOR_ACENTO]
+        fig_heatmap = heatmap_chart(
+            heatmap_data.to_numpy(),
+            heatmap_data.columns,
+            heatmap_data.index,
+            "Distribución por Día y Franja Horaria",
+            "Franja Horaria", "Día de la Semana", "Cantidad de Delitos",
+            escala=ESCALA_COLORES
         )
         
         st.plotly_chart(fig_heatmap, use_container_width=True)
     
+    # Zonas con patrón temporal parecido (perfiles precalculados de todo el
+    # dataset, ver utils/profiles.py). Es un fragmento: cambiar la zona no
+    # recalcula el resto del dashboard
+    st.markdown("---")
+    st.markdown("### 🧭 Zonas con Patrón Temporal Similar")
+    
+    @st.fragment
+    def render_similares():
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            nivel = st.radio("Nivel", list(NIVELES), horizontal=True, key="similares_nivel")
+        perfiles = profiles_for_level(nivel)
+        if perfiles is None:
+            st.info("No hay datos para calcular los perfiles temporales.")
+            return
+        with col2:
+            unidad = st.selectbox(nivel, perfiles['unidades'], key="similares_unidad")
+        with col3:
+            k = st.slider("Cantidad", 3, 20, 8, key="similares_k")
+        
+        st.caption(
+            "Similitud coseno entre los perfiles día x franja (normalizados) de todo el período: "
+            "1 es el mismo patrón semanal, sin importar el volumen."
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(f"#### Perfil de {nivel} {unidad}")
+            perfil = profile_matrix(perfiles, unidad)
+            st.plotly_chart(
+                heatmap_chart(
+                    perfil.to_numpy(), perfil.columns, perfil.index,
+                    f"Perfil temporal - {unidad}",
+                    "Franja Horaria", "Día de la Semana", "Peso relativo",
+                    escala=ESCALA_COLORES
+                ),
+                use_container_width=True
+            )
+        with col2:
+            st.markdown("#### Más parecidos")
+            st.dataframe(
+                similar_units(perfiles, unidad, k).rename(columns={
+                    'unidad': nivel, 'similitud': 'Similitud', 'delitos': 'Delitos'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+    
+    render_similares()
+    
+    # Días atípicos (tabla)
+    st.markdown("---")
+    st.markdown("### 🚨 Días Atípicos")
+    if anomalias is None:
+        st.info("No hay datos suficientes para calcular las líneas de base.")
+    elif anomalias.empty:
+        st.success("No se detectaron días atípicos para los filtros seleccionados.")
+    else:
+        st.caption(
+            f"Días en que una serie (comuna, tipo) se desvió al menos {UMBRAL_Z:g} desvíos "
+            "de su línea de base para ese día de la semana."
+        )
+        st.dataframe(
+            anomalias.sort_values('z', key=abs, ascending=False).rename(columns={
+                'fecha': 'Fecha', 'comuna': 'Comuna', 'tipo': 'Tipo', 'cantidad': 'Delitos',
+                'esperado': 'Esperado', 'z': 'Desvío (z)'
+            }),
+            use_container_width=True,
+            hide_index=True,
+            column_config={'Fecha': st.column_config.DateColumn(format="DD/MM/YYYY")}
+        )
+    
     # Tercera fila: Análisis detallado
     st.markdown("---")
     st.markdown("### 🔍 Análisis Detallado")
@@ -287,70 +397,63 @@ if df is not None:
     with col1:
         # Top 10 barrios
         st.markdown("#### Top 10 Barrios")
-        df_barrio = df_filtered.groupby('barrio')['cantidad'].sum().reset_index()
-        df_barrio = df_barrio.sort_values('cantidad', ascending=False).head(10)
+        df_barrio = df_filtered.groupby('barrio', observed=True)['cantidad'].sum().sort_values(ascending=False).head(10)
         
-        fig_barrio = px.bar(
-            df_barrio, 
-            x='barrio', 
-            y='cantidad', 
-            title='Top 10 Barrios con Más Delitos',
-            labels={'barrio': 'Barrio', 'cantidad': 'Cantidad de Delitos'},
-            color='cantidad',
-            color_continuous_scale=[COLOR_PRIMARIO, COLOR_ACENTO]
+        fig_barrio = bar_chart(
+            df_barrio.index,
+            df_barrio.values,
+            'Top 10 Barrios con Más Delitos',
+            'Barrio', 'Cantidad de Delitos',
+            escala=ESCALA_COLORES,
+            tickangle=45
         )
-        fig_barrio.update_xaxes(tickangle=45)
         st.plotly_chart(fig_barrio, use_container_width=True)
     
     with col2:
         # Distribución por mes
         st.markdown("#### Por Mes")
-        df_mes = df_filtered.groupby('mes')['cantidad'].sum().reset_index()
+        df_mes = df_filtered.groupby('mes', observed=True)['cantidad'].sum()
         
         # Ordenar meses cronológicamente
-        meses_orden = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 
-                      'JULIO', 'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
-        df_mes['mes'] = pd.Categorical(df_mes['mes'], categories=meses_orden, ordered=True)
-        df_mes = df_mes.sort_values('mes')
+        df_mes = df_mes.reindex([m for m in MESES_ORDEN if m in df_mes.index])
         
-        fig_mes = px.bar(
-            df_mes, 
-            x='mes', 
-            y='cantidad', 
-            title='Distribución Mensual de Delitos',
-            labels={'mes': 'Mes', 'cantidad': 'Cantidad de Delitos'},
-            color='cantidad',
-            color_continuous_scale=[COLOR_PRIMARIO, COLOR_ACENTO]
+        fig_mes = bar_chart(
+            df_mes.index,
+            df_mes.values,
+            'Distribución Mensual de Delitos',
+            'Mes', 'Cantidad de Delitos',
+            escala=ESCALA_COLORES
         )
         st.plotly_chart(fig_mes, use_container_width=True)
     
     # Cuarta fila: Datos tabulares
-    st.markdown("---")
-    st.markdown("### 📋 Datos Detallados")
-    
-    # Resumen por tipo y comuna
-    st.markdown("#### Resumen por Tipo y Comuna")
-    resumen = df_filtered.groupby(['tipo', 'comuna'])['cantidad'].sum().reset_index()
-    resumen = resumen.sort_values('cantidad', ascending=False)
-    
-    # Formatear la tabla
-    resumen_formateado = resumen.copy()
-    resumen_formateado['cantidad'] = resumen_formateado['cantidad'].apply(lambda x: f"{x:,}")
-    
-    st.dataframe(
-        resumen_formateado.head(15),
-        use_container_width=True,
-        height=400
-    )
-    
-    # Opción para descargar datos
-    csv = resumen.to_csv(index=False)
-    st.download_button(
-        label="📥 Descargar Datos Resumidos",
-        data=csv,
-        file_name="resumen_delitos.csv",
-        mime="text/csv"
-    )
+    # Fragmento: la descarga re-ejecuta sólo esta sección, no toda la página
+    @st.fragment
+    def render_datos_detallados(df_filtered, filtros):
+        st.markdown("---")
+        st.markdown("### 📋 Datos Detallados")
+    
+        # Resumen por tipo y comuna
+        st.markdown("#### Resumen por Tipo y Comuna")
+        resumen = df_filtered.groupby(['tipo', 'comuna'], observed=True)['cantidad'].sum().reset_index()
+        resumen = resumen.sort_values('cantidad', ascending=False)
+    
+        # Formatear la tabla
+        resumen_formateado = resumen.copy()
+        resumen_formateado['cantidad'] = resumen_formateado['cantidad'].apply(lambda x: f"{x:,}")
+    
+        st.dataframe(
+            resumen_formateado.head(15),
+            use_container_width=True,
+            height=400
+        )
+    
+        # Opción para descargar datos (resumen y filas filtradas)
+        st.markdown("#### Descargas")
+        render_download(resumen, "resumen_delitos", "resumen", filtros, "📥 Descargar Datos Resumidos")
+        render_download(df_filtered, "delitos_filtrados", "filtrados", filtros)
+    
+    render_datos_detallados(df_filtered, filtros)
     
     # Información del dataset
     with st.expander("ℹ️ Información del Dataset"):
@@ -360,6 +463,8 @@ if df is not None:
         - **Tipos de delito incluidos:** {', '.join(selected_tipos)}
         - **Comunas incluidas:** {', '.join(map(str, selected_comunas))}
         """)
+        st.markdown("**Validación al cargar el dataset**")
+        render_validation_report(metadata.get('validacion'))
     
 else:
     st.error("No se pudieron cargar los datos de delitos. Verifica que el archivo esté en la ubicación correcta.")
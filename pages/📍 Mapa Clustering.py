@@ -1,37 +1,43 @@
 import streamlit as st
-import pandas as pd
-import folium
-from streamlit_folium import st_folium
-import plotly.express as px
-from datetime import datetime
-from utils.data_loader import load_data, filter_data
+from utils.data_loader import load_data, load_metadata, filter_data, barrios_de_comuna, COLUMNAS_ANALISIS, COLUMNAS_COORDENADAS
 from utils.geo_utils import load_geojson
-from folium.plugins import MarkerCluster
-import random
+from utils.maps import build_cluster_map, build_dbscan_map, build_tiles_map
+from utils.tiles import TILES_URL
+from utils.clustering import clusters_for_filters
+from utils.jobs import await_job
+from utils.ui_utils import render_kpis, render_chart_sections, render_raw_data, render_download
 
 # Configuración de la página
 st.set_page_config(page_title="Mapa de Clusters", page_icon="📍", layout="wide")
 st.title("📍 Mapa de Clusters de Delitos")
 
-# Cargar datos
-df = load_data()
+# Cargar datos: la misma proyección por columnas que usan los trabajos en
+# segundo plano, así el proceso no guarda además el CSV completo
+df = load_data(COLUMNAS_ANALISIS + COLUMNAS_COORDENADAS)
 geojson = load_geojson('data/caba.json')
 
 if df is not None and geojson is not None:
+    # Opciones de los filtros desde la metadata precalculada (sin recorrer el dataset)
+    metadata = load_metadata()
+    
     # Sidebar con filtros
     st.sidebar.header("Filtros")
     
     # Selector de tipo de delito - sin "Todos" por defecto
-    tipos_delito = sorted(df['tipo'].unique().tolist())
+    tipos_delito = metadata['dimensiones']['tipo']['valores']
     selected_tipo = st.sidebar.selectbox("Tipo de delito", tipos_delito, index=0)
     
     # Selector de comuna
-    comunas = ["Todas"] + sorted(df['comuna'].unique().tolist())
+    comunas = ["Todas"] + metadata['dimensiones']['comuna']['valores']
     selected_comuna = st.sidebar.selectbox("Comuna", comunas, index=0)
     
+    # Selector de barrio (en cascada: sólo los barrios de la comuna elegida)
+    barrios = ["Todos"] + barrios_de_comuna(metadata, selected_comuna)
+    selected_barrio = st.sidebar.selectbox("Barrio", barrios, index=0)
+    
     # Selector de rango de fechas
-    min_date = df['fecha'].min().date()
-    max_date = df['fecha'].max().date()
+    min_date = metadata['fecha_min']
+    max_date = metadata['fecha_max']
     
     fecha_rango = st.sidebar.date_input(
         "Rango de fechas",
@@ -41,39 +47,22 @@ if df is not None and geojson is not None:
     )
     
     # Aplicar filtros
-    if len(fecha_rango) == 2:
-        fecha_inicio, fecha_fin = fecha_rango
-        df_filtered = filter_data(df, selected_tipo, selected_comuna, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
-    else:
-        df_filtered = filter_data(df, selected_tipo, selected_comuna)
-    
-    # Mostrar resumen
-    st.header("Resumen")
-    col1, col2, col3, col4 = st.columns(4)
+    fecha_inicio, fecha_fin = fecha_rango if len(fecha_rango) == 2 else (None, None)
+    df_filtered = filter_data(df, selected_tipo, selected_comuna, selected_barrio, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     
-    with col1:
-        st.metric("Total de delitos", df_filtered['cantidad'].sum())
+    # Filtros aplicados: entradas declaradas de los fragmentos de la página
+    filtros = (selected_tipo, selected_comuna, selected_barrio, tuple(fecha_rango))
     
-    with col2:
-        st.metric("Tipos de delitos", df_filtered['tipo'].nunique())
-    
-    with col3:
-        st.metric("Barrios afectados", df_filtered['barrio'].nunique())
-    
-    with col4:
-        st.metric("Comunas afectadas", df_filtered['comuna'].nunique())
+    # Mostrar resumen
+    render_kpis(df_filtered)
     
     st.markdown("---")
     
-    # Crear mapa con Folium y clustering
     st.header("Mapa de Clusters")
     
-    # Verificar que tenemos coordenadas válidas
-    if df_filtered[['latitud', 'longitud']].isnull().values.any():
-        st.warning("Algunos registros no tienen coordenadas válidas y no se mostrarán en el mapa.")
-        df_map = df_filtered.dropna(subset=['latitud', 'longitud'])
-    else:
-        df_map = df_filtered.copy()
+    # Las coordenadas ya se validaron al cargar el dataset (todas dentro de
+    # CABA): no hace falta volver a chequearlas en cada rerun
+    df_map = df_filtered
     
     # Muestrear datos si hay demasiados puntos para mejorar el rendimiento
     #max_points = 2000  # Límite de puntos para mantener buen rendimiento
@@ -81,155 +70,84 @@ if df is not None and geojson is not None:
         #st.info(f"Se muestrearon {max_points} de {len(df_map)} registros para mejorar el rendimiento del mapa.")
         #df_map = df_map.sample(n=max_points, random_state=42)
     
-    # Crear mapa centrado en CABA
-    m = folium.Map(location=[-34.6037, -58.3816], zoom_start=11)
-    
-    # Agregar capa GeoJSON con los límites de las comunas (transparente con borde azul)
-    folium.GeoJson(
-        geojson,
-        style_function=lambda feature: {
-            'fillColor': 'blue',
-            'color': 'blue',
-            'weight': 2,
-            'fillOpacity': 0.1,  # Muy transparente
-            'opacity': 0.7
-        },
-        tooltip=folium.GeoJsonTooltip(
-            fields=['nombre'],
-            aliases=['Comuna:'],
-            localize=True
-        ),
-        name="Límites de Comunas"
-    ).add_to(m)
-    
-    # Agregar clustering
-    marker_cluster = MarkerCluster(
-        options={
-            'maxClusterRadius': 50,  # Radio máximo para clustering
-            'disableClusteringAtZoom': 18  # Desactivar clustering a alto zoom
-        }
-    ).add_to(m)
-    
-    # Colores por tipo de delito
-    colores = {
-        'Hurto': 'red',
-        'Robo': 'blue',
-        'Lesiones': 'green',
-        'Homicidio': 'black',
-        'Violencia': 'orange',
-        'Otros': 'gray'
-    }
-    
-    # Función para obtener color según tipo de delito
-    def obtener_color(tipo):
-        for key, color in colores.items():
-            if key in tipo:
-                return color
-        return 'purple'  # Color por defecto
-    
-    # Agregar marcadores al cluster
-    for idx, row in df_map.iterrows():
-        # Crear popup con información
-        popup_text = f"""
-        <b>Tipo:</b> {row['tipo']}<br>
-        <b>Barrio:</b> {row['barrio']}<br>
-        <b>Comuna:</b> {row['comuna']}<br>
-        <b>Fecha:</b> {row['fecha'].strftime('%Y-%m-%d')}<br>
-        <b>Franja:</b> {row['franja']}<br>
-        <b>Cantidad:</b> {row['cantidad']}
-        """
+    # El mapa y su control forman un fragmento: cambiar la fuente re-ejecuta
+    # sólo el mapa. Todo lo que usa llega por argumento
+    @st.fragment
+    def render_map(df_map, geojson, filtros):
+        from streamlit_folium import st_folium
+        
+        # Fuente de los puntos del mapa: embebidos en el HTML o vector tiles
+        # servidos por `python -m utils.tiles serve` (escala a cualquier volumen)
+        fuente = st.radio("Fuente de puntos", ["Embebidos en el mapa", "Vector tiles (servidor)"], horizontal=True)
         
-        # Agregar marcador al cluster
-        folium.Marker(
-            location=[row['latitud'], row['longitud']],
-            popup=folium.Popup(popup_text, max_width=300),
-            tooltip=row['tipo'],
-            icon=folium.Icon(color=obtener_color(row['tipo']), icon='info-sign')
-        ).add_to(marker_cluster)
-    
-    # Agregar control de capas
-    folium.LayerControl().add_to(m)
-    
-    # Mostrar el mapa usando st_folium
-    map_data = st_folium(m, width=1000, height=600, returned_objects=[])
-    
-    # Gráficos (igual que en el panel descriptivo)
-    st.header("Análisis Temporal")
-    
-    # Frecuencia por mes
-    st.subheader("Frecuencia por Mes")
-    df_mes = df_filtered.groupby('mes').agg({'cantidad': 'sum'}).reset_index()
-    
-    # Ordenar meses cronológicamente
-    meses_orden = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 
-                  'JULIO', 'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
-    df_mes['mes'] = pd.Categorical(df_mes['mes'], categories=meses_orden, ordered=True)
-    df_mes = df_mes.sort_values('mes')
-    
-    fig_mes = px.bar(df_mes, x='mes', y='cantidad', 
-                     title=f'Delitos por Mes - {selected_tipo}')
-    st.plotly_chart(fig_mes, use_container_width=True)
-    
-    # Frecuencia por franja horaria
-    st.subheader("Frecuencia por Franja Horaria")
-    df_hora = df_filtered.groupby('franja').agg({'cantidad': 'sum'}).reset_index()
-    df_hora = df_hora.sort_values('franja')
-    
-    fig_hora = px.bar(df_hora, x='franja', y='cantidad', 
-                      title=f'Delitos por Franja Horaria - {selected_tipo}')
-    st.plotly_chart(fig_hora, use_container_width=True)
-    
-    # Frecuencia por día de la semana
-    st.subheader("Frecuencia por Día de la Semana")
-    dias_orden = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES', 'SABADO', 'DOMINGO']
-    df_dia = df_filtered.groupby('dia').agg({'cantidad': 'sum'}).reset_index()
-    df_dia['dia'] = pd.Categorical(df_dia['dia'], categories=dias_orden, ordered=True)
-    df_dia = df_dia.sort_values('dia')
-    
-    fig_dia = px.bar(df_dia, x='dia', y='cantidad', 
-                     title=f'Delitos por Día de la Semana - {selected_tipo}')
-    st.plotly_chart(fig_dia, use_container_width=True)
-    
-    # Serie temporal mensual
-    st.subheader("Evolución Mensual")
-    df_evolucion = df_filtered.groupby(['mes']).agg({'cantidad': 'sum'}).reset_index()
-    
-    # Ordenar meses cronológicamente
-    df_evolucion['mes'] = pd.Categorical(df_evolucion['mes'], categories=meses_orden, ordered=True)
-    df_evolucion = df_evolucion.sort_values('mes')
-    
-    fig_evolucion = px.line(df_evolucion, x='mes', y='cantidad', 
-                            title=f'Evolución Mensual de Delitos - {selected_tipo}')
-    st.plotly_chart(fig_evolucion, use_container_width=True)
-    
-    # Análisis Geográfico
-    st.header("Análisis Geográfico")
-    
-    # Frecuencia por comuna
-    st.subheader("Frecuencia por Comuna")
-    df_comuna = df_filtered.groupby('comuna').agg({'cantidad': 'sum'}).reset_index()
-    df_comuna = df_comuna.sort_values('cantidad', ascending=False)
-    
-    fig_comuna = px.bar(df_comuna, x='comuna', y='cantidad', 
-                        title=f'Delitos por Comuna - {selected_tipo}',
-                        labels={'comuna': 'Comuna', 'cantidad': 'Cantidad de Delitos'})
-    st.plotly_chart(fig_comuna, use_container_width=True)
-    
-    # Frecuencia por barrio (top 15 para mejor visualización)
-    st.subheader("Frecuencia por Barrio (Top 15)")
-    df_barrio = df_filtered.groupby('barrio').agg({'cantidad': 'sum'}).reset_index()
-    df_barrio = df_barrio.sort_values('cantidad', ascending=False).head(15)
-    
-    fig_barrio = px.bar(df_barrio, x='barrio', y='cantidad', 
-                        title=f'Delitos por Barrio (Top 15) - {selected_tipo}',
-                        labels={'barrio': 'Barrio', 'cantidad': 'Cantidad de Delitos'})
-    fig_barrio.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig_barrio, use_container_width=True)
+        if fuente.startswith("Vector"):
+            st.caption(f"Teselas desde {TILES_URL}")
+            m = build_tiles_map(TILES_URL, geojson, filtros)
+        else:
+            # El mapa de marcadores se arma en segundo plano con progreso; un
+            # cambio de filtros cancela el armado anterior
+            m = await_job(
+                "mapa", ("mapa_clusters",) + filtros, build_cluster_map, df_map, geojson, filtros,
+                etiqueta="Construyendo el mapa..."
+            )
+            if m is None:
+                return
+        st_folium(m, width=1000, height=600, returned_objects=[])
+    
+    render_map(df_map, geojson, filtros)
+    
+    # Clusters analíticos: se calculan sólo al abrir la sección y los
+    # parámetros re-ejecutan únicamente este fragmento
+    @st.fragment
+    def render_dbscan(geojson, filtros, fecha_inicio, fecha_fin, tipos_delito):
+        selected_tipo, selected_comuna, selected_barrio, _ = filtros
+        
+        st.header("Clusters analíticos (DBSCAN)")
+        if not st.checkbox("Detectar clusters de densidad", key="dbscan_abierto"):
+            return
+        
+        # Cada tipo se agrupa por separado (en paralelo): un cluster nunca
+        # mezcla tipos de delito
+        tipos = st.multiselect("Tipos de delito", tipos_delito, default=[selected_tipo])
+        if not tipos:
+            st.info("Elegí al menos un tipo de delito.")
+            return
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            eps = st.slider("Radio de vecindad (metros)", 25, 500, 100, step=25)
+        with col2:
+            min_samples = st.slider("Mínimo de delitos por núcleo", 3, 100, 20)
+        
+        parametros = (tuple(tipos), eps, min_samples)
+        resultado = await_job(
+            "dbscan", ("dbscan",) + filtros + parametros, clusters_for_filters,
+            tuple(tipos), selected_comuna, selected_barrio,
+            fecha_inicio, fecha_fin, eps=eps, min_samples=min_samples,
+            etiqueta="Detectando clusters..."
+        )
+        if resultado is None:
+            return
+        resumen, envolventes = resultado
+        if resumen.empty:
+            st.info("No se encontraron clusters con estos parámetros.")
+            return
+        
+        from streamlit_folium import st_folium
+        
+        st.metric("Clusters detectados", len(resumen))
+        m = build_dbscan_map(envolventes, geojson, filtros + parametros)
+        st_folium(m, width=1000, height=500, returned_objects=[])
+        st.dataframe(resumen, use_container_width=True, hide_index=True)
+        render_download(resumen, "clusters_dbscan", "dbscan", filtros + parametros, "📥 Descargar clusters")
+    
+    render_dbscan(geojson, filtros, fecha_inicio, fecha_fin, tipos_delito)
+    
+    # Gráficos en secciones diferidas: sólo se calculan al abrirlas
+    render_chart_sections(df_filtered, selected_tipo, filtros, "clustering")
     
     # Mostrar datos crudos
-    if st.checkbox("Mostrar datos crudos"):
-        st.subheader("Datos Crudos")
-        st.dataframe(df_filtered)
+    render_raw_data(df_filtered, filtros)
 else:
     if df is None:
         st.error("No se pudieron cargar los datos de delitos. Verifica que el archivo esté en la ubicación correcta.")
@@ -1,37 +1,44 @@
 import streamlit as st
-import pandas as pd
-import folium
-from streamlit_folium import st_folium
-import plotly.express as px
-from datetime import datetime
-from utils.data_loader import load_data, filter_data
-from utils.geo_utils import load_geojson
-from folium.plugins import HeatMap
-import random
+from utils.data_loader import load_data, load_metadata, filter_data, barrios_de_comuna, COLUMNAS_ANALISIS, COLUMNAS_COORDENADAS
+from utils.geo_utils import load_geojson, grid_counts_for_filters, RESOLUCIONES_GRILLA
+from utils.maps import build_heat_map, build_grid_map, build_kde_map, build_hotspot_map, build_tiles_map
+from utils.tiles import TILES_URL
+from utils.kde import kde_for_filters
+from utils.hotspots import hotspots_for_filters
+from utils.jobs import await_job
+from utils.ui_utils import render_kpis, render_chart_sections, render_raw_data
 
 # Configuración de la página
 st.set_page_config(page_title="Mapa de Intensidad", page_icon="🔥", layout="wide")
 st.title("🔥 Mapa de Intensidad de Delitos")
 
-# Cargar datos
-df = load_data()
+# Cargar datos: la misma proyección por columnas que usan los trabajos en
+# segundo plano, así el proceso no guarda además el CSV completo
+df = load_data(COLUMNAS_ANALISIS + COLUMNAS_COORDENADAS)
 geojson = load_geojson('data/caba.json')
 
 if df is not None and geojson is not None:
+    # Opciones de los filtros desde la metadata precalculada (sin recorrer el dataset)
+    metadata = load_metadata()
+    
     # Sidebar con filtros
     st.sidebar.header("Filtros")
     
     # Selector de tipo de delito
-    tipos_delito = sorted(df['tipo'].unique().tolist())
+    tipos_delito = metadata['dimensiones']['tipo']['valores']
     selected_tipo = st.sidebar.selectbox("Tipo de delito", tipos_delito, index=0)
     
     # Selector de comuna
-    comunas = ["Todas"] + sorted(df['comuna'].unique().tolist())
+    comunas = ["Todas"] + metadata['dimensiones']['comuna']['valores']
     selected_comuna = st.sidebar.selectbox("Comuna", comunas, index=0)
     
+    # Selector de barrio (en cascada: sólo los barrios de la comuna elegida)
+    barrios = ["Todos"] + barrios_de_comuna(metadata, selected_comuna)
+    selected_barrio = st.sidebar.selectbox("Barrio", barrios, index=0)
+    
     # Selector de rango de fechas
-    min_date = df['fecha'].min().date()
-    max_date = df['fecha'].max().date()
+    min_date = metadata['fecha_min']
+    max_date = metadata['fecha_max']
     
     fecha_rango = st.sidebar.date_input(
         "Rango de fechas",
@@ -41,84 +48,96 @@ if df is not None and geojson is not None:
     )
     
     # Aplicar filtros
-    if len(fecha_rango) == 2:
-        fecha_inicio, fecha_fin = fecha_rango
-        df_filtered = filter_data(df, selected_tipo, selected_comuna, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
-    else:
-        df_filtered = filter_data(df, selected_tipo, selected_comuna)
-    
-    # Mostrar resumen
-    st.header("Resumen")
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric("Total de delitos", df_filtered['cantidad'].sum())
-    
-    with col2:
-        st.metric("Tipos de delitos", df_filtered['tipo'].nunique())
+    fecha_inicio, fecha_fin = fecha_rango if len(fecha_rango) == 2 else (None, None)
+    df_filtered = filter_data(df, selected_tipo, selected_comuna, selected_barrio, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     
-    with col3:
-        st.metric("Barrios afectados", df_filtered['barrio'].nunique())
+    # Filtros aplicados: entradas declaradas de los fragmentos de la página
+    filtros = (selected_tipo, selected_comuna, selected_barrio, tuple(fecha_rango))
     
-    with col4:
-        st.metric("Comunas afectadas", df_filtered['comuna'].nunique())
+    # Mostrar resumen
+    render_kpis(df_filtered)
     
     st.markdown("---")
     
-    # Crear mapa de intensidad (heatmap)
     st.header("Mapa de Intensidad (Heatmap)")
     
-    # Verificar que tenemos coordenadas válidas
-    if df_filtered[['latitud', 'longitud']].isnull().values.any():
-        st.warning("Algunos registros no tienen coordenadas válidas y no se mostrarán en el mapa.")
-        df_map = df_filtered.dropna(subset=['latitud', 'longitud'])
-    else:
-        df_map = df_filtered.copy()
-    
-    # Crear mapa centrado en CABA
-    m = folium.Map(location=[-34.6037, -58.3816], zoom_start=11)
-    
-    # Agregar capa GeoJSON con los límites de las comunas (transparente con borde azul)
-    folium.GeoJson(
-        geojson,
-        style_function=lambda feature: {
-            'fillColor': 'blue',
-            'color': 'blue',
-            'weight': 2,
-            'fillOpacity': 0.1,
-            'opacity': 0.7
-        },
-        tooltip=folium.GeoJsonTooltip(
-            fields=['nombre'],
-            aliases=['Comuna:'],
-            localize=True
-        ),
-        name="Límites de Comunas"
-    ).add_to(m)
-    
-    # Preparar datos para el heatmap
-    # Crear una lista de puntos [lat, lng, weight] donde weight es la cantidad de delitos
-    heat_data = []
-    for idx, row in df_map.iterrows():
-        # Repetir el punto según la cantidad de delitos para intensificar el calor
-        for _ in range(row['cantidad']):
-            heat_data.append([row['latitud'], row['longitud']])
-    
-    # Agregar el heatmap al mapa
-    HeatMap(
-        heat_data,
-        min_opacity=0.2,
-        max_zoom=18,
-        radius=15,
-        blur=15,
-        gradient={0.4: 'blue', 0.65: 'lime', 1: 'red'}
-    ).add_to(m)
-    
-    # Agregar control de capas
-    folium.LayerControl().add_to(m)
-    
-    # Mostrar el mapa usando st_folium
-    map_data = st_folium(m, width=1000, height=600, returned_objects=[])
+    # Las coordenadas ya se validaron al cargar el dataset (todas dentro de
+    # CABA): no hace falta volver a chequearlas en cada rerun
+    df_map = df_filtered
+    
+    # El mapa y sus controles forman un fragmento: cambiar la capa o la
+    # resolución re-ejecuta sólo el mapa. Todo lo que usa llega por argumento
+    @st.fragment
+    def render_map(df_map, geojson, filtros, fecha_inicio, fecha_fin):
+        from streamlit_folium import st_folium
+        
+        selected_tipo, selected_comuna, selected_barrio, _ = filtros
+        
+        # Capa del mapa: heatmap de puntos o grilla espacial agregada
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            capa = st.radio(
+                "Visualización",
+                ["Heatmap", "Densidad KDE (servidor)", "Grilla hexagonal", "Grilla cuadrada", "Hotspots (Gi*)",
+                 "Puntos (vector tiles)"],
+                horizontal=True
+            )
+        resolucion = None
+        with col2:
+            if capa.startswith("Grilla") or capa.startswith("Hotspots"):
+                resolucion = st.selectbox("Resolución de la grilla", list(RESOLUCIONES_GRILLA), index=1)
+            elif capa.startswith("Densidad"):
+                resolucion = st.slider("Ancho de banda (metros)", 100, 1000, 300, step=50)
+        filtros = filtros + (capa, resolucion)
+        
+        if capa == "Heatmap":
+            m = build_heat_map(df_map, geojson, filtros)
+        elif capa.startswith("Densidad"):
+            # Densidad calculada en el servidor: se envía una imagen de tamaño fijo
+            densidad = await_job(
+                "mapa", ("kde",) + filtros, kde_for_filters,
+                selected_tipo, selected_comuna, selected_barrio,
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, bandwidth=resolucion,
+                etiqueta="Calculando densidad..."
+            )
+            if densidad is None:
+                return
+            m = build_kde_map(densidad, geojson, filtros)
+        elif capa.startswith("Hotspots"):
+            tamano = RESOLUCIONES_GRILLA[resolucion]
+            hotspots = hotspots_for_filters(
+                selected_tipo, selected_comuna, selected_barrio,
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, tamano=tamano
+            )
+            m = build_hotspot_map(hotspots, geojson, filtros, tamano)
+        elif capa.startswith("Puntos"):
+            # Teselas servidas por `python -m utils.tiles serve`: el navegador
+            # descarga sólo las visibles
+            st.caption(f"Teselas desde {TILES_URL}")
+            m = build_tiles_map(TILES_URL, geojson, filtros[:4])
+        else:
+            # La grilla se arma con la celda precalculada de cada fila: no se
+            # vuelven a proyectar las coordenadas
+            forma = 'hex' if capa == "Grilla hexagonal" else 'cuadrada'
+            tamano = RESOLUCIONES_GRILLA[resolucion]
+            grid_counts = grid_counts_for_filters(
+                tamano, forma, selected_tipo, selected_comuna, selected_barrio,
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+            )
+            m = build_grid_map(grid_counts, geojson, filtros, tamano, forma)
+        st_folium(m, width=1000, height=600, returned_objects=[])
+        
+        if capa.startswith("Hotspots"):
+            # Ranking de celdas: las de mayor Gi* primero
+            st.subheader("Ranking de hotspots (Getis-Ord Gi*)")
+            ranking = hotspots[hotspots['categoria'].str.startswith('Hotspot')]
+            st.dataframe(
+                ranking[['barrio', 'comuna', 'cantidad', 'z', 'p_valor', 'categoria']].head(50),
+                use_container_width=True,
+                hide_index=True
+            )
+    
+    render_map(df_map, geojson, filtros, fecha_inicio, fecha_fin)
     
     # Información sobre el heatmap
     with st.expander("ℹ️ - Información sobre el mapa de calor"):
@@ -131,83 +150,11 @@ if df is not None and geojson is not None:
         La intensidad se calcula en base a la concentración de delitos en cada área.
         """)
     
-    # Gráficos (igual que en los mapas anteriores)
-    st.header("Análisis Temporal")
-    
-    # Frecuencia por mes
-    st.subheader("Frecuencia por Mes")
-    df_mes = df_filtered.groupby('mes').agg({'cantidad': 'sum'}).reset_index()
-    
-    # Ordenar meses cronológicamente
-    meses_orden = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 
-                  'JULIO', 'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
-    df_mes['mes'] = pd.Categorical(df_mes['mes'], categories=meses_orden, ordered=True)
-    df_mes = df_mes.sort_values('mes')
-    
-    fig_mes = px.bar(df_mes, x='mes', y='cantidad', 
-                     title=f'Delitos por Mes - {selected_tipo}')
-    st.plotly_chart(fig_mes, use_container_width=True)
-    
-    # Frecuencia por franja horaria
-    st.subheader("Frecuencia por Franja Horaria")
-    df_hora = df_filtered.groupby('franja').agg({'cantidad': 'sum'}).reset_index()
-    df_hora = df_hora.sort_values('franja')
-    
-    fig_hora = px.bar(df_hora, x='franja', y='cantidad', 
-                      title=f'Delitos por Franja Horaria - {selected_tipo}')
-    st.plotly_chart(fig_hora, use_container_width=True)
-    
-    # Frecuencia por día de la semana
-    st.subheader("Frecuencia por Día de la Semana")
-    dias_orden = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES', 'SABADO', 'DOMINGO']
-    df_dia = df_filtered.groupby('dia').agg({'cantidad': 'sum'}).reset_index()
-    df_dia['dia'] = pd.Categorical(df_dia['dia'], categories=dias_orden, ordered=True)
-    df_dia = df_dia.sort_values('dia')
-    
-    fig_dia = px.bar(df_dia, x='dia', y='cantidad', 
-                     title=f'Delitos por Día de la Semana - {selected_tipo}')
-    st.plotly_chart(fig_dia, use_container_width=True)
-    
-    # Serie temporal mensual
-    st.subheader("Evolución Mensual")
-    df_evolucion = df_filtered.groupby(['mes']).agg({'cantidad': 'sum'}).reset_index()
-    
-    # Ordenar meses cronológicamente
-    df_evolucion['mes'] = pd.Categorical(df_evolucion['mes'], categories=meses_orden, ordered=True)
-    df_evolucion = df_evolucion.sort_values('mes')
-    
-    fig_evolucion = px.line(df_evolucion, x='mes', y='cantidad', 
-                            title=f'Evolución Mensual de Delitos - {selected_tipo}')
-    st.plotly_chart(fig_evolucion, use_container_width=True)
-    
-    # Análisis Geográfico
-    st.header("Análisis Geográfico")
-    
-    # Frecuencia por comuna
-    st.subheader("Frecuencia por Comuna")
-    df_comuna = df_filtered.groupby('comuna').agg({'cantidad': 'sum'}).reset_index()
-    df_comuna = df_comuna.sort_values('cantidad', ascending=False)
-    
-    fig_comuna = px.bar(df_comuna, x='comuna', y='cantidad', 
-                        title=f'Delitos por Comuna - {selected_tipo}',
-                        labels={'comuna': 'Comuna', 'cantidad': 'Cantidad de Delitos'})
-    st.plotly_chart(fig_comuna, use_container_width=True)
-    
-    # Frecuencia por barrio (top 15 para mejor visualización)
-    st.subheader("Frecuencia por Barrio (Top 15)")
-    df_barrio = df_filtered.groupby('barrio').agg({'cantidad': 'sum'}).reset_index()
-    df_barrio = df_barrio.sort_values('cantidad', ascending=False).head(15)
-    
-    fig_barrio = px.bar(df_barrio, x='barrio', y='cantidad', 
-                        title=f'Delitos por Barrio (Top 15) - {selected_tipo}',
-                        labels={'barrio': 'Barrio', 'cantidad': 'Cantidad de Delitos'})
-    fig_barrio.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig_barrio, use_container_width=True)
+    # Gráficos en secciones diferidas: sólo se calculan al abrirlas
+    render_chart_sections(df_filtered, selected_tipo, filtros, "intensidad")
     
     # Mostrar datos crudos
-    if st.checkbox("Mostrar datos crudos"):
-        st.subheader("Datos Crudos")
-        st.dataframe(df_filtered)
+    render_raw_data(df_filtered, filtros)
 else:
     if df is None:
         st.error("No se pudieron cargar los datos de delitos. Verifica que el archivo esté en la ubicación correcta.")
@@ -1,30 +1,36 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-from utils.data_loader import load_data, filter_data
-from utils.geo_utils import load_geojson, prepare_geojson_data
+from utils.data_loader import load_data, load_metadata, filter_data, COLUMNAS_ANALISIS
+from utils.geo_utils import (
+    load_geojson, load_barrios_geojson, load_comunas_from_barrios,
+    barrio_features_for_comuna, aggregate_barrio_totals, rollup_to_comunas, published_geojson_url
+)
+from utils.charts import bar_chart, choropleth_chart
+from utils.ui_utils import lazy_section, render_kpis, render_chart_sections, render_raw_data
 
 # Configuración de la página
 st.set_page_config(page_title="Análisis Espacial", page_icon="🗺️")
 st.title("🗺️ Análisis coroplético de Delitos")
 
-# Cargar datos
-df = load_data()
+# Cargar datos (sólo las columnas que usa la página: sin coordenadas)
+df = load_data(COLUMNAS_ANALISIS)
 geojson = load_geojson('data/caba.json')
+barrios_geojson = load_barrios_geojson()
 
 if df is not None and geojson is not None:
+    # Opciones de los filtros desde la metadata precalculada (sin recorrer el dataset)
+    metadata = load_metadata()
+    
     # Sidebar con filtros
     st.sidebar.header("Filtros")
     
     # Selector de tipo de delito
-    tipos_delito = ["Todos"] + sorted(df['tipo'].unique().tolist())
+    tipos_delito = ["Todos"] + metadata['dimensiones']['tipo']['valores']
     selected_tipo = st.sidebar.selectbox("Tipo de delito", tipos_delito)
     
     # Selector de rango de fechas
-    min_date = df['fecha'].min().date()
-    max_date = df['fecha'].max().date()
+    min_date = metadata['fecha_min']
+    max_date = metadata['fecha_max']
     
     fecha_rango = st.sidebar.date_input(
         "Rango de fechas",
@@ -39,158 +45,127 @@ if df is not None and geojson is not None:
         # Convertir a datetime para la comparación
         fecha_inicio = pd.to_datetime(fecha_inicio)
         fecha_fin = pd.to_datetime(fecha_fin)
-        geojson_data = prepare_geojson_data(geojson, df, selected_tipo, fecha_inicio, fecha_fin)
         df_filtered = filter_data(df, selected_tipo, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     else:
-        geojson_data = prepare_geojson_data(geojson, df, selected_tipo)
         df_filtered = filter_data(df, selected_tipo)
     
-    # Mostrar resumen
-    st.header("Resumen")
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric("Total de delitos", df_filtered['cantidad'].sum())
+    # Filtros aplicados: entradas declaradas de los fragmentos de la página
+    filtros = (selected_tipo, tuple(fecha_rango))
     
-    with col2:
-        st.metric("Tipos de delitos", df_filtered['tipo'].nunique())
+    # Totales por barrio (una sola agregación) sumados hasta el nivel de comuna
+    barrio_totals = aggregate_barrio_totals(df_filtered)
+    comunas = [int(f['properties']['nombre'].split(' ')[-1]) for f in geojson['features']]
+    df_delitos_comuna = rollup_to_comunas(barrio_totals, comunas)
     
-    with col3:
-        st.metric("Barrios afectados", df_filtered['barrio'].nunique())
-    
-    with col4:
-        st.metric("Comunas afectadas", df_filtered['comuna'].nunique())
+    # Mostrar resumen
+    render_kpis(df_filtered)
     
     st.markdown("---")
     
     # Crear mapa de coropletas
     st.header("Mapa coroplético por Comunas")
     
-    # Preparar datos para el gráfico
-    delitos_por_comuna = []
-    for feature in geojson_data['features']:
-        comuna_name = feature['properties']['nombre']
-        delitos_count = feature['properties']['delitos']
-        delitos_por_comuna.append({
-            'Comuna': comuna_name,
-            'Delitos': delitos_count
-        })
-    
-    df_delitos_comuna = pd.DataFrame(delitos_por_comuna)
-    
-    # Crear el mapa de coropletas
-    fig = px.choropleth_mapbox(
-        df_delitos_comuna,
-        geojson=geojson_data,
-        locations='Comuna',
-        featureidkey="properties.nombre",
-        color='Delitos',
-        color_continuous_scale="reds",
-        range_color=(0, max(1, df_delitos_comuna['Delitos'].max())),  # Evitar rango 0-0
-        mapbox_style="carto-positron",
-        zoom=10,
-        center={"lat": -34.6037, "lon": -58.3816},
-        opacity=0.7,
-        labels={'Delitos': 'Cantidad de Delitos'},
-        title=f'Distribución de {selected_tipo if selected_tipo != "Todos" else "todos los delitos"} por Comuna'
-    )
-    
-    fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Mostrar tabla con datos por comuna
-    st.subheader("Datos por Comuna")
-    df_delitos_comuna = df_delitos_comuna.sort_values('Delitos', ascending=False)
-    st.dataframe(df_delitos_comuna)
-    
-    # Gráfico de barras por comuna
-    st.subheader("Distribución por Comuna")
-    fig_barras = px.bar(
-        df_delitos_comuna, 
-        x='Comuna', 
-        y='Delitos',
-        title=f'Delitos por Comuna - {selected_tipo if selected_tipo != "Todos" else "Todos los tipos"}'
-    )
-    fig_barras.update_xaxes(tickangle=45)
-    st.plotly_chart(fig_barras, use_container_width=True)
-    
-    # Nueva sección: Análisis Temporal (igual que en el panel descriptivo)
-    st.header("Análisis Temporal")
-    
-    # Frecuencia por mes
-    st.subheader("Frecuencia por Mes")
-    df_mes = df_filtered.groupby('mes').agg({'cantidad': 'sum'}).reset_index()
-    
-    # Ordenar meses cronológicamente
-    meses_orden = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 
-                  'JULIO', 'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
-    df_mes['mes'] = pd.Categorical(df_mes['mes'], categories=meses_orden, ordered=True)
-    df_mes = df_mes.sort_values('mes')
-    
-    fig_mes = px.bar(df_mes, x='mes', y='cantidad', 
-                     title=f'Delitos por Mes - {selected_tipo}')
-    st.plotly_chart(fig_mes, use_container_width=True)
-    
-    # Frecuencia por franja horaria
-    st.subheader("Frecuencia por Franja Horaria")
-    df_hora = df_filtered.groupby('franja').agg({'cantidad': 'sum'}).reset_index()
-    df_hora = df_hora.sort_values('franja')
-    
-    fig_hora = px.bar(df_hora, x='franja', y='cantidad', 
-                      title=f'Delitos por Franja Horaria - {selected_tipo}')
-    st.plotly_chart(fig_hora, use_container_width=True)
-    
-    # Frecuencia por día de la semana
-    st.subheader("Frecuencia por Día de la Semana")
-    dias_orden = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES', 'SABADO', 'DOMINGO']
-    df_dia = df_filtered.groupby('dia').agg({'cantidad': 'sum'}).reset_index()
-    df_dia['dia'] = pd.Categorical(df_dia['dia'], categories=dias_orden, ordered=True)
-    df_dia = df_dia.sort_values('dia')
-    
-    fig_dia = px.bar(df_dia, x='dia', y='cantidad', 
-                     title=f'Delitos por Día de la Semana - {selected_tipo}')
-    st.plotly_chart(fig_dia, use_container_width=True)
-    
-    # Serie temporal mensual
-    st.subheader("Evolución Mensual")
-    df_evolucion = df_filtered.groupby(['mes']).agg({'cantidad': 'sum'}).reset_index()
-    
-    # Ordenar meses cronológicamente
-    df_evolucion['mes'] = pd.Categorical(df_evolucion['mes'], categories=meses_orden, ordered=True)
-    df_evolucion = df_evolucion.sort_values('mes')
-    
-    fig_evolucion = px.line(df_evolucion, x='mes', y='cantidad', 
-                            title=f'Evolución Mensual de Delitos - {selected_tipo}')
-    st.plotly_chart(fig_evolucion, use_container_width=True)
-    
-    # Nueva sección: Análisis Geográfico Detallado
-    st.header("Análisis Geográfico Detallado")
-    
-    # Frecuencia por comuna
-    st.subheader("Frecuencia por Comuna")
-    df_comuna = df_filtered.groupby('comuna').agg({'cantidad': 'sum'}).reset_index()
-    df_comuna = df_comuna.sort_values('cantidad', ascending=False)
-    
-    fig_comuna = px.bar(df_comuna, x='comuna', y='cantidad', 
-                        title=f'Delitos por Comuna - {selected_tipo}',
-                        labels={'comuna': 'Comuna', 'cantidad': 'Cantidad de Delitos'})
-    st.plotly_chart(fig_comuna, use_container_width=True)
-    
-    # Frecuencia por barrio (top 15 para mejor visualización)
-    st.subheader("Frecuencia por Barrio (Top 15)")
-    df_barrio = df_filtered.groupby('barrio').agg({'cantidad': 'sum'}).reset_index()
-    df_barrio = df_barrio.sort_values('cantidad', ascending=False).head(15)
-    
-    fig_barrio = px.bar(df_barrio, x='barrio', y='cantidad', 
-                        title=f'Delitos por Barrio (Top 15) - {selected_tipo}',
-                        labels={'barrio': 'Barrio', 'cantidad': 'Cantidad de Delitos'})
-    fig_barrio.update_layout(xaxis_tickangle=-45)
-    st.plotly_chart(fig_barrio, use_container_width=True)
+    # Con límites de barrios disponibles, la geometría de comunas se obtiene
+    # disolviendo sus barrios; si no, se usa el GeoJSON de comunas
+    geojson_comunas = load_comunas_from_barrios() if barrios_geojson is not None else geojson
+    # La geometría se publica como archivo estático y la figura sólo la
+    # referencia por URL: cada rerun envía únicamente el vector de valores
+    url_comunas = published_geojson_url('comunas', geojson_comunas)
+    titulo_delitos = selected_tipo if selected_tipo != "Todos" else "todos los delitos"
+    centros_comunas = {
+        int(f['properties']['nombre'].split(' ')[-1]): {
+            "lat": float(f['properties']['centr_lat']), "lon": float(f['properties']['centr_lon'])
+        }
+        for f in geojson['features']
+    }
+    
+    # Drilldown comuna -> barrios dentro de un fragmento: hacer clic en una
+    # comuna re-ejecuta sólo el mapa y envía únicamente los barrios de esa comuna
+    @st.fragment
+    def render_choropleth(barrio_totals, df_delitos_comuna, filtros):
+        comuna_drill = st.session_state.get('coropletico_comuna_drill')
+        
+        if comuna_drill is None:
+            fig = choropleth_chart(
+                df_delitos_comuna['Comuna'],
+                df_delitos_comuna['Delitos'],
+                url_comunas,
+                "properties.nombre",
+                f'Distribución de {titulo_delitos} por Comuna',
+                'Cantidad de Delitos'
+            )
+            
+            if barrios_geojson is None:
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption("Para ver el detalle por barrio, generá data/barrios.json con `python -m utils.barrios`.")
+                return
+            
+            st.caption("Hacé clic en una comuna para ver el detalle por barrio.")
+            evento = st.plotly_chart(
+                fig, use_container_width=True, key="coropletico_mapa",
+                on_select="rerun", selection_mode="points"
+            )
+            puntos = evento.selection.points if evento else []
+            if puntos and puntos[0].get('location'):
+                st.session_state['coropletico_comuna_drill'] = int(puntos[0]['location'].split(' ')[-1])
+                st.rerun(scope="fragment")
+        else:
+            st.button(
+                "⬅️ Volver a comunas",
+                on_click=lambda: st.session_state.pop('coropletico_comuna_drill', None)
+            )
+            df_barrios = barrio_totals[barrio_totals['comuna'] == comuna_drill]
+            geojson_barrios = barrio_features_for_comuna(barrios_geojson, comuna_drill)
+            url_barrios = published_geojson_url(f'barrios_comuna_{comuna_drill}', geojson_barrios)
+            # Barrios de la comuna sin delitos en el período también se muestran
+            nombres = [f['properties']['barrio'] for f in geojson_barrios['features']]
+            df_barrios = (
+                df_barrios.set_index('barrio')['cantidad']
+                .reindex(nombres, fill_value=0)
+                .rename_axis('Barrio')
+                .reset_index(name='Delitos')
+            )
+            
+            fig = choropleth_chart(
+                df_barrios['Barrio'],
+                df_barrios['Delitos'],
+                url_barrios,
+                "properties.barrio",
+                f'Distribución de {titulo_delitos} por Barrio - Comuna {comuna_drill}',
+                'Cantidad de Delitos',
+                zoom=12,
+                centro=centros_comunas.get(comuna_drill)
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(df_barrios.sort_values('Delitos', ascending=False), hide_index=True)
+    
+    render_choropleth(barrio_totals, df_delitos_comuna, filtros)
+    
+    # Tabla y gráficos en secciones diferidas: sólo se calculan al abrirlas.
+    # Cada fragmento se re-ejecuta solo al abrir o cerrar sus secciones.
+    titulo_tipo = selected_tipo if selected_tipo != "Todos" else "Todos los tipos"
+
+    @st.fragment
+    def render_comuna_section(df_delitos_comuna, filtros):
+        def build_comuna_section():
+            df_tabla = df_delitos_comuna.sort_values('Delitos', ascending=False)
+            fig_barras = bar_chart(
+                df_tabla['Comuna'],
+                df_tabla['Delitos'],
+                f'Delitos por Comuna - {titulo_tipo}',
+                'Comuna', 'Delitos',
+                tickangle=45
+            )
+            return [("Datos por Comuna", df_tabla), ("Distribución por Comuna", fig_barras)]
+
+        lazy_section("Mostrar datos por comuna", "coropletico_comunas", build_comuna_section, filtros)
+
+    render_comuna_section(df_delitos_comuna, filtros)
+
+    render_chart_sections(df_filtered, selected_tipo, filtros, "coropletico", "Análisis Geográfico Detallado")
     
     # Mostrar datos crudos
-    if st.checkbox("Mostrar datos crudos"):
-        st.subheader("Datos Crudos")
-        st.dataframe(df_filtered)
+    render_raw_data(df_filtered, filtros)
     
 else:
     if df is None:
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Los tests importan `utils` como lo hacen las páginas: desde la raíz del repo
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
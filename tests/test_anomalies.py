@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.anomalies import daily_matrix, empty_state, load_state, save_state, sync_state
+
+def _delitos(desde, hasta, semilla=0):
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range(desde, hasta, freq='D')
+    n = len(fechas) * 20
+    return pd.DataFrame({
+        'fecha': rng.choice(fechas, n),
+        'comuna': rng.integers(1, 4, n),
+        'tipo': rng.choice(['Robo', 'Hurto'], n),
+        'cantidad': np.ones(n, dtype=int)
+    })
+
+@pytest.fixture
+def estado_guardado(tmp_path):
+    """
+    Estado de enero sincronizado, guardado y vuelto a leer
+    """
+    df = _delitos('2024-01-01', '2024-01-31')
+    estado, cambiado = sync_state(empty_state(), 'v1', *daily_matrix(df))
+    assert cambiado
+    path = tmp_path / 'anomalias.npz'
+    save_state(estado, path)
+    return df, load_state(path)
+
+def test_same_version_keeps_state(estado_guardado):
+    df, estado = estado_guardado
+    assert estado['version'] == 'v1'
+    assert sync_state(estado, 'v1', *daily_matrix(df)) == (estado, False)
+
+def test_appended_days_are_processed_incrementally(estado_guardado):
+    df, estado = estado_guardado
+    creciente = pd.concat([df, _delitos('2024-02-01', '2024-02-29', semilla=1)])
+    media = estado['media'].copy()
+    incremental, cambiado = sync_state(estado, 'v2', *daily_matrix(creciente))
+    completo, _ = sync_state(empty_state(), 'v2', *daily_matrix(creciente))
+
+    assert cambiado and incremental['version'] == 'v2'
+    assert incremental['ultima_fecha'] == pd.Timestamp('2024-02-29')
+    assert not np.array_equal(incremental['media'], media)
+    np.testing.assert_allclose(incremental['media'], completo['media'])
+
+def test_replaced_dataset_rebuilds_state(estado_guardado):
+    df, estado = estado_guardado
+    # Mismo rango de fechas, otros conteos: antes el estado no se reajustaba
+    reemplazo = _delitos('2024-01-01', '2024-01-31', semilla=2)
+    actualizado, cambiado = sync_state(estado, 'v2', *daily_matrix(reemplazo))
+    completo, _ = sync_state(empty_state(), 'v2', *daily_matrix(reemplazo))
+
+    assert cambiado
+    np.testing.assert_array_equal(actualizado['n'], completo['n'])
+    np.testing.assert_allclose(actualizado['media'], completo['media'])
+    pd.testing.assert_frame_equal(actualizado['anomalias'], completo['anomalias'])
+
+def test_state_without_version_is_rebuilt(estado_guardado):
+    # Un estado guardado antes de versionarlo no se puede validar: se recalcula
+    _, estado = estado_guardado
+    estado['version'] = estado['huella'] = None
+    reemplazo = _delitos('2024-01-01', '2024-01-31', semilla=2)
+    actualizado, cambiado = sync_state(estado, 'v1', *daily_matrix(reemplazo))
+    completo, _ = sync_state(empty_state(), 'v1', *daily_matrix(reemplazo))
+    assert cambiado
+    np.testing.assert_allclose(actualizado['media'], completo['media'])
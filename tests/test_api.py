@@ -0,0 +1,76 @@
+import http.client
+import threading
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import utils.api
+from utils.api import ApiHandler, ResponseCache
+
+@pytest.fixture
+def api(monkeypatch):
+    """
+    Servidor de la API en un puerto libre sobre un dataset chico. Devuelve
+    una función que hace un GET y la cantidad de veces que se cargaron datos
+    """
+    df = pd.DataFrame({
+        'fecha': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-02']),
+        'tipo': ['Robo', 'Hurto', 'Robo'], 'barrio': ['PALERMO', 'PALERMO', 'RECOLETA'],
+        'comuna': [14, 14, 2], 'dia': ['Lunes', 'Martes', 'Martes'], 'mes': ['Enero'] * 3,
+        'franja': [10, 11, 12], 'latitud': [-34.58, -34.58, -34.59], 'longitud': [-58.42, -58.42, -58.39],
+        'cantidad': [1, 2, 3]
+    })
+    cargas = []
+    version = ['v1']
+    monkeypatch.setattr(utils.api, 'load_data', lambda columnas: cargas.append(1) or df[columnas])
+    monkeypatch.setattr(utils.api, 'dataset_version', lambda: version[0])
+    monkeypatch.setattr(ApiHandler, 'cache', ResponseCache())
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), ApiHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    def get(ruta, **encabezados):
+        conexion = http.client.HTTPConnection('127.0.0.1', servidor.server_port, timeout=10)
+        conexion.request('GET', ruta, headers=encabezados)
+        respuesta = conexion.getresponse()
+        cuerpo = respuesta.read()
+        conexion.close()
+        return respuesta.status, respuesta.getheader('ETag'), cuerpo
+
+    yield get, cargas, version
+    servidor.shutdown()
+    servidor.server_close()
+
+def test_etag_and_not_modified(api):
+    get, cargas, version = api
+    estado, etag, cuerpo = get('/barrios?tipo=Robo')
+    assert estado == 200 and etag
+    assert cuerpo.startswith(b'[')
+
+    # Con el mismo ETag: 304 sin cuerpo ni recálculo
+    estado, etag_304, cuerpo = get('/barrios?tipo=Robo', **{'If-None-Match': etag})
+    assert (estado, etag_304, cuerpo) == (304, etag, b'')
+    # Sin If-None-Match la respuesta sale de la caché
+    assert get('/barrios?tipo=Robo')[:2] == (200, etag)
+    assert len(cargas) == 1
+
+    # Otra consulta u otra versión del dataset cambian el ETag
+    assert get('/barrios?tipo=Hurto')[1] != etag
+    version[0] = 'v2'
+    estado, etag_nuevo, _ = get('/barrios?tipo=Robo', **{'If-None-Match': etag})
+    assert estado == 200 and etag_nuevo != etag
+
+def test_response_cache_is_bounded_in_bytes():
+    cache = ResponseCache(maximo=10, max_bytes=100)
+    cache.put('a', ('application/json', b'x' * 40))
+    cache.put('b', ('application/json', b'x' * 40))
+    cache.get('a')
+    cache.put('c', ('application/json', b'x' * 40))
+    # Se descarta la menos usada ('b') para no pasar de 100 bytes
+    assert list(cache.respuestas) == ['a', 'c'] and cache.bytes == 80
+
+    cache.put('grande', ('application/json', b'x' * 101))
+    assert cache.get('grande') is None and cache.bytes == 80
+    cache.put('a', ('application/json', b'x' * 10))
+    assert cache.bytes == 50
@@ -0,0 +1,17 @@
+import pytest
+
+from utils.barrios import prepare_barrios
+
+def _feature(propiedades):
+    return {'type': 'Feature', 'properties': propiedades,
+            'geometry': {'type': 'Point', 'coordinates': [-58.4, -34.6]}}
+
+def test_prepare_barrios_keeps_normalized_name_and_comuna():
+    geojson = {'features': [_feature({'BARRIO': 'Nuñez', 'COMUNA': '13.0', 'AREA': 1})]}
+    barrios = prepare_barrios(geojson)
+    assert barrios['features'][0]['properties'] == {'barrio': 'NUNEZ', 'comuna': 13}
+
+@pytest.mark.parametrize('propiedades', [{'BARRIO': 'Nuñez'}, {'BARRIO': 'Nuñez', 'COMUNA': 16}, {'COMUNA': 13}])
+def test_prepare_barrios_rejects_invalid_features(propiedades):
+    with pytest.raises(ValueError):
+        prepare_barrios({'features': [_feature(propiedades)]})
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import clustering
+from utils.clustering import RUIDO, cluster_by_tipo, dbscan
+from utils.geo_utils import unproject_from_meters
+
+def _dbscan_referencia(x, y, eps, min_samples):
+    """
+    DBSCAN por fuerza bruta (matriz de distancias completa) para comparar
+    """
+    from scipy.sparse.csgraph import connected_components
+
+    puntos = np.column_stack([x, y])
+    distancias = np.linalg.norm(puntos[:, None] - puntos[None], axis=2)
+    vecinos = distancias <= eps
+    nucleo = vecinos.sum(axis=1) >= min_samples
+    etiquetas = np.full(len(x), RUIDO)
+    _, componentes = connected_components(vecinos[np.ix_(nucleo, nucleo)], directed=False)
+    etiquetas[nucleo] = componentes
+    indices_nucleo = np.flatnonzero(nucleo)
+    for i in np.flatnonzero(~nucleo):
+        d = distancias[i, nucleo]
+        if len(d) and d.min() <= eps:
+            etiquetas[i] = componentes[d.argmin()]
+    return etiquetas, indices_nucleo
+
+def _misma_particion(a, b):
+    """
+    Las dos etiquetas agrupan igual (salvo el nombre de cada cluster)
+    """
+    pares = set(zip(a.tolist(), b.tolist()))
+    return len(pares) == len(set(a.tolist())) == len(set(b.tolist()))
+
+@pytest.fixture
+def puntos():
+    """
+    Tres manchas densas en metros (dos se tocan por un puente) y ruido disperso
+    """
+    rng = np.random.default_rng(0)
+    manchas = [rng.normal(c, 30, (150, 2)) for c in ([0, 0], [1500, 0], [0, 1500])]
+    puente = np.column_stack([np.linspace(1500, 0, 40), np.linspace(0, 1500, 40)])
+    ruido = rng.uniform(-2000, 3500, (60, 2))
+    todos = np.vstack(manchas + [puente, ruido])
+    return todos[:, 0], todos[:, 1]
+
+@pytest.mark.parametrize('eps, min_samples', [(60, 8), (100, 20), (500, 30)])
+def test_dbscan_matches_brute_force(puntos, eps, min_samples):
+    x, y = puntos
+    etiquetas = dbscan(x, y, eps, min_samples)
+    esperadas, nucleos = _dbscan_referencia(x, y, eps, min_samples)
+    assert ((etiquetas == RUIDO) == (esperadas == RUIDO)).all()
+    # Los bordes a igual distancia de dos clusters se pueden asignar a
+    # cualquiera: la partición se compara sobre los núcleos
+    assert _misma_particion(etiquetas[nucleos], esperadas[nucleos])
+
+def test_dbscan_separates_blobs_and_noise(puntos):
+    x, y = puntos
+    etiquetas = dbscan(x, y, 60, 8)
+    # Las manchas quedan en clusters (al menos dos distintos) y el ruido no
+    assert len(set(etiquetas[:450].tolist()) - {RUIDO}) >= 2
+    assert (etiquetas[-60:] == RUIDO).mean() > 0.9
+
+@pytest.mark.parametrize('maximo', [0, 10 ** 9])
+def test_kdtree_and_brute_force_cell_checks_agree(puntos, monkeypatch, maximo):
+    x, y = puntos
+    _, nucleos = _dbscan_referencia(x, y, 150, 10)
+    esperadas = dbscan(x, y, 150, 10)
+    monkeypatch.setattr(clustering, 'MAX_PARES_FUERZA_BRUTA', maximo)
+    assert _misma_particion(dbscan(x, y, 150, 10)[nucleos], esperadas[nucleos])
+
+def test_cluster_by_tipo_labels_are_unique_across_tipos(puntos):
+    x, y = puntos
+    lat, lon = unproject_from_meters(x, y)
+    df = pd.DataFrame({'latitud': lat, 'longitud': lon, 'tipo': 'Robo'})
+    df = pd.concat([df, df.assign(tipo='Hurto')], ignore_index=True)
+
+    etiquetas = cluster_by_tipo(df, 60, 8, max_workers=2)
+    robo, hurto = etiquetas[df['tipo'] == 'Robo'], etiquetas[df['tipo'] == 'Hurto']
+    # Mismos puntos: la misma partición en cada tipo, con etiquetas disjuntas
+    assert _misma_particion(robo.to_numpy(), hurto.to_numpy())
+    assert not (set(robo) - {RUIDO}) & (set(hurto) - {RUIDO})
@@ -0,0 +1,29 @@
+import os
+
+import pandas as pd
+
+from utils.data_loader import DATA_PATH, load_data, load_metadata
+
+def _write_csv(filas, tipo, mtime):
+    pd.DataFrame({
+        'fecha': pd.date_range('2024-03-04', periods=filas, freq='h').strftime('%Y-%m-%d'),
+        'tipo': tipo, 'barrio': 'PALERMO', 'comuna': 14, 'dia': 'LUNES', 'mes': 'MARZO',
+        'franja': 10, 'latitud': -34.58, 'longitud': -58.42, 'cantidad': 1
+    }).to_csv(DATA_PATH, index=False)
+    os.utime(DATA_PATH, (mtime, mtime))
+
+def test_replaced_csv_invalidates_cached_data_and_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+
+    _write_csv(5, 'Robo', 1_700_000_000)
+    assert load_data(['tipo'])['tipo'].tolist() == ['Robo'] * 5
+    assert load_metadata()['dimensiones']['tipo']['valores'] == ['Robo']
+
+    # Un proceso que sigue corriendo ve el CSV nuevo (no la copia cacheada) y
+    # la copia Parquet se regenera con los datos nuevos
+    _write_csv(7, 'Hurto', 1_700_000_100)
+    assert load_data(['tipo'])['tipo'].tolist() == ['Hurto'] * 7
+    assert load_metadata()['dimensiones']['tipo']['valores'] == ['Hurto']
+    assert pd.read_parquet('data/delitos_2024_clean.parquet')['tipo'].tolist() == ['Hurto'] * 7
+    assert not [f for f in os.listdir('data') if f.endswith('.tmp')]
@@ -0,0 +1,31 @@
+import os
+import re
+
+from streamlit.testing.v1 import AppTest
+
+def _download_app():
+    import pandas as pd
+    from utils.ui_utils import render_download
+
+    df = pd.DataFrame({'tipo': ['Robo', 'Hurto'], 'cantidad': [1, 2]})
+    render_download(df, "delitos_filtrados", "prueba", ('Todos',))
+
+def test_export_is_served_as_static_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = AppTest.from_function(_download_app, default_timeout=30).run()
+    app.button(key="prueba_preparar").click().run()
+    # El archivo se genera en segundo plano: cada rerun espera un poco más
+    for _ in range(20):
+        enlaces = [m.value for m in app.markdown if 'href=' in m.value]
+        if enlaces or app.error:
+            break
+        app.run()
+    assert not app.exception
+    assert not app.error, [e.value for e in app.error]
+
+    enlace, = enlaces
+    url = re.search(r'href="([^"]+)"', enlace).group(1)
+    assert url.startswith('app/static/exportaciones/')
+    assert 'download="delitos_filtrados.csv"' in enlace
+    with open(os.path.join('static', url.removeprefix('app/static/')), encoding='utf-8') as f:
+        assert f.read().splitlines() == ['tipo,cantidad', 'Robo,1', 'Hurto,2']
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.geo_utils import (
+    cell_polygon, compute_grid_cells, grid_counts_for_filters, hex_cells, project_to_meters,
+    square_cells, unproject_from_meters
+)
+
+@pytest.fixture
+def centros_hex():
+    """
+    Celdas axiales alrededor del centro y el centro de cada una en metros
+    """
+    q, r = np.meshgrid(np.arange(-4, 5), np.arange(-4, 5))
+    q, r = q.ravel(), r.ravel()
+    tamano = 250
+    x = tamano * np.sqrt(3) * (q + r / 2)
+    y = tamano * 1.5 * r
+    return q, r, x, y, tamano
+
+def test_hex_cells_assign_points_near_the_center(centros_hex):
+    q, r, x, y, tamano = centros_hex
+    # Dentro del círculo inscripto (radio tamano * √3/2) el punto es de la celda
+    rng = np.random.default_rng(0)
+    angulo = rng.uniform(0, 2 * np.pi, len(q))
+    radio = rng.uniform(0, 0.85, len(q)) * tamano * np.sqrt(3) / 2
+    lat, lon = unproject_from_meters(x + radio * np.cos(angulo), y + radio * np.sin(angulo))
+    cq, cr = hex_cells(lat, lon, tamano)
+    assert cq.tolist() == q.tolist()
+    assert cr.tolist() == r.tolist()
+
+def test_square_cells_floor_including_negatives():
+    tamano = 100
+    x = np.array([0.5, 99.5, 100.5, -0.5, -100.5, 250.0])
+    y = np.array([0.5, -0.5, 199.5, -199.5, 50.0, -1.0])
+    lat, lon = unproject_from_meters(x, y)
+    q, r = square_cells(lat, lon, tamano)
+    assert q.tolist() == [0, 0, 1, -1, -2, 2]
+    assert r.tolist() == [0, -1, 1, -2, 0, -1]
+
+def test_hex_polygon_vertices_are_at_cell_radius(centros_hex):
+    q, r, x, y, tamano = centros_hex
+    for i in (0, 40, len(q) - 1):
+        anillo = np.array(cell_polygon(q[i], r[i], tamano, 'hex'))
+        assert len(anillo) == 7 and anillo[0].tolist() == anillo[-1].tolist()
+        vx, vy = project_to_meters(anillo[:, 1], anillo[:, 0])
+        np.testing.assert_allclose(np.hypot(vx - x[i], vy - y[i]), tamano, atol=0.5)
+        # El centro del polígono cae en la misma celda
+        lat, lon = unproject_from_meters([vx[:6].mean()], [vy[:6].mean()])
+        assert [c[0] for c in hex_cells(lat, lon, tamano)] == [q[i], r[i]]
+
+def test_square_polygon_corners():
+    anillo = np.array(cell_polygon(-2, 3, 100, 'cuadrada'))
+    assert len(anillo) == 5 and anillo[0].tolist() == anillo[-1].tolist()
+    vx, vy = project_to_meters(anillo[:, 1], anillo[:, 0])
+    np.testing.assert_allclose(vx[:4], [-200, -100, -100, -200], atol=0.5)
+    np.testing.assert_allclose(vy[:4], [300, 300, 400, 400], atol=0.5)
+
+def test_grid_counts_match_direct_aggregation(monkeypatch):
+    import utils.shared_store
+
+    rng = np.random.default_rng(1)
+    n = 3000
+    delitos = pd.DataFrame({
+        'fecha': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 120, n), unit='D'),
+        'tipo': rng.choice(['Robo', 'Hurto'], n),
+        'barrio': rng.choice(['PALERMO', 'RECOLETA'], n),
+        'comuna': rng.integers(1, 4, n),
+        'latitud': rng.uniform(-34.65, -34.55, n),
+        'longitud': rng.uniform(-58.45, -58.35, n),
+        'cantidad': rng.integers(1, 3, n)
+    })
+    tablas = {'delitos': delitos, 'grilla_hex_500': compute_grid_cells(delitos, 500, 'hex')}
+    monkeypatch.setattr(utils.shared_store, 'shared_table', tablas.get)
+
+    # Un rango que corta meses por la mitad: las fechas conservan el día
+    obtenido = grid_counts_for_filters(500, 'hex', 'Robo', fecha_inicio='2024-02-10', fecha_fin='2024-03-20')
+
+    esperado = delitos[(delitos['tipo'] == 'Robo') & delitos['fecha'].between('2024-02-10', '2024-03-20')]
+    q, r = hex_cells(esperado['latitud'], esperado['longitud'], 500)
+    esperado = (
+        esperado.assign(q=q.astype(np.int32), r=r.astype(np.int32))
+        .groupby(['q', 'r'])['cantidad'].sum().reset_index()
+    )
+    pdt.assert_frame_equal(obtenido, esperado)
+    assert obtenido['cantidad'].sum() < delitos['cantidad'].sum()
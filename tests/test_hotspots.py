@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.geo_utils import compute_grid_cells, unproject_from_meters
+from utils.hotspots import build_spatial_weights, gi_star, hotspots_for_filters
+
+TAMANO = 250
+
+@pytest.fixture
+def delitos(monkeypatch):
+    """
+    Cinco delitos en el centro de cada celda de una zona de 20x20 hexágonos y
+    95 más en la celda (3, 4)
+    """
+    import utils.shared_store
+
+    q, r = np.meshgrid(np.arange(-10, 10), np.arange(-10, 10))
+    q, r = q.ravel(), r.ravel()
+    repeticiones = np.where((q == 3) & (r == 4), 100, 5)
+    q, r = np.repeat(q, repeticiones), np.repeat(r, repeticiones)
+    lat, lon = unproject_from_meters(TAMANO * np.sqrt(3) * (q + r / 2), TAMANO * 1.5 * r)
+    df = pd.DataFrame({
+        'fecha': pd.Timestamp('2024-05-01'), 'tipo': 'Robo', 'comuna': 1, 'barrio': 'RETIRO',
+        'latitud': lat, 'longitud': lon, 'cantidad': 1
+    })
+    tablas = {'delitos': df, f'grilla_hex_{TAMANO}': compute_grid_cells(df, TAMANO, 'hex')}
+    monkeypatch.setattr(utils.shared_store, 'shared_table', tablas.get)
+    build_spatial_weights.clear()
+    hotspots_for_filters.clear()
+    yield df
+    build_spatial_weights.clear()
+    hotspots_for_filters.clear()
+
+def test_planted_cell_is_a_hotspot(delitos):
+    resultado = hotspots_for_filters('Robo', tamano=TAMANO)
+    assert len(resultado) == 400 and resultado['cantidad'].sum() == len(delitos)
+
+    celda = resultado[(resultado['q'] == 3) & (resultado['r'] == 4)].iloc[0]
+    assert celda['cantidad'] == 100
+    assert celda['z'] > 1.96 and celda['categoria'] == 'Hotspot 99%'
+    # Lejos de la celda plantada nada es significativo
+    lejos = resultado[(resultado['q'] - 3).abs() + (resultado['r'] - 4).abs() > 4]
+    assert (lejos['z'].abs() < 1.96).all()
+
+def test_uniform_counts_have_no_hotspots():
+    from scipy import sparse
+
+    W = sparse.identity(5, format='csr') + sparse.eye(5, k=1, format='csr') + sparse.eye(5, k=-1, format='csr')
+    assert (gi_star(np.full(5, 3.0), W) == 0).all()
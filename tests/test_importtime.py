@@ -0,0 +1,13 @@
+import pytest
+
+from utils.importtime import OBJETIVOS, baseline_heavy_modules, heavy_modules, measure_imports
+
+@pytest.fixture(scope='module')
+def base():
+    return baseline_heavy_modules()
+
+@pytest.mark.parametrize('objetivo', list(OBJETIVOS))
+def test_import_does_not_load_heavy_modules(objetivo, base):
+    modulos, error = measure_imports(OBJETIVOS[objetivo])
+    assert error is None, error
+    assert heavy_modules(modulos, base) == []
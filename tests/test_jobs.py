@@ -0,0 +1,72 @@
+import threading
+import time
+
+from streamlit.testing.v1 import AppTest
+
+import utils.jobs as jobs
+
+def _cached_job_app():
+    import time
+
+    import streamlit as st
+    from utils.jobs import await_job
+
+    @st.cache_data
+    def sumar(n):
+        time.sleep(1)  # más que la demora con la que aparece el spinner de la caché
+        return sum(range(n))
+
+    # Como en las páginas de mapas, el trabajo se pide desde un fragmento
+    @st.fragment
+    def mostrar():
+        resultado = await_job("prueba", ("sumar", 1000), sumar, 1000, etiqueta="Sumando...")
+        if resultado is not None:
+            st.write(f"resultado={resultado}")
+
+    mostrar()
+
+def test_cached_function_runs_as_job():
+    app = AppTest.from_function(_cached_job_app, default_timeout=30).run()
+    # AppTest no dispara los reruns periódicos del progreso: se repite a mano
+    for _ in range(50):
+        if app.markdown or app.exception or app.error:
+            break
+        time.sleep(jobs.INTERVALO_PROGRESO)
+        app.run()
+    assert not app.exception
+    assert not app.error, [e.value for e in app.error]
+    assert [m.value for m in app.markdown] == ["resultado=499500"]
+
+def _until_cancelled(listo):
+    listo.set()
+    while True:
+        jobs.report_progress(0.5)
+        time.sleep(0.01)
+
+def _make_inactive(trabajo):
+    trabajo.esperas = {s: t - jobs.SESION_INACTIVA - 1 for s, t in trabajo.esperas.items()}
+
+def test_inactive_sessions_release_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, 'MAX_TERMINADOS', 0)
+    limpiados = []
+
+    terminado = jobs.submit_job(('prueba', 'terminado'), sum, [1, 2], limpieza=limpiados.append)
+    terminado.future.result(timeout=5)
+    listo = threading.Event()
+    en_curso = jobs.submit_job(('prueba', 'en curso'), _until_cancelled, listo)
+    assert listo.wait(timeout=5)
+
+    # Una sesión activa mantiene sus trabajos aunque excedan MAX_TERMINADOS
+    jobs.submit_job(('prueba', 'otro'), sum, [])
+    assert ('prueba', 'terminado') in jobs.get_job_registry()['trabajos']
+    assert not en_curso.cancelado.is_set()
+
+    # Sin consultas por más de SESION_INACTIVA ya nadie los espera
+    _make_inactive(terminado)
+    _make_inactive(en_curso)
+    jobs.submit_job(('prueba', 'otro'), sum, [])
+    trabajos = jobs.get_job_registry()['trabajos']
+    assert ('prueba', 'terminado') not in trabajos and terminado.descartado
+    assert limpiados == [3]
+    assert ('prueba', 'en curso') not in trabajos and en_curso.cancelado.is_set()
+    assert isinstance(en_curso.future.exception(timeout=5), jobs.JobCancelled)
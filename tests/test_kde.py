@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from utils.kde import gaussian_smooth, kde_grid, raster_bounds
+
+def test_smoothing_keeps_the_mass_of_interior_cells():
+    raster = np.zeros((80, 100))
+    raster[40, 50] = 7
+    raster[20, 30] = 3
+    suavizado = gaussian_smooth(raster, 4)
+    assert np.isclose(suavizado.sum(), 10)
+    assert np.unravel_index(suavizado.argmax(), suavizado.shape) == (40, 50)
+
+def test_density_integrates_to_the_total_count():
+    celda = 100
+    q0, r0, nx, ny = raster_bounds(celda)
+    grid_counts = pd.DataFrame({
+        'q': [q0 + nx // 2, q0 + nx // 3, q0 + nx // 2, q0 - 5],
+        'r': [r0 + ny // 2, r0 + ny // 3, r0 + ny // 2, r0],
+        'cantidad': [4, 6, 5, 100]  # la última celda está fuera de la caja
+    })
+    densidad = kde_grid(grid_counts, bandwidth=300, celda=celda)
+    assert densidad.shape == (ny, nx)
+    # Delitos por km² por el área de cada celda en km²
+    assert np.isclose(densidad.sum() * celda ** 2 / 1e6, 15)
+    assert np.unravel_index(densidad.argmax(), densidad.shape) == (ny // 2, nx // 2)
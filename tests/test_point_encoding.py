@@ -0,0 +1,85 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import point_encoding
+from utils.point_encoding import ESCALA, encode_point_payload, encode_varints, quantize, zigzag
+
+def _decode_varints(texto):
+    """
+    Decodificador de referencia (el mismo algoritmo que el de utils/map_layers.py)
+    """
+    valores, actual, desplazamiento = [], 0, 0
+    for byte in base64.b64decode(texto):
+        actual |= (byte & 0x7F) << desplazamiento
+        desplazamiento += 7
+        if not byte & 0x80:
+            valores.append(actual)
+            actual, desplazamiento = 0, 0
+    return np.array(valores, dtype=np.int64)
+
+def _decode_points(payload):
+    crudo = _decode_varints(payload['coords'])
+    deltas = (crudo >> 1) ^ -(crudo & 1)
+    coords = np.cumsum(deltas.reshape(-1, 2), axis=0) / payload['escala']
+    pesos = _decode_varints(payload['pesos'])
+    atributos = {
+        columna: [c['diccionario'][i] for i in _decode_varints(c['codigos'])]
+        for columna, c in payload['atributos'].items()
+    }
+    return pd.DataFrame({'latitud': coords[:, 0], 'longitud': coords[:, 1], 'cantidad': pesos, **atributos})
+
+@pytest.fixture
+def puntos():
+    rng = np.random.default_rng(0)
+    n = 5000
+    return pd.DataFrame({
+        'latitud': rng.uniform(-34.70, -34.53, n),
+        'longitud': rng.uniform(-58.53, -58.34, n),
+        'cantidad': rng.integers(1, 4, n),
+        'tipo': rng.choice(['Robo', 'Hurto', 'Lesiones'], n)
+    })
+
+def test_varints_round_trip():
+    valores = np.array([0, 1, 127, 128, 300, 2**32, 2**62], dtype=np.uint64)
+    texto = base64.b64encode(encode_varints(valores)).decode('ascii')
+    assert _decode_varints(texto).tolist() == valores.astype(np.int64).tolist()
+    assert zigzag([0, -1, 1, -2]).tolist() == [0, 1, 2, 3]
+
+def test_varints_by_blocks_match_single_block(monkeypatch):
+    valores = np.arange(0, 5000, 7, dtype=np.uint64) ** np.uint64(2)
+    entero = encode_varints(valores)
+    avances = []
+    monkeypatch.setattr(point_encoding, 'BLOQUE_VARINTS', 100)
+    assert encode_varints(valores, avances.append) == entero
+    assert len(avances) == -(-len(valores) // 100) and avances[-1] == 1.0
+
+def test_points_round_trip_within_quantization_step(puntos):
+    decodificados = _decode_points(encode_point_payload(puntos, atributos=('tipo',)))
+    distintas = set(zip(quantize(puntos['latitud']), quantize(puntos['longitud'])))
+    assert len(decodificados) == len(distintas)
+
+    # El codificador reordena los puntos (curva Z): se emparejan las filas
+    # ordenándolas por coordenada cuantizada (las empatadas son intercambiables)
+    def ordenadas(df):
+        claves = df.assign(qlat=quantize(df['latitud']), qlon=quantize(df['longitud']))
+        return claves.sort_values(['qlat', 'qlon', 'cantidad', 'tipo'], ignore_index=True)
+
+    original, decodificados = ordenadas(puntos), ordenadas(decodificados)
+    paso = 0.5 / ESCALA + 1e-12
+    assert np.abs(decodificados['latitud'] - original['latitud']).max() <= paso
+    assert np.abs(decodificados['longitud'] - original['longitud']).max() <= paso
+    assert decodificados['cantidad'].tolist() == original['cantidad'].tolist()
+    assert decodificados['tipo'].tolist() == original['tipo'].tolist()
+
+def test_grouped_points_add_up_weights(puntos):
+    # Puntos repetidos en la misma coordenada cuantizada se suman
+    repetidos = pd.concat([puntos, puntos], ignore_index=True)
+    payload = encode_point_payload(repetidos, agrupar=True)
+    decodificados = _decode_points(payload)
+    assert payload['atributos'] == {}
+    assert decodificados['cantidad'].sum() == repetidos['cantidad'].sum()
+    distintas = set(zip(quantize(puntos['latitud']), quantize(puntos['longitud'])))
+    assert len(decodificados) == len(distintas)
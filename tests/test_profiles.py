@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from utils.charts import DIAS_ORDEN
+from utils.profiles import build_profiles, profile_matrix, similar_units
+
+def _delitos(conteos):
+    """
+    Dataset con un delito por fila a partir de {barrio: {(día, franja): cantidad}}
+    """
+    filas = [
+        {'barrio': barrio, 'dia': dia, 'franja': franja, 'cantidad': 1}
+        for barrio, celdas in conteos.items()
+        for (dia, franja), cantidad in celdas.items()
+        for _ in range(cantidad)
+    ]
+    return pd.DataFrame(filas)
+
+def test_profiles_are_unit_norm_counts():
+    perfiles = build_profiles(_delitos({
+        'A': {('LUNES', 'Mañana'): 3, ('MARTES', 'Noche'): 4},
+        'B': {('DOMINGO', 'Noche'): 2}
+    }), 'barrio')
+
+    assert perfiles['unidades'] == ['A', 'B']
+    assert perfiles['totales'].tolist() == [7, 2]
+    matriz = profile_matrix(perfiles, 'A')
+    assert matriz.index.tolist() == DIAS_ORDEN
+    # 3 y 4 sobre la norma 5
+    assert np.isclose(matriz.loc['LUNES', 'Mañana'], 0.6)
+    assert np.isclose(matriz.loc['MARTES', 'Noche'], 0.8)
+    norma = np.linalg.norm(perfiles['perfiles'].reshape(2, -1), axis=1)
+    np.testing.assert_allclose(norma, 1, rtol=1e-6)
+
+def test_similar_units_ranking():
+    # Perfiles en dos celdas: los ángulos con 'A' ordenan la similitud
+    lunes, martes = ('LUNES', 'Mañana'), ('MARTES', 'Noche')
+    perfiles = build_profiles(_delitos({
+        'A': {lunes: 10},
+        'B': {lunes: 30, martes: 1},
+        'C': {lunes: 5, martes: 5},
+        'D': {martes: 7},
+        'E': {lunes: 9, martes: 3}
+    }), 'barrio')
+
+    ranking = similar_units(perfiles, 'A', k=3)
+    assert ranking['unidad'].tolist() == ['B', 'E', 'C']
+    np.testing.assert_allclose(
+        ranking['similitud'], np.round([30 / np.hypot(30, 1), 9 / np.hypot(9, 3), 1 / np.sqrt(2)], 3)
+    )
+    assert ranking['delitos'].tolist() == [31, 12, 10]
+
+    # Sin la unidad consultada y con k mayor a las demás
+    completo = similar_units(perfiles, 'A', k=10)
+    assert completo['unidad'].tolist() == ['B', 'E', 'C', 'D']
+    assert completo['similitud'].iloc[-1] == 0
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.api import dia_franja_endpoint
+from utils.charts import DIAS_ORDEN, MESES_ORDEN, build_geographic_figures, build_temporal_figures
+from utils.data_loader import filter_data
+from utils.geo_utils import aggregate_barrio_totals, rollup_to_comunas
+from utils.shared_store import attach_tables, publish_tables
+
+@pytest.fixture
+def tablas():
+    """
+    El mismo dataset como lo carga el CSV (textos object) y como lo ve un
+    worker adjuntado a la memoria compartida (textos categóricos)
+    """
+    rng = np.random.default_rng(0)
+    n = 2000
+    fecha = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 366, n), unit='D')
+    comuna = rng.integers(1, 16, n)
+    csv = pd.DataFrame({
+        'fecha': fecha,
+        'tipo': rng.choice(['Robo', 'Hurto', 'Lesiones', 'Amenazas'], n).astype(object),
+        'barrio': np.array([f'BARRIO {c}-{i}' for c, i in zip(comuna, rng.integers(0, 3, n))], dtype=object),
+        'comuna': comuna,
+        'dia': np.array(DIAS_ORDEN, dtype=object)[fecha.dayofweek],
+        'mes': np.array(MESES_ORDEN, dtype=object)[fecha.month - 1],
+        'franja': rng.integers(0, 24, n),
+        'latitud': rng.uniform(-34.7, -34.55, n),
+        'longitud': rng.uniform(-58.5, -58.35, n),
+        'cantidad': rng.integers(1, 3, n)
+    })
+    segmento, manifest = publish_tables({'delitos': csv})
+    adjunto, compartidas = attach_tables(manifest)
+    yield csv, compartidas['delitos']
+    adjunto.close()
+    segmento.close()
+    segmento.unlink()
+
+def _trazas(figuras):
+    return [(titulo, [list(t.x) for t in fig.data], [list(t.y) for t in fig.data]) for titulo, fig in figuras]
+
+@pytest.mark.filterwarnings('error::FutureWarning')
+@pytest.mark.parametrize('filtros', [{}, {'tipo_delito': 'Robo'}, {'comuna': 3}, {'tipo_delito': 'Hurto', 'comuna': 7}])
+def test_shared_and_csv_aggregates_match(tablas, filtros):
+    csv, compartida = (filter_data(df, **filtros) for df in tablas)
+    assert isinstance(compartida['barrio'].dtype, pd.CategoricalDtype)
+
+    barrios_csv, barrios_compartida = aggregate_barrio_totals(csv), aggregate_barrio_totals(compartida)
+    pdt.assert_frame_equal(barrios_csv, barrios_compartida, check_dtype=False, check_categorical=False)
+    pdt.assert_frame_equal(rollup_to_comunas(barrios_csv, list(range(1, 16))),
+                           rollup_to_comunas(barrios_compartida, list(range(1, 16))))
+    pdt.assert_frame_equal(dia_franja_endpoint(csv), dia_franja_endpoint(compartida),
+                           check_dtype=False, check_categorical=False)
+    assert _trazas(build_temporal_figures(csv, 'x')) == _trazas(build_temporal_figures(compartida, 'x'))
+    assert _trazas(build_geographic_figures(csv, 'x')) == _trazas(build_geographic_figures(compartida, 'x'))
+
+def test_shared_projection_does_not_copy(tablas, monkeypatch):
+    import utils.shared_store
+    from utils.data_loader import load_data
+
+    _, compartida = tablas
+    monkeypatch.setattr(utils.shared_store, 'shared_table', lambda nombre: compartida)
+    proyeccion = load_data(['barrio', 'latitud'])
+    assert list(proyeccion.columns) == ['barrio', 'latitud']
+    assert np.shares_memory(proyeccion['latitud'].to_numpy(), compartida['latitud'].to_numpy())
+    assert np.shares_memory(proyeccion['barrio'].cat.codes.to_numpy(), compartida['barrio'].cat.codes.to_numpy())
+
+def test_shared_grid_is_returned_without_copy(tablas, monkeypatch):
+    import utils.shared_store
+    from utils.geo_utils import compute_grid_cells, precompute_grid_cells
+
+    csv, _ = tablas
+    segmento, manifest = publish_tables({'grilla_hex_500': compute_grid_cells(csv, 500, 'hex')})
+    adjunto, compartidas = attach_tables(manifest)
+    try:
+        monkeypatch.setattr(utils.shared_store, 'shared_table', lambda nombre: compartidas.get(nombre))
+        assert precompute_grid_cells(500, 'hex') is compartidas['grilla_hex_500']
+        assert precompute_grid_cells(500, 'hex') is compartidas['grilla_hex_500']
+    finally:
+        adjunto.close()
+        segmento.close()
+        segmento.unlink()
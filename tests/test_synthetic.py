@@ -0,0 +1,22 @@
+import pandas as pd
+
+from utils.geo_utils import normalize_nombre
+from utils.synthetic import BARRIOS_POR_COMUNA, generate_dataset
+
+COLUMNAS = ['fecha', 'tipo', 'barrio', 'comuna', 'dia', 'mes', 'franja', 'latitud', 'longitud', 'cantidad']
+
+def test_fallback_barrios_are_normalized():
+    for barrios in BARRIOS_POR_COMUNA.values():
+        assert barrios == [normalize_nombre(b) for b in barrios]
+
+def test_empty_dataset_keeps_header(tmp_path):
+    salida = str(tmp_path / 'vacio.csv')
+    generate_dataset(salida, 0)
+    df = pd.read_csv(salida)
+    assert df.empty and list(df.columns) == COLUMNAS
+
+def test_blocks_add_up_to_requested_rows(tmp_path):
+    salida = str(tmp_path / 'delitos.csv')
+    generate_dataset(salida, 250, bloque=100)
+    df = pd.read_csv(salida)
+    assert len(df) == 250 and list(df.columns) == COLUMNAS
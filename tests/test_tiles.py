@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from utils.tiles import EXTENT, ORIGEN, encode_tile, lonlat_to_mercator, point_tiles, tile_bounds, tile_size
+
+def test_whole_world_tile():
+    assert tile_bounds(0, 0, 0) == (-ORIGEN, -ORIGEN, ORIGEN, ORIGEN)
+
+def test_points_fall_inside_their_tile():
+    rng = np.random.default_rng(0)
+    mx, my = lonlat_to_mercator(rng.uniform(-58.53, -58.33, 500), rng.uniform(-34.71, -34.53, 500))
+    for z in (10, 14, 16):
+        tx, ty = point_tiles(mx, my, z)
+        minx, miny, maxx, maxy = tile_bounds(z, tx, ty)
+        assert ((minx <= mx) & (mx < maxx) & (miny < my) & (my <= maxy)).all()
+        # Y el centro de cada tesela vuelve a la misma tesela
+        cx, cy = point_tiles((minx + maxx) / 2, (miny + maxy) / 2, z)
+        assert (cx == tx).all() and (cy == ty).all()
+
+def test_tile_encodes_and_decodes():
+    import mapbox_vector_tile
+    from shapely.geometry import box
+
+    z = 14
+    tx, ty = point_tiles(*lonlat_to_mercator(-58.3816, -34.6037), z)
+    minx, miny, maxx, maxy = tile_bounds(z, tx, ty)
+    mx = minx + np.array([0.25, 0.6]) * (maxx - minx)
+    my = miny + np.array([0.7, 0.1]) * (maxy - miny)
+
+    puntos = pd.DataFrame({
+        'tipo': ['Robo', 'Hurto'], 'comuna': [1, 1], 'barrio': ['MONSERRAT', 'MONSERRAT'],
+        'franja': [20, 8], 'cantidad': [1, 2], 'mx': mx, 'my': my
+    })
+    comunas = [('1', box(minx - 100, miny - 100, (minx + maxx) / 2, maxy + 100))]
+    capas = mapbox_vector_tile.decode(encode_tile(z, tx, ty, puntos, comunas))
+
+    assert set(capas) == {'delitos', 'comunas'}
+    assert [f['properties']['nombre'] for f in capas['comunas']['features']] == ['1']
+    delitos = capas['delitos']['features']
+    assert [(f['properties']['tipo'], f['properties']['cantidad']) for f in delitos] == [('Robo', 1), ('Hurto', 2)]
+    # Coordenadas de la tesela (origen abajo a la izquierda) de vuelta a Mercator
+    paso = tile_size(z) / EXTENT
+    for f, x, y in zip(delitos, mx, my):
+        gx, gy = f['geometry']['coordinates']
+        assert abs(minx + gx * paso - x) <= paso and abs(miny + gy * paso - y) <= paso
@@ -0,0 +1,60 @@
+import pandas as pd
+
+from utils.validation import validate_dataset
+
+def _crudo():
+    """
+    Filas crudas como vienen del CSV (todo texto): dos válidas y una por
+    cada motivo de descarte
+    """
+    return pd.DataFrame({
+        'fecha': ['2024-03-13', '2024-03-13', 'no-es-fecha', '2024-03-14', '2024-03-14', '2024-03-14', 'mal'],
+        'dia': ['Miércoles', 'LUNES', 'JUEVES', 'JUEVES', 'JUEVES', 'JUEVES', 'JUEVES'],
+        'mes': ['marzo', 'MARZO', 'MARZO', 'MARZO', 'MARZO', 'MARZO', 'MARZO'],
+        'latitud': ['-34.6037', '-34.60', '-34.60', '-35.50', 'abc', '-34.60', '-36.0'],
+        'longitud': ['-58.3816', '-58.40', '-58.40', '-58.40', '-58.40', '-58.40', '-58.40'],
+        'comuna': ['1', '1', '1', '1', '1', '16', '1'],
+        'tipo': ['Robo'] * 7,
+        'cantidad': [1] * 7
+    })
+
+def test_invalid_rows_are_dropped_and_counted_once(tmp_path):
+    # Sin polígono de la ciudad: sólo se verifica la caja
+    df, reporte = validate_dataset(_crudo(), limites_path=str(tmp_path / 'no_existe.json'))
+
+    assert reporte['filas_leidas'] == 7 and reporte['filas_validas'] == 2
+    # La última fila tiene fecha inválida y está fuera de la caja: cuenta una vez
+    assert reporte['descartadas'] == {
+        'fecha_invalida': 2, 'coordenadas_invalidas': 1, 'fuera_de_caja': 1,
+        'fuera_de_ciudad': 0, 'comuna_fuera_de_rango': 1
+    }
+    assert reporte['test_poligono'] is False
+    assert df['comuna'].tolist() == [1, 1]
+    assert pd.api.types.is_datetime64_any_dtype(df['fecha'])
+
+def test_day_and_month_are_normalized_and_corrected(tmp_path):
+    df, reporte = validate_dataset(_crudo(), limites_path=str(tmp_path / 'no_existe.json'))
+
+    # 13/03/2024 fue miércoles: 'Miércoles' se normaliza y 'LUNES' se corrige
+    assert df['dia'].tolist() == ['MIERCOLES', 'MIERCOLES']
+    assert df['mes'].tolist() == ['MARZO', 'MARZO']
+    assert reporte['normalizadas']['dia'] >= 1 and reporte['normalizadas']['mes'] >= 1
+    assert reporte['corregidas']['dia'] == 1 and reporte['corregidas']['mes'] == 0
+
+def test_points_outside_the_city_polygon(tmp_path):
+    import json
+
+    # Un cuadrado chico alrededor del centro como "ciudad"
+    limites = tmp_path / 'ciudad.json'
+    limites.write_text(json.dumps({'type': 'FeatureCollection', 'features': [{
+        'type': 'Feature', 'properties': {},
+        'geometry': {'type': 'Polygon', 'coordinates': [[
+            [-58.39, -34.61], [-58.37, -34.61], [-58.37, -34.59], [-58.39, -34.59], [-58.39, -34.61]
+        ]]}
+    }]}))
+    df, reporte = validate_dataset(_crudo(), limites_path=str(limites))
+    assert reporte['test_poligono'] is True
+    # La fila con comuna 16 también queda afuera: cuenta por el polígono
+    assert reporte['descartadas']['fuera_de_ciudad'] == 2
+    assert reporte['descartadas']['comuna_fuera_de_rango'] == 0
+    assert df['latitud'].tolist() == [-34.6037]
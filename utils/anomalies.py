@@ -0,0 +1,278 @@
+"""
+Detección de días atípicos en la serie diaria de delitos de cada par
+(comuna, tipo).
+
+Cada serie tiene una línea de base por día de la semana (media y varianza
+con suavizado exponencial) que se actualiza de a un día: para cada día nuevo
+se puntúan todas las series de la ciudad a la vez (operaciones vectorizadas
+sobre un array de series) y después se actualizan sus estadísticas. El
+residuo se recorta a K_ROBUSTO desvíos antes de actualizar, así un día
+extremo no infla la línea de base.
+
+El estado (estadísticas, último día procesado y anomalías encontradas) se
+persiste junto al dataset con la versión del CSV y una huella de los conteos
+ya procesados: cuando el CSV crece sólo se procesan los días nuevos, sin
+reajustar desde cero; si cambian días ya procesados (el dataset se corrigió
+o se reemplazó), el estado se recalcula.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.data_loader import dataset_version, load_data
+
+ESTADO_PATH = 'data/delitos_2024_clean.anomalias.npz'
+
+# Peso de cada observación nueva en la media y la varianza de su día de la
+# semana (0.1: vida media de ~7 semanas)
+ALFA = 0.1
+# Observaciones del mismo día de la semana antes de empezar a puntuar
+MIN_OBSERVACIONES = 4
+# Desvío (en unidades de sigma) a partir del cual un día es atípico
+UMBRAL_Z = 3.0
+# Recorte del residuo al actualizar la línea de base
+K_ROBUSTO = 3.0
+
+def daily_matrix(df):
+    """
+    Conteos diarios por serie: (claves, fechas, matriz). Las claves son un
+    DataFrame (comuna, tipo) con una fila por serie, las fechas todos los
+    días del rango (los días sin delitos valen 0) y la matriz es
+    series x días
+    """
+    dias = df['fecha'].dt.normalize().rename('dia_fecha')
+    conteos = (
+        df.groupby([df['comuna'], df['tipo'], dias], observed=True)['cantidad'].sum()
+        .unstack('dia_fecha', fill_value=0)
+    )
+    fechas = pd.date_range(conteos.columns.min(), conteos.columns.max(), freq='D')
+    conteos = conteos.reindex(columns=fechas, fill_value=0)
+    claves = conteos.index.to_frame(index=False)
+    return claves, fechas, conteos.to_numpy(dtype=np.float64)
+
+def empty_state():
+    """
+    Estado sin series ni días procesados
+    """
+    return {
+        'comunas': np.zeros(0, dtype=np.int64),
+        'tipos': np.zeros(0, dtype=str),
+        'media': np.zeros((0, 7)),
+        'varianza': np.zeros((0, 7)),
+        'n': np.zeros((0, 7), dtype=np.int64),
+        'ultima_fecha': None,
+        'version': None,
+        'huella': None,
+        'anomalias': pd.DataFrame({
+            'fecha': pd.Series(dtype='datetime64[ns]'), 'serie': pd.Series(dtype=np.int64),
+            'cantidad': pd.Series(dtype=float), 'esperado': pd.Series(dtype=float),
+            'z': pd.Series(dtype=float)
+        })
+    }
+
+def _align_series(estado, claves):
+    """
+    Índice de cada serie de `claves` en el estado, agregando al estado las
+    series que todavía no tiene
+    """
+    existentes = {(int(c), str(t)): i for i, (c, t) in enumerate(zip(estado['comunas'], estado['tipos']))}
+    indices = []
+    nuevas = []
+    for comuna, tipo in zip(claves['comuna'], claves['tipo']):
+        clave = (int(comuna), str(tipo))
+        if clave not in existentes:
+            existentes[clave] = len(existentes)
+            nuevas.append(clave)
+        indices.append(existentes[clave])
+
+    if nuevas:
+        k = len(nuevas)
+        estado['comunas'] = np.concatenate([estado['comunas'], [c for c, _ in nuevas]]).astype(np.int64)
+        estado['tipos'] = np.concatenate([estado['tipos'], [t for _, t in nuevas]]).astype(str)
+        estado['media'] = np.vstack([estado['media'], np.zeros((k, 7))])
+        estado['varianza'] = np.vstack([estado['varianza'], np.zeros((k, 7))])
+        estado['n'] = np.vstack([estado['n'], np.zeros((k, 7), dtype=np.int64)])
+    return np.asarray(indices, dtype=np.int64)
+
+def score_day(estado, dia_semana, conteos):
+    """
+    Puntuación z de un día para todas las series (sin modificar el estado)
+    y el valor esperado según la línea de base. Las series con menos de
+    MIN_OBSERVACIONES para ese día de la semana tienen z = 0
+    """
+    media = estado['media'][:, dia_semana]
+    # Piso de Poisson: con conteos bajos la varianza observada subestima el ruido
+    sigma = np.sqrt(np.maximum(estado['varianza'][:, dia_semana], media) + 0.5)
+    z = (conteos - media) / sigma
+    z[estado['n'][:, dia_semana] < MIN_OBSERVACIONES] = 0.0
+    return z, media
+
+def update_day(estado, dia_semana, conteos):
+    """
+    Incorpora un día a la línea de base de todas las series
+    """
+    media = estado['media'][:, dia_semana]
+    varianza = estado['varianza'][:, dia_semana]
+    n = estado['n'][:, dia_semana]
+
+    residuo = conteos - media
+    sigma = np.sqrt(np.maximum(varianza, media) + 0.5)
+    maduras = n >= MIN_OBSERVACIONES
+    residuo[maduras] = np.clip(residuo[maduras], -K_ROBUSTO * sigma[maduras], K_ROBUSTO * sigma[maduras])
+
+    # Al principio la media es el promedio simple; después pesa ALFA
+    alfa = np.maximum(ALFA, 1.0 / (n + 1))
+    estado['media'][:, dia_semana] = media + alfa * residuo
+    estado['varianza'][:, dia_semana] = (1 - alfa) * (varianza + alfa * residuo ** 2)
+    estado['n'][:, dia_semana] = n + 1
+
+def update_baselines(estado, claves, fechas, matriz):
+    """
+    Procesa los días posteriores al último del estado: puntúa cada día,
+    registra las anomalías y actualiza las líneas de base. Devuelve la
+    cantidad de días procesados
+    """
+    indices = _align_series(estado, claves)
+    if estado['ultima_fecha'] is not None:
+        nuevos = fechas > estado['ultima_fecha']
+        fechas, matriz = fechas[nuevos], matriz[:, nuevos]
+    if len(fechas) == 0:
+        return 0
+
+    total = len(estado['comunas'])
+    encontradas = []
+    for j, fecha in enumerate(fechas):
+        # Las series sin delitos en el rango nuevo también suman un día en 0
+        conteos = np.zeros(total)
+        conteos[indices] = matriz[:, j]
+        dia_semana = fecha.dayofweek
+
+        z, esperado = score_day(estado, dia_semana, conteos)
+        atipicas = np.flatnonzero(np.abs(z) >= UMBRAL_Z)
+        if len(atipicas):
+            encontradas.append(pd.DataFrame({
+                'fecha': fecha, 'serie': atipicas, 'cantidad': conteos[atipicas],
+                'esperado': esperado[atipicas], 'z': z[atipicas]
+            }))
+        update_day(estado, dia_semana, conteos)
+
+    if encontradas:
+        estado['anomalias'] = pd.concat([estado['anomalias']] + encontradas, ignore_index=True)
+    estado['ultima_fecha'] = fechas[-1]
+    return len(fechas)
+
+def processed_fingerprint(claves, fechas, matriz, hasta):
+    """
+    Huella (sha1) de los conteos diarios hasta `hasta` inclusive: no depende
+    del orden de las series ni de las series sin delitos en ese rango, así
+    sólo cambia si cambiaron los datos de días ya procesados
+    """
+    procesados = fechas <= hasta
+    conteos = matriz[:, procesados]
+    con_datos = np.flatnonzero(conteos.any(axis=1))
+    series = sorted((int(claves['comuna'].iat[i]), str(claves['tipo'].iat[i]), i) for i in con_datos)
+
+    huella = hashlib.sha1()
+    huella.update(fechas[procesados].to_numpy('datetime64[D]').tobytes())
+    huella.update(json.dumps([(comuna, tipo) for comuna, tipo, _ in series]).encode('utf-8'))
+    huella.update(conteos[[i for _, _, i in series]].tobytes())
+    return huella.hexdigest()
+
+def sync_state(estado, version, claves, fechas, matriz):
+    """
+    Pone el estado al día con una versión del dataset. Si la versión es la
+    misma no hay nada que hacer; si no, se procesan sólo los días nuevos,
+    salvo que hayan cambiado días ya procesados: entonces se parte de un
+    estado vacío. Devuelve (estado, si cambió y hay que guardarlo)
+    """
+    if estado['version'] == version:
+        return estado, False
+    if estado['ultima_fecha'] is not None and \
+            estado['huella'] != processed_fingerprint(claves, fechas, matriz, estado['ultima_fecha']):
+        estado = empty_state()
+    update_baselines(estado, claves, fechas, matriz)
+    estado['version'] = version
+    estado['huella'] = processed_fingerprint(claves, fechas, matriz, estado['ultima_fecha'])
+    return estado, True
+
+def save_state(estado, path=ESTADO_PATH):
+    """
+    Persiste el estado en un .npz (sólo arrays numéricos y de texto)
+    """
+    anomalias = estado['anomalias']
+    try:
+        np.savez(
+            path,
+            comunas=estado['comunas'], tipos=estado['tipos'],
+            media=estado['media'], varianza=estado['varianza'], n=estado['n'],
+            ultima_fecha=np.datetime64(estado['ultima_fecha'], 'D'),
+            version=np.array(estado['version']), huella=np.array(estado['huella']),
+            anomalias_fecha=anomalias['fecha'].to_numpy('datetime64[D]'),
+            anomalias_serie=anomalias['serie'].to_numpy(np.int64),
+            anomalias_cantidad=anomalias['cantidad'].to_numpy(float),
+            anomalias_esperado=anomalias['esperado'].to_numpy(float),
+            anomalias_z=anomalias['z'].to_numpy(float)
+        )
+    except OSError:
+        # Sin permisos de escritura: se recalcula en cada arranque
+        pass
+
+def load_state(path=ESTADO_PATH):
+    """
+    Lee el estado persistido, o devuelve uno vacío si no existe
+    """
+    if not os.path.exists(path):
+        return empty_state()
+    with np.load(path, allow_pickle=False) as datos:
+        return {
+            'comunas': datos['comunas'], 'tipos': datos['tipos'],
+            'media': datos['media'], 'varianza': datos['varianza'], 'n': datos['n'],
+            'ultima_fecha': pd.Timestamp(datos['ultima_fecha'].item()),
+            # Los estados guardados sin versión se recalculan
+            'version': datos['version'].item() if 'version' in datos else None,
+            'huella': datos['huella'].item() if 'huella' in datos else None,
+            'anomalias': pd.DataFrame({
+                'fecha': datos['anomalias_fecha'].astype('datetime64[ns]'),
+                'serie': datos['anomalias_serie'],
+                'cantidad': datos['anomalias_cantidad'],
+                'esperado': datos['anomalias_esperado'],
+                'z': datos['anomalias_z']
+            })
+        }
+
+@st.cache_resource(max_entries=2)
+def load_anomaly_state(version):
+    """
+    Estado de las líneas de base al día con el dataset (una vez por versión
+    del CSV). Parte del estado persistido y lo sincroniza con sync_state
+    """
+    df = load_data(['fecha', 'comuna', 'tipo', 'cantidad'])
+    if df is None or df.empty:
+        return None
+    claves, fechas, matriz = daily_matrix(df)
+
+    estado, cambiado = sync_state(load_state(), version, claves, fechas, matriz)
+    if cambiado:
+        save_state(estado)
+    return estado
+
+def detect_anomalies():
+    """
+    Tabla de días atípicos (fecha, comuna, tipo, cantidad, esperado, z)
+    ordenada por fecha
+    """
+    estado = load_anomaly_state(dataset_version())
+    if estado is None:
+        return None
+    anomalias = estado['anomalias']
+    return pd.DataFrame({
+        'fecha': anomalias['fecha'],
+        'comuna': estado['comunas'][anomalias['serie'].to_numpy()],
+        'tipo': estado['tipos'][anomalias['serie'].to_numpy()],
+        'cantidad': anomalias['cantidad'].astype(int),
+        'esperado': anomalias['esperado'].round(1),
+        'z': anomalias['z'].round(2)
+    }).sort_values('fecha', ignore_index=True)
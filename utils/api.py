@@ -0,0 +1,229 @@
+"""
+API HTTP de sólo lectura sobre el mismo motor de filtros y agregaciones que
+usan las páginas, para consumidores que necesitan los números sin la UI.
+
+Endpoints (GET):
+    /metadata                  valores de los filtros, rango de fechas, totales
+    /comunas                   delitos por comuna: los valores del mapa coroplético
+                               (incluye comunas en 0)
+    /barrios                   delitos por barrio
+    /dia-franja                delitos por día de la semana y franja horaria
+    /puntos                    latitud, longitud y cantidad de cada registro
+
+Parámetros de filtro: tipo, comuna, barrio, desde, hasta (AAAA-MM-DD).
+Formato: JSON por defecto; Arrow IPC con ?formato=arrow o con el encabezado
+Accept: application/vnd.apache.arrow.stream.
+
+Cada respuesta lleva un ETag derivado de la versión del dataset y de la
+consulta: un pedido con If-None-Match igual recibe 304 sin recalcular nada.
+Las respuestas calculadas se guardan en una caché LRU en memoria, acotada en
+cantidad y en bytes (las de /puntos pesan lo que el dataset filtrado).
+
+Uso:
+    python -m utils.api [--puerto 8766]
+"""
+import argparse
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from utils.charts import DIAS_ORDEN
+from utils.data_loader import COLUMNAS_ANALISIS, COLUMNAS_COORDENADAS, dataset_version, filter_data, load_data, load_metadata
+from utils.geo_utils import aggregate_barrio_totals, rollup_to_comunas
+
+PUERTO_API = 8766
+MAX_RESPUESTAS = 256
+# Bytes totales de las respuestas en caché; una respuesta más grande no se guarda
+MAX_BYTES_RESPUESTAS = 256 * 1024 * 1024
+MIME_ARROW = 'application/vnd.apache.arrow.stream'
+FILTROS = ('tipo', 'comuna', 'barrio', 'desde', 'hasta')
+
+def parse_filters(consulta):
+    """
+    Filtros de la consulta como argumentos de filter_data
+    """
+    valores = {clave: consulta[clave][0] for clave in FILTROS if consulta.get(clave)}
+    comuna = valores.get('comuna')
+    return {
+        'tipo_delito': valores.get('tipo'),
+        'comuna': int(comuna) if comuna else None,
+        'barrio': valores.get('barrio'),
+        'fecha_inicio': valores.get('desde'),
+        'fecha_fin': valores.get('hasta')
+    }
+
+def comunas_endpoint(df_filtered):
+    metadata = load_metadata()
+    comunas = metadata['dimensiones']['comuna']['valores']
+    return rollup_to_comunas(aggregate_barrio_totals(df_filtered), comunas)
+
+def barrios_endpoint(df_filtered):
+    return aggregate_barrio_totals(df_filtered).sort_values('cantidad', ascending=False)
+
+def dia_franja_endpoint(df_filtered):
+    # Formato largo (dia, franja, cantidad) en orden de la semana: sirve igual
+    # para JSON y Arrow; el cliente arma la matriz si la necesita
+    matriz = df_filtered.groupby(['dia', 'franja'], observed=True)['cantidad'].sum().reset_index()
+    orden = {dia: i for i, dia in enumerate(DIAS_ORDEN)}
+    return (
+        # astype(object): en modo compartido 'dia' es categórica y map devolvería
+        # otra categórica, que se ordena por sus categorías (alfabéticas)
+        matriz.assign(_orden=matriz['dia'].astype(object).map(orden))
+        .sort_values(['_orden', 'franja'])
+        .drop(columns='_orden')
+        .reset_index(drop=True)
+    )
+
+def puntos_endpoint(df_filtered):
+    return df_filtered[['latitud', 'longitud', 'cantidad']].reset_index(drop=True)
+
+ENDPOINTS = {
+    '/comunas': comunas_endpoint,
+    '/barrios': barrios_endpoint,
+    '/dia-franja': dia_franja_endpoint,
+    '/puntos': puntos_endpoint
+}
+
+def serialize(resultado, formato):
+    """
+    Serializa un DataFrame (o un dict) como JSON o Arrow IPC.
+    Devuelve (tipo MIME, bytes)
+    """
+    if isinstance(resultado, dict):
+        return 'application/json', json.dumps(resultado, ensure_ascii=False, default=str).encode('utf-8')
+    if formato == 'arrow':
+        import pyarrow as pa
+
+        tabla = pa.Table.from_pandas(resultado, preserve_index=False)
+        destino = io.BytesIO()
+        with pa.ipc.new_stream(destino, tabla.schema) as writer:
+            writer.write_table(tabla)
+        return MIME_ARROW, destino.getvalue()
+    return 'application/json', resultado.to_json(orient='records', force_ascii=False).encode('utf-8')
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas serializadas (tipo MIME, bytes), indexada por
+    ETag y acotada por cantidad de respuestas y por bytes totales
+    """
+    def __init__(self, maximo=MAX_RESPUESTAS, max_bytes=MAX_BYTES_RESPUESTAS):
+        self.maximo = maximo
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.respuestas = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, etag):
+        with self.lock:
+            respuesta = self.respuestas.get(etag)
+            if respuesta is not None:
+                self.respuestas.move_to_end(etag)
+            return respuesta
+
+    def put(self, etag, respuesta):
+        tamano = len(respuesta[1])
+        if tamano > self.max_bytes:
+            return
+        with self.lock:
+            anterior = self.respuestas.pop(etag, None)
+            if anterior is not None:
+                self.bytes -= len(anterior[1])
+            self.respuestas[etag] = respuesta
+            self.bytes += tamano
+            while len(self.respuestas) > self.maximo or self.bytes > self.max_bytes:
+                _, descartada = self.respuestas.popitem(last=False)
+                self.bytes -= len(descartada[1])
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    Resuelve los endpoints de la API
+    """
+    cache = ResponseCache()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        ruta = url.path.rstrip('/') or '/'
+        if ruta != '/metadata' and ruta not in ENDPOINTS:
+            self.send_json_error(404, f"Endpoint desconocido: {ruta}")
+            return
+
+        consulta = parse_qs(url.query)
+        formato = consulta.get('formato', [None])[0]
+        if formato is None:
+            formato = 'arrow' if MIME_ARROW in self.headers.get('Accept', '') else 'json'
+
+        # El ETag se calcula sin tocar los datos: versión + consulta normalizada
+        normalizada = sorted((k, v[0]) for k, v in consulta.items() if k in FILTROS)
+        firma = json.dumps([dataset_version(), ruta, formato, normalizada])
+        etag = '"' + hashlib.sha1(firma.encode('utf-8')).hexdigest()[:20] + '"'
+
+        if etag in [e.strip() for e in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        respuesta = self.cache.get(etag)
+        if respuesta is None:
+            try:
+                respuesta = self.compute(ruta, consulta, formato)
+            except (ValueError, KeyError) as e:
+                self.send_json_error(400, f"Parámetros inválidos: {e}")
+                return
+            if respuesta is None:
+                self.send_json_error(503, "No se pudieron cargar los datos")
+                return
+            self.cache.put(etag, respuesta)
+
+        mime, cuerpo = respuesta
+        self.send_response(200)
+        self.send_header('Content-Type', mime)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def compute(self, ruta, consulta, formato):
+        if ruta == '/metadata':
+            metadata = load_metadata()
+            return None if metadata is None else serialize(metadata, formato)
+
+        df = load_data(COLUMNAS_ANALISIS + COLUMNAS_COORDENADAS)
+        if df is None:
+            return None
+        df_filtered = filter_data(df, **parse_filters(consulta))
+        return serialize(ENDPOINTS[ruta](df_filtered), formato)
+
+    def send_json_error(self, codigo, mensaje):
+        cuerpo = json.dumps({'error': mensaje}, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_api(puerto=PUERTO_API):
+    """
+    Levanta la API (bloqueante). Corre en un proceso aparte de Streamlit
+    """
+    servidor = ThreadingHTTPServer(('0.0.0.0', puerto), ApiHandler)
+    print(f"API de delitos en http://localhost:{puerto}")
+    servidor.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de delitos CABA")
+    parser.add_argument('--puerto', type=int, default=PUERTO_API)
+    args = parser.parse_args()
+    serve_api(args.puerto)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Genera data/barrios.json, los límites de barrios que usa el drilldown del
+mapa coroplético (comuna -> barrios).
+
+El archivo sale del dataset "Barrios" de Buenos Aires Data (GCBA). Se
+descarga, se verifica que cada barrio tenga nombre y una comuna válida, y se
+guarda sólo con las propiedades que usa la app ('barrio' y 'comuna'). Al
+final se listan los barrios del dataset de delitos que no tienen polígono
+(el drilldown los cruza por nombre normalizado).
+
+Uso:
+    python -m utils.barrios                       # descarga de BARRIOS_URL
+    python -m utils.barrios --desde barrios.geojson   # a partir de una copia local
+"""
+import argparse
+import json
+import os
+import urllib.request
+
+from utils.data_loader import DATA_PATH
+from utils.geo_utils import BARRIOS_PATH, normalize_nombre
+from utils.validation import COMUNA_MAX, COMUNA_MIN
+
+BARRIOS_URL = (
+    'https://cdn.buenosaires.gob.ar/datosabiertos/datasets/'
+    'ministerio-de-educacion/barrios/barrios.geojson'
+)
+
+def fetch_geojson(origen, timeout=60):
+    """
+    Lee un GeoJSON desde una URL o desde un archivo local
+    """
+    if os.path.exists(origen):
+        with open(origen, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    with urllib.request.urlopen(origen, timeout=timeout) as respuesta:
+        return json.load(respuesta)
+
+def prepare_barrios(geojson):
+    """
+    GeoJSON de barrios con propiedades 'barrio' (nombre normalizado) y
+    'comuna' (número). Lanza ValueError si algún barrio no tiene nombre o
+    su comuna no es válida
+    """
+    features = []
+    for i, feature in enumerate(geojson.get('features', [])):
+        props = feature.get('properties') or {}
+        nombre = props.get('BARRIO', props.get('barrio', props.get('nombre')))
+        comuna = props.get('COMUNA', props.get('comuna'))
+        try:
+            comuna = int(float(comuna))
+        except (TypeError, ValueError):
+            comuna = None
+        if not nombre or comuna is None or not COMUNA_MIN <= comuna <= COMUNA_MAX:
+            raise ValueError(f"Barrio {i} sin nombre o con comuna inválida: {props}")
+        features.append({
+            'type': 'Feature',
+            'properties': {'barrio': normalize_nombre(nombre), 'comuna': comuna},
+            'geometry': feature['geometry']
+        })
+    if not features:
+        raise ValueError("El GeoJSON no tiene barrios")
+    return {'type': 'FeatureCollection', 'features': features}
+
+def missing_barrios(barrios_geojson, data_path=DATA_PATH):
+    """
+    Barrios del dataset de delitos sin polígono en el GeoJSON (vacío si el
+    dataset no está disponible)
+    """
+    if not os.path.exists(data_path):
+        return []
+
+    import pandas as pd
+
+    en_dataset = pd.read_csv(data_path, usecols=['barrio'])['barrio'].dropna().unique()
+    con_poligono = {f['properties']['barrio'] for f in barrios_geojson['features']}
+    return sorted({normalize_nombre(b) for b in en_dataset} - con_poligono)
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera data/barrios.json (límites de barrios de CABA)")
+    parser.add_argument('--desde', default=BARRIOS_URL, help="URL o archivo GeoJSON de origen")
+    parser.add_argument('--salida', default=BARRIOS_PATH)
+    args = parser.parse_args()
+
+    barrios = prepare_barrios(fetch_geojson(args.desde))
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(barrios, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"{len(barrios['features'])} barrios en {args.salida}")
+
+    faltantes = missing_barrios(barrios)
+    if faltantes:
+        print(f"Barrios del dataset sin polígono (el drilldown los omite): {', '.join(faltantes)}")
+
+if __name__ == '__main__':
+    main()
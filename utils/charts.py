@@ -0,0 +1,192 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Orden cronológico de meses y días (formato de las páginas de mapas)
+MESES_ORDEN = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO',
+               'JULIO', 'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
+DIAS_ORDEN = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES', 'SABADO', 'DOMINGO']
+
+# Las plantillas (layout estático: ejes, escalas de color, hover) se arman una
+# sola vez por proceso; en cada rerun sólo se cargan los arrays de datos.
+# Con plotly>=6 los arrays numéricos de NumPy se serializan en binario (base64).
+# plotly se importa recién al armar la primera figura, no al importar el módulo.
+@lru_cache(maxsize=None)
+def _layout_template(etiqueta_x, etiqueta_y, escala=None, tickangle=None, etiqueta_color=None):
+    """
+    Layout base (dict) de un gráfico cartesiano
+    """
+    layout = {
+        'xaxis': {'title': {'text': etiqueta_x}},
+        'yaxis': {'title': {'text': etiqueta_y}},
+        'margin': {'t': 60}
+    }
+    if tickangle is not None:
+        layout['xaxis']['tickangle'] = tickangle
+    if escala is not None:
+        layout['coloraxis'] = {
+            'colorscale': [[i / (len(escala) - 1), c] for i, c in enumerate(escala)],
+            'colorbar': {'title': {'text': etiqueta_color or etiqueta_y}}
+        }
+    return layout
+
+def _figure(trazas, titulo, plantilla):
+    """
+    Figura a partir de una plantilla cacheada: se copia sólo el primer nivel
+    del layout y se le agrega el título
+    """
+    import plotly.graph_objects as go
+
+    layout = dict(plantilla)
+    layout['title'] = {'text': titulo}
+    return go.Figure(data=trazas, layout=layout)
+
+def _array(valores):
+    """
+    Convierte una columna a array de NumPy (las categorías pasan a texto)
+    """
+    if isinstance(valores, pd.Series) and isinstance(valores.dtype, pd.CategoricalDtype):
+        valores = valores.astype(str)
+    return np.asarray(valores)
+
+def bar_chart(x, y, titulo, etiqueta_x, etiqueta_y='cantidad', escala=None, tickangle=None):
+    """
+    Gráfico de barras. Con `escala` (lista de colores) las barras se colorean
+    según su valor, como px.bar(color=...)
+    """
+    plantilla = _layout_template(etiqueta_x, etiqueta_y, tuple(escala) if escala else None, tickangle)
+    y = _array(y)
+    traza = {
+        'type': 'bar',
+        'x': _array(x),
+        'y': y,
+        'hovertemplate': f'{etiqueta_x}=%{{x}}<br>{etiqueta_y}=%{{y}}<extra></extra>'
+    }
+    if escala:
+        traza['marker'] = {'color': y, 'coloraxis': 'coloraxis'}
+    return _figure([traza], titulo, plantilla)
+
+def line_chart(x, y, titulo, etiqueta_x, etiqueta_y='cantidad', color=None):
+    """
+    Gráfico de líneas con una serie
+    """
+    plantilla = _layout_template(etiqueta_x, etiqueta_y)
+    traza = {
+        'type': 'scatter',
+        'mode': 'lines',
+        'x': _array(x),
+        'y': _array(y),
+        'showlegend': False,
+        'hovertemplate': f'{etiqueta_x}=%{{x}}<br>{etiqueta_y}=%{{y}}<extra></extra>'
+    }
+    if color:
+        traza['line'] = {'color': color}
+    return _figure([traza], titulo, plantilla)
+
+def heatmap_chart(z, x, y, titulo, etiqueta_x, etiqueta_y, etiqueta_color, escala):
+    """
+    Mapa de calor de una matriz (equivalente a px.imshow con aspect="auto")
+    """
+    plantilla = _layout_template(etiqueta_x, etiqueta_y, tuple(escala), None, etiqueta_color)
+    plantilla = dict(plantilla, yaxis={'title': {'text': etiqueta_y}, 'autorange': 'reversed'})
+    traza = {
+        'type': 'heatmap',
+        'z': np.asarray(z, dtype=float),
+        'x': _array(x),
+        'y': _array(y),
+        'coloraxis': 'coloraxis',
+        'hovertemplate': (
+            f'{etiqueta_x}: %{{x}}<br>{etiqueta_y}: %{{y}}<br>{etiqueta_color}: %{{z}}<extra></extra>'
+        )
+    }
+    return _figure([traza], titulo, plantilla)
+
+def build_temporal_figures(df_filtered, selected_tipo):
+    """
+    Arma los gráficos de la sección "Análisis Temporal" de las páginas de mapas.
+    Devuelve una lista de tuplas (subtítulo, figura)
+    """
+    figuras = []
+
+    # Frecuencia por mes (reindexada en orden cronológico)
+    df_mes = df_filtered.groupby('mes', observed=True)['cantidad'].sum()
+    df_mes = df_mes.reindex([m for m in MESES_ORDEN if m in df_mes.index])
+    figuras.append(("Frecuencia por Mes",
+                    bar_chart(df_mes.index, df_mes.values, f'Delitos por Mes - {selected_tipo}', 'mes')))
+
+    # Frecuencia por franja horaria
+    df_hora = df_filtered.groupby('franja', observed=True)['cantidad'].sum().sort_index()
+    figuras.append(("Frecuencia por Franja Horaria",
+                    bar_chart(df_hora.index, df_hora.values, f'Delitos por Franja Horaria - {selected_tipo}', 'franja')))
+
+    # Frecuencia por día de la semana
+    df_dia = df_filtered.groupby('dia', observed=True)['cantidad'].sum()
+    df_dia = df_dia.reindex([d for d in DIAS_ORDEN if d in df_dia.index])
+    figuras.append(("Frecuencia por Día de la Semana",
+                    bar_chart(df_dia.index, df_dia.values, f'Delitos por Día de la Semana - {selected_tipo}', 'dia')))
+
+    # Serie temporal mensual (reutiliza la agregación por mes)
+    figuras.append(("Evolución Mensual",
+                    line_chart(df_mes.index, df_mes.values, f'Evolución Mensual de Delitos - {selected_tipo}', 'mes')))
+
+    return figuras
+
+def build_geographic_figures(df_filtered, selected_tipo):
+    """
+    Arma los gráficos de la sección "Análisis Geográfico" de las páginas de mapas.
+    Devuelve una lista de tuplas (subtítulo, figura)
+    """
+    figuras = []
+
+    # Frecuencia por comuna
+    df_comuna = df_filtered.groupby('comuna', observed=True)['cantidad'].sum().sort_values(ascending=False)
+    figuras.append(("Frecuencia por Comuna",
+                    bar_chart(df_comuna.index, df_comuna.values, f'Delitos por Comuna - {selected_tipo}',
+                              'Comuna', 'Cantidad de Delitos')))
+
+    # Frecuencia por barrio (top 15 para mejor visualización)
+    df_barrio = df_filtered.groupby('barrio', observed=True)['cantidad'].sum().sort_values(ascending=False).head(15)
+    figuras.append(("Frecuencia por Barrio (Top 15)",
+                    bar_chart(df_barrio.index, df_barrio.values, f'Delitos por Barrio (Top 15) - {selected_tipo}',
+                              'Barrio', 'Cantidad de Delitos', tickangle=-45)))
+
+    return figuras
+
+@lru_cache(maxsize=None)
+def _map_template(zoom, lat, lon, etiqueta_color):
+    """
+    Layout base (dict) de un mapa coroplético sobre MapLibre (las trazas
+    *mapbox se eliminaron en plotly 7)
+    """
+    return {
+        'map': {'style': 'carto-positron', 'zoom': zoom, 'center': {'lat': lat, 'lon': lon}},
+        'coloraxis': {'colorscale': 'reds', 'colorbar': {'title': {'text': etiqueta_color}}},
+        'margin': {'r': 0, 't': 0, 'l': 0, 'b': 0}
+    }
+
+def choropleth_chart(locations, valores, geojson, featureidkey, titulo, etiqueta_color,
+                     zoom=10, centro=None):
+    """
+    Mapa coroplético. `geojson` puede ser la URL de una geometría publicada
+    (ver geo_utils.published_geojson_url): así la figura sólo lleva los
+    identificadores y el vector de valores, no los polígonos
+    """
+    centro = centro or {'lat': -34.6037, 'lon': -58.3816}
+    plantilla = _map_template(zoom, centro['lat'], centro['lon'], etiqueta_color)
+    valores = np.asarray(valores)
+    traza = {
+        'type': 'choroplethmap',
+        'geojson': geojson,
+        'featureidkey': featureidkey,
+        'locations': _array(locations),
+        'z': valores,
+        'coloraxis': 'coloraxis',
+        'marker': {'opacity': 0.7},
+        'hovertemplate': f'%{{location}}<br>{etiqueta_color}=%{{z}}<extra></extra>'
+    }
+    layout = dict(plantilla)
+    # Evitar rango 0-0 cuando no hay delitos
+    layout['coloraxis'] = dict(plantilla['coloraxis'], cmin=0, cmax=max(1, valores.max() if len(valores) else 0))
+    layout['title'] = {'text': titulo}
+    return _figure([traza], titulo, layout)
@@ -0,0 +1,239 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.geo_utils import project_to_meters, unproject_from_meters
+from utils.jobs import report_progress
+
+# Etiqueta de los puntos que no pertenecen a ningún cluster
+RUIDO = -1
+# Hasta cuántos pares de núcleos se comparan por fuerza bruta entre dos
+# celdas vecinas (con más se usa un KD-tree)
+MAX_PARES_FUERZA_BRUTA = 4096
+
+def _cells_within(a, b, eps):
+    """
+    Si algún punto de `a` está a distancia <= eps de alguno de `b`
+    """
+    from scipy.spatial import cKDTree
+
+    if len(a) * len(b) <= MAX_PARES_FUERZA_BRUTA:
+        diferencias = a[:, None, :] - b[None, :, :]
+        return bool(((diferencias ** 2).sum(axis=2) <= eps ** 2).any())
+    distancia, _ = cKDTree(a).query(b, k=1, distance_upper_bound=eps)
+    return bool(np.isfinite(distancia).any())
+
+def connect_cores(nucleos, eps):
+    """
+    Componentes conexas de los núcleos (dos núcleos a distancia <= eps quedan
+    en la misma) sin generar todos los pares, que con eps grandes no entran
+    en memoria:
+    - en una grilla de lado eps/√2 los núcleos de una misma celda están a
+      <= eps entre sí: cada celda ya es conexa
+    - dos celdas vecinas se unen si su par de núcleos más cercano está a
+      <= eps. Se descartan primero los pares de celdas cuyas cajas están a
+      más de eps, se unen los que tienen un par de representantes a <= eps y
+      sólo los demás se comparan núcleo a núcleo (si todavía no están unidos)
+    Devuelve las etiquetas de componente de cada núcleo
+    """
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+
+    lado = eps / np.sqrt(2)
+    ij = np.floor((nucleos - nucleos.min(axis=0)) / lado).astype(np.int64)
+    # Margen en la segunda coordenada: con desplazamientos de -2 a +2 ninguna
+    # clave vecina cae sobre una celda de otra columna
+    ancho = ij[:, 1].max() + 5
+    clave = ij[:, 0] * ancho + ij[:, 1]
+    orden = np.argsort(clave, kind='stable')
+    puntos = nucleos[orden]
+    claves, inicio = np.unique(clave[orden], return_index=True)
+    fin = np.append(inicio[1:], len(orden))
+    k = len(claves)
+
+    minimo = np.column_stack([np.minimum.reduceat(puntos[:, c], inicio) for c in range(2)])
+    maximo = np.column_stack([np.maximum.reduceat(puntos[:, c], inicio) for c in range(2)])
+    representante = puntos[inicio]
+
+    # Pares de celdas que pueden tener núcleos a <= eps (cada par una vez)
+    celda_a, celda_b = [], []
+    for di in range(3):
+        for dj in range(-2, 3):
+            if di == 0 and dj <= 0:
+                continue
+            buscada = claves + di * ancho + dj
+            pos = np.minimum(np.searchsorted(claves, buscada), k - 1)
+            existe = claves[pos] == buscada
+            celda_a.append(np.flatnonzero(existe))
+            celda_b.append(pos[existe])
+    celda_a, celda_b = np.concatenate(celda_a), np.concatenate(celda_b)
+
+    separacion = np.maximum(0, np.maximum(minimo[celda_a] - maximo[celda_b], minimo[celda_b] - maximo[celda_a]))
+    posibles = (separacion ** 2).sum(axis=1) <= eps ** 2
+    celda_a, celda_b = celda_a[posibles], celda_b[posibles]
+    seguros = ((representante[celda_a] - representante[celda_b]) ** 2).sum(axis=1) <= eps ** 2
+
+    grafo = sparse.coo_matrix((np.ones(seguros.sum()), (celda_a[seguros], celda_b[seguros])), shape=(k, k))
+    _, componente = connected_components(grafo, directed=False)
+
+    # Los dudosos, con union-find sobre las componentes ya encontradas
+    padre = list(range(componente.max() + 1))
+
+    def raiz(c):
+        while padre[c] != c:
+            padre[c] = padre[padre[c]]
+            c = padre[c]
+        return c
+
+    for a, b in zip(celda_a[~seguros].tolist(), celda_b[~seguros].tolist()):
+        ra, rb = raiz(componente[a]), raiz(componente[b])
+        if ra != rb and _cells_within(puntos[inicio[a]:fin[a]], puntos[inicio[b]:fin[b]], eps):
+            padre[ra] = rb
+
+    por_celda = np.array([raiz(c) for c in range(len(padre))])[componente]
+    etiquetas = np.empty(len(nucleos), dtype=np.int64)
+    etiquetas[orden] = np.repeat(por_celda, fin - inicio)
+    return np.unique(etiquetas, return_inverse=True)[1].astype(np.int64)
+
+def dbscan(x, y, eps, min_samples):
+    """
+    DBSCAN sobre coordenadas proyectadas en metros usando un KD-tree.
+    - Núcleo: puntos con al menos `min_samples` vecinos (incluido él mismo) a
+      distancia <= eps
+    - Los núcleos a distancia <= eps quedan en el mismo cluster (componentes
+      conexas, ver connect_cores)
+    - Los puntos de borde se asignan al núcleo más cercano
+    Devuelve un array de etiquetas (RUIDO para los puntos sin cluster)
+    """
+    from scipy.spatial import cKDTree
+
+    n = len(x)
+    etiquetas = np.full(n, RUIDO, dtype=np.int64)
+    if n == 0:
+        return etiquetas
+
+    puntos = np.column_stack([x, y])
+    arbol = cKDTree(puntos)
+    cantidad_vecinos = arbol.query_ball_point(puntos, eps, return_length=True, workers=-1)
+    es_nucleo = cantidad_vecinos >= min_samples
+    if not es_nucleo.any():
+        return etiquetas
+
+    # Conectividad sólo entre núcleos: mucho menos puntos que en total
+    nucleos = puntos[es_nucleo]
+    etiquetas_nucleo = connect_cores(nucleos, eps)
+    etiquetas[es_nucleo] = etiquetas_nucleo
+    arbol_nucleos = cKDTree(nucleos)
+
+    # Puntos de borde: núcleo más cercano dentro de eps
+    bordes = np.flatnonzero(~es_nucleo)
+    distancia, vecino = arbol_nucleos.query(puntos[bordes], k=1, distance_upper_bound=eps, workers=-1)
+    alcanzados = np.isfinite(distancia)
+    etiquetas[bordes[alcanzados]] = etiquetas_nucleo[vecino[alcanzados]]
+    return etiquetas
+
+def cluster_by_tipo(df_puntos, eps, min_samples, max_workers=None):
+    """
+    Corre DBSCAN por separado para cada tipo de delito, en paralelo (el KD-tree
+    de scipy libera el GIL). Devuelve una Serie de etiquetas alineada con
+    df_puntos, únicas entre tipos
+    """
+    grupos = [g for _, g in df_puntos.groupby('tipo', observed=True)]
+
+    def procesar(grupo):
+        x, y = project_to_meters(grupo['latitud'].to_numpy(), grupo['longitud'].to_numpy())
+        return grupo.index, dbscan(x, y, eps, min_samples)
+
+    etiquetas = pd.Series(RUIDO, index=df_puntos.index, dtype=np.int64)
+    desplazamiento = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i, (indice, etiquetas_grupo) in enumerate(executor.map(procesar, grupos)):
+            report_progress(0.9 * (i + 1) / len(grupos), "agrupando por tipo")
+            validas = etiquetas_grupo != RUIDO
+            etiquetas_grupo[validas] += desplazamiento
+            etiquetas.loc[indice] = etiquetas_grupo
+            if validas.any():
+                desplazamiento = etiquetas_grupo[validas].max() + 1
+    return etiquetas
+
+def hull_polygon(lat, lon):
+    """
+    Envolvente convexa de un cluster como anillo GeoJSON [lon, lat].
+    Devuelve None si los puntos son menos de 3 o colineales
+    """
+    from scipy.spatial import ConvexHull, QhullError
+
+    x, y = project_to_meters(lat, lon)
+    puntos = np.unique(np.column_stack([x, y]), axis=0)
+    if len(puntos) < 3:
+        return None
+    try:
+        hull = ConvexHull(puntos)
+    except QhullError:
+        return None
+    vertices = puntos[np.append(hull.vertices, hull.vertices[0])]
+    lats, lons = unproject_from_meters(vertices[:, 0], vertices[:, 1])
+    return [[round(lo, 6), round(la, 6)] for la, lo in zip(lats, lons)]
+
+def summarize_clusters(df_puntos, etiquetas):
+    """
+    Resumen por cluster (tamaño, tipo y franja dominantes, centroide) y sus
+    envolventes convexas como FeatureCollection
+    """
+    df_c = df_puntos.assign(cluster=etiquetas.to_numpy())
+    df_c = df_c[df_c['cluster'] != RUIDO]
+    if df_c.empty:
+        return pd.DataFrame(), {'type': 'FeatureCollection', 'features': []}
+
+    def dominante(columna):
+        conteo = df_c.groupby(['cluster', columna], observed=True)['cantidad'].sum().reset_index()
+        conteo = conteo.sort_values('cantidad', ascending=False).drop_duplicates('cluster')
+        return conteo.set_index('cluster')[columna]
+
+    resumen = df_c.groupby('cluster').agg(
+        delitos=('cantidad', 'sum'),
+        puntos=('cantidad', 'size'),
+        latitud=('latitud', 'mean'),
+        longitud=('longitud', 'mean')
+    )
+    resumen['tipo_dominante'] = dominante('tipo')
+    resumen['franja_dominante'] = dominante('franja')
+    resumen['barrio_dominante'] = dominante('barrio')
+    resumen = resumen.sort_values('delitos', ascending=False).reset_index()
+
+    features = []
+    for cluster, grupo in df_c.groupby('cluster'):
+        anillo = hull_polygon(grupo['latitud'].to_numpy(), grupo['longitud'].to_numpy())
+        if anillo is None:
+            continue
+        fila = resumen[resumen['cluster'] == cluster].iloc[0]
+        features.append({
+            'type': 'Feature',
+            'properties': {
+                'cluster': int(cluster),
+                'delitos': int(fila['delitos']),
+                'tipo': str(fila['tipo_dominante']),
+                'franja': str(fila['franja_dominante'])
+            },
+            'geometry': {'type': 'Polygon', 'coordinates': [anillo]}
+        })
+    return resumen, {'type': 'FeatureCollection', 'features': features}
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def clusters_for_filters(tipos=(), comuna=None, barrio=None, fecha_inicio=None, fecha_fin=None,
+                         eps=100, min_samples=20):
+    """
+    Clusters DBSCAN para una combinación de filtros (cacheado por filtros y
+    parámetros). `tipos` son los tipos de delito a agrupar (vacío: todos);
+    cada tipo se agrupa por separado. Devuelve (resumen, envolventes)
+    """
+    from utils.data_loader import COLUMNAS_COORDENADAS, filter_data, load_data
+
+    columnas = ['tipo', 'comuna', 'barrio', 'fecha', 'franja', 'cantidad'] + COLUMNAS_COORDENADAS
+    df_filtered = filter_data(load_data(columnas), None, comuna, barrio, fecha_inicio, fecha_fin)
+    if tipos:
+        df_filtered = df_filtered[df_filtered['tipo'].isin(list(tipos))]
+    df_puntos = df_filtered[['latitud', 'longitud', 'tipo', 'franja', 'barrio', 'cantidad']]
+    etiquetas = cluster_by_tipo(df_puntos, eps, min_samples)
+    return summarize_clusters(df_puntos, etiquetas)
@@ -1,26 +1,149 @@
+import json
+import os
+import tempfile
 import pandas as pd
 import streamlit as st
 from datetime import datetime
+from utils.validation import validate_dataset
 
-@st.cache_data
-def load_data():
+# Rutas del dataset y de su metadata (se guarda junto a los datos)
+DATA_PATH = 'data/delitos_2024_clean.csv'
+METADATA_PATH = 'data/delitos_2024_clean.meta.json'
+# Copia columnar del dataset limpio: permite leer sólo las columnas pedidas
+SNAPSHOT_PATH = 'data/delitos_2024_clean.parquet'
+
+# Dimensiones categóricas usadas por los filtros y gráficos
+DIMENSIONES = ['tipo', 'comuna', 'barrio', 'dia', 'mes', 'franja']
+
+# Proyecciones de columnas según lo que usa cada consumidor
+COLUMNAS_ANALISIS = DIMENSIONES + ['fecha', 'cantidad']
+COLUMNAS_COORDENADAS = ['latitud', 'longitud']
+
+def load_data(columns=None):
+    """
+    Devuelve el dataset de delitos. En modo multi-proceso (variable de entorno
+    DELITOS_SHARED_STORE) se usa la copia publicada en memoria compartida;
+    si no, se carga el CSV.
+
+    Con `columns` se devuelven sólo esas columnas, leídas de la copia Parquet:
+    cada columna se decodifica la primera vez que alguien la pide y después se
+    reutiliza, así una página que no usa coordenadas nunca las carga
+    """
+    from utils.shared_store import shared_table
+
+    df = shared_table('delitos')
+    if df is not None:
+        if columns is None:
+            return df
+        # df[lista] copiaría las columnas fuera de la memoria compartida: la
+        # proyección se arma con las mismas columnas, sin copiarlas
+        return pd.DataFrame({columna: df[columna] for columna in columns}, copy=False)
+    if columns is None:
+        return load_csv_data()
+
+    version = ensure_snapshot()
+    if version is None:
+        # Sin copia Parquet (p. ej. sin permisos de escritura): se proyecta el CSV
+        df = load_csv_data()
+        return None if df is None else df[list(columns)]
+    return pd.DataFrame({columna: load_column(columna, version) for columna in columns}, copy=False)
+
+def dataset_version():
+    """
+    Versión del dataset (fecha de modificación y tamaño del CSV): identifica
+    los resultados derivados (ETags de la API, exportaciones) que dejan de
+    valer cuando se actualizan los datos
+    """
+    try:
+        estado = os.stat(DATA_PATH)
+        return f'{estado.st_mtime_ns}-{estado.st_size}'
+    except OSError:
+        return 'sin-version'
+
+def ensure_snapshot():
+    """
+    Genera la copia Parquet del dataset limpio si no existe o corresponde a
+    otra versión del CSV (la versión se guarda en los metadatos del archivo).
+    Devuelve la versión del dataset o None si no se pudo
+    """
+    version = dataset_version()
+    if snapshot_version() == version:
+        return version
+
+    df = load_csv_data()
+    if df is None:
+        return None
+    # Se escribe a un temporal en la misma carpeta y se reemplaza de una vez:
+    # otro worker nunca lee un archivo a medio escribir
+    temporal = None
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tabla = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        tabla = tabla.replace_schema_metadata({**tabla.schema.metadata, b'dataset_version': version.encode()})
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(SNAPSHOT_PATH), suffix='.parquet.tmp',
+                                         delete=False) as archivo:
+            temporal = archivo.name
+            pq.write_table(tabla, archivo)
+        os.replace(temporal, SNAPSHOT_PATH)
+    except (OSError, ImportError):
+        if temporal is not None and os.path.exists(temporal):
+            os.remove(temporal)
+        return None
+    return version
+
+def snapshot_version():
+    """
+    Versión del dataset con la que se generó la copia Parquet (sólo lee el
+    footer), o None si no existe
+    """
+    try:
+        import pyarrow.parquet as pq
+
+        metadatos = pq.read_schema(SNAPSHOT_PATH).metadata or {}
+    except (OSError, ImportError, ValueError):
+        return None
+    version = metadatos.get(b'dataset_version')
+    return None if version is None else version.decode()
+
+@st.cache_resource(max_entries=32)
+def load_column(nombre, version):
+    """
+    Lee una sola columna de la copia Parquet (una vez por columna y versión).
+    Las columnas cacheadas se comparten entre sesiones: no se modifican
+    """
+    import pyarrow.parquet as pq
+
+    return pq.read_table(SNAPSHOT_PATH, columns=[nombre]).column(0).to_pandas().rename(nombre)
+
+def load_csv_data():
     """
     Carga los datos del archivo CSV con caching para mejor performance
     """
+    return _load_csv_data(dataset_version())
+
+@st.cache_data(max_entries=2)
+def _load_csv_data(version):
+    """
+    Lee y valida el CSV, una vez por versión del dataset: si el archivo
+    cambia, la versión cambia y no se devuelve la copia vieja de la caché
+    """
     try:
-        df = pd.read_csv('data/delitos_2024_clean.csv', delimiter=',')
+        df = pd.read_csv(DATA_PATH, delimiter=',')
         
-        # Convertir fecha a datetime
-        df['fecha'] = pd.to_datetime(df['fecha'])
-                # Asegurarse de que latitud y longitud sean numéricas
-        df['latitud'] = pd.to_numeric(df['latitud'], errors='coerce')
-        df['longitud'] = pd.to_numeric(df['longitud'], errors='coerce')
-                # Eliminar filas con coordenadas inválidas
-        df = df.dropna(subset=['latitud', 'longitud'])
+        # Validar y normalizar una sola vez: tipos, coordenadas dentro de
+        # CABA, comunas, día y mes (ver utils/validation.py)
+        df, validacion = validate_dataset(df)
         
         # Ordenar por fecha
         df = df.sort_values('fecha')
         
+        # Guardar la metadata junto a los datos (con la versión de la que
+        # sale) para que los filtros no tengan que recorrer el dataset en
+        # cada rerun
+        save_metadata(dict(build_metadata(df, validacion), version=version))
+        
         return df
     except Exception as e:
         st.error(f"Error al cargar los datos: {e}")
@@ -30,7 +153,9 @@ def filter_data(df, tipo_delito=None, comuna=None, barrio=None, fecha_inicio=Non
     """
     Filtra el dataframe según los parámetros seleccionados
     """
-    df_filtered = df.copy()
+    # Las máscaras booleanas ya devuelven copias: no hace falta copiar el
+    # dataset completo (importa cuando está en memoria compartida)
+    df_filtered = df
     
     if tipo_delito and tipo_delito != "Todos":
         df_filtered = df_filtered[df_filtered['tipo'] == tipo_delito]
@@ -52,5 +177,85 @@ def filter_data(df, tipo_delito=None, comuna=None, barrio=None, fecha_inicio=Non
     
     return df_filtered
 
+def build_metadata(df, validacion=None):
+    """
+    Calcula la metadata del dataset: valores distintos y conteos por dimensión,
+    rango de fechas, jerarquía barrio -> comuna, cantidad de filas y el
+    reporte de validación de la ingesta (si se pasa)
+    """
+    dimensiones = {}
+    for columna in DIMENSIONES:
+        conteos = df[columna].value_counts().sort_index()
+        dimensiones[columna] = {
+            'valores': conteos.index.tolist(),
+            'conteos': conteos.tolist()
+        }
+
+    barrios_por_comuna = (
+        df.groupby('comuna', observed=True)['barrio']
+        .unique()
+        .apply(lambda barrios: sorted(barrios.tolist()))
+    )
+
+    return {
+        'filas': int(len(df)),
+        'total_delitos': int(df['cantidad'].sum()),
+        'fecha_min': df['fecha'].min().date().isoformat(),
+        'fecha_max': df['fecha'].max().date().isoformat(),
+        'dimensiones': dimensiones,
+        # Las claves JSON son strings: se convierten a int en load_metadata
+        'barrios_por_comuna': {str(comuna): barrios for comuna, barrios in barrios_por_comuna.items()},
+        'validacion': validacion
+    }
+
+def save_metadata(metadata, path=METADATA_PATH):
+    """
+    Persiste la metadata en un JSON junto al dataset
+    """
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+    except OSError:
+        # Sin permisos de escritura: la metadata se recalcula en memoria
+        pass
 
+def load_metadata():
+    """
+    Devuelve la metadata del dataset. Si el JSON persistido no existe o es de
+    otra versión del CSV, se regenera a partir de load_data
+    """
+    return _load_metadata(dataset_version())
 
+@st.cache_data(max_entries=2)
+def _load_metadata(version):
+    """
+    Metadata de una versión del dataset (ver load_metadata)
+    """
+    metadata = None
+    if os.path.exists(METADATA_PATH):
+        with open(METADATA_PATH, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get('version') != version:
+            metadata = None
+
+    if metadata is None:
+        df = load_data(COLUMNAS_ANALISIS)
+        if df is None:
+            return None
+        metadata = build_metadata(df)
+
+    metadata['fecha_min'] = datetime.fromisoformat(metadata['fecha_min']).date()
+    metadata['fecha_max'] = datetime.fromisoformat(metadata['fecha_max']).date()
+    metadata['barrios_por_comuna'] = {
+        int(comuna): barrios for comuna, barrios in metadata['barrios_por_comuna'].items()
+    }
+    return metadata
+
+def barrios_de_comuna(metadata, comuna=None):
+    """
+    Lista de barrios para el filtro en cascada: los de la comuna elegida,
+    o todos si no hay comuna seleccionada
+    """
+    if comuna and comuna != "Todas":
+        return metadata['barrios_por_comuna'].get(comuna, [])
+    return metadata['dimensiones']['barrio']['valores']
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import zlib
+
+from utils.jobs import report_progress
+
+# Formatos disponibles: extensión y tipo MIME
+FORMATOS_EXPORTACION = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV comprimido (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet')
+}
+
+# Filas por bloque: acota la memoria usada al serializar
+FILAS_POR_BLOQUE = 50_000
+
+def iter_csv_chunks(df, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Genera el CSV del DataFrame en bloques de bytes, sin armar nunca el
+    archivo completo como un único string
+    """
+    for inicio in range(0, max(len(df), 1), filas_por_bloque):
+        report_progress(inicio / max(len(df), 1), f"{inicio:,} de {len(df):,} filas")
+        bloque = df.iloc[inicio:inicio + filas_por_bloque]
+        yield bloque.to_csv(index=False, header=(inicio == 0)).encode('utf-8')
+
+def iter_gzip_chunks(chunks):
+    """
+    Comprime al vuelo un iterador de bloques de bytes en formato gzip
+    """
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: encabezado gzip
+    for chunk in chunks:
+        comprimido = compresor.compress(chunk)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+def write_parquet(df, destino, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Escribe el DataFrame en Parquet por grupos de filas (un row group por bloque)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for inicio in range(0, max(len(df), 1), filas_por_bloque):
+            report_progress(inicio / max(len(df), 1), f"{inicio:,} de {len(df):,} filas")
+            tabla = pa.Table.from_pandas(df.iloc[inicio:inicio + filas_por_bloque], preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(destino, tabla.schema, compression='snappy')
+            writer.write_table(tabla)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def iter_export_chunks(df, formato='CSV', filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Bloques de bytes del DataFrame exportado en un formato de texto. Parquet
+    no se genera por bloques (necesita el footer al final): se escribe
+    directamente con write_parquet
+    """
+    if formato == 'CSV':
+        yield from iter_csv_chunks(df, filas_por_bloque)
+    elif formato == 'CSV comprimido (gzip)':
+        yield from iter_gzip_chunks(iter_csv_chunks(df, filas_por_bloque))
+    else:
+        raise ValueError(f"Formato de exportación desconocido: {formato}")
+
+def export_to_path(df, formato='CSV', filas_por_bloque=FILAS_POR_BLOQUE, carpeta=None):
+    """
+    Exporta el DataFrame a un archivo con nombre aleatorio dentro de `carpeta`
+    (o de la carpeta temporal del sistema) y devuelve su ruta. Se usa desde
+    los trabajos en segundo plano: el resultado se comparte entre sesiones;
+    el archivo se borra con remove_export
+    """
+    extension, _ = FORMATOS_EXPORTACION[formato]
+    if carpeta is not None:
+        os.makedirs(carpeta, exist_ok=True)
+    with tempfile.NamedTemporaryFile(suffix=f'.{extension}', dir=carpeta, delete=False) as archivo:
+        if formato == 'Parquet':
+            write_parquet(df, archivo, filas_por_bloque)
+        else:
+            for chunk in iter_export_chunks(df, formato, filas_por_bloque):
+                archivo.write(chunk)
+    return archivo.name
+
+def remove_export(ruta):
+    """
+    Borra un archivo generado por export_to_path
+    """
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
@@ -1,7 +1,35 @@
+import hashlib
 import json
+import os
+import unicodedata
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+# Límites de barrios (dataset "Barrios" de GCBA, se genera con
+# `python -m utils.barrios`). Es opcional: sin este archivo el mapa
+# coroplético sólo ofrece el nivel de comunas.
+BARRIOS_PATH = 'data/barrios.json'
+
+# Carpeta servida por Streamlit (server.enableStaticServing) y su URL relativa
+STATIC_DIR = 'static'
+STATIC_URL = 'app/static'
+
+# Proyección local equirectangular centrada en CABA: a esta escala (~20 km)
+# el error frente a una proyección UTM es despreciable para binning
+LAT_CENTRO = -34.6037
+LON_CENTRO = -58.3816
+METROS_POR_GRADO_LAT = 111_320.0
+METROS_POR_GRADO_LON = 111_320.0 * np.cos(np.radians(LAT_CENTRO))
+
+# Resoluciones de la grilla espacial (tamaño de celda en metros)
+RESOLUCIONES_GRILLA = {
+    'Gruesa (1 km)': 1000,
+    'Media (500 m)': 500,
+    'Fina (250 m)': 250,
+    'Muy fina (100 m)': 100
+}
+
 @st.cache_data
 def load_geojson(file_path):
     """
@@ -25,7 +53,7 @@ def prepare_geojson_data(geojson, df_delitos, tipo_delito=None, fecha_inicio=Non
     df_filtered = filter_data(df_delitos, tipo_delito, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     
     # Agrupar delitos por comuna
-    delitos_por_comuna = df_filtered.groupby('comuna')['cantidad'].sum().reset_index()
+    delitos_por_comuna = df_filtered.groupby('comuna', observed=True)['cantidad'].sum().reset_index()
     
     # Crear un diccionario para mapear comuna -> cantidad de delitos
     delitos_dict = dict(zip(delitos_por_comuna['comuna'], delitos_por_comuna['cantidad']))
@@ -46,4 +74,253 @@ def normalize_comuna_name(comuna_num):
     Convierte el número de comuna al formato del GeoJSON
     Ej: 6 -> "Comuna 6"
     """
-    return f"Comuna {comuna_num}"
\ No newline at end of file
+    return f"Comuna {comuna_num}"
+
+def normalize_nombre(texto):
+    """
+    Normaliza un nombre de barrio para poder cruzar el dataset con el GeoJSON
+    Ej: "Núñez" -> "NUNEZ"
+    """
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.upper().split())
+
+@st.cache_data
+def load_barrios_geojson(file_path=BARRIOS_PATH):
+    """
+    Carga el GeoJSON de barrios y normaliza sus propiedades a
+    'barrio' (nombre normalizado) y 'comuna' (número).
+    Devuelve None si el archivo no está disponible
+    """
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            geojson = json.load(f)
+    except Exception as e:
+        st.error(f"Error al cargar el GeoJSON de barrios: {e}")
+        return None
+
+    for feature in geojson['features']:
+        props = feature['properties']
+        nombre = props.get('BARRIO', props.get('barrio', props.get('nombre')))
+        comuna = props.get('COMUNA', props.get('comuna'))
+        props['barrio'] = normalize_nombre(nombre)
+        props['comuna'] = int(float(comuna))
+    return geojson
+
+@st.cache_data
+def load_comunas_from_barrios(file_path=BARRIOS_PATH):
+    """
+    Deriva los límites de las comunas disolviendo los polígonos de sus barrios,
+    así ambos niveles del drilldown comparten exactamente la misma geometría.
+    Devuelve None si no hay GeoJSON de barrios
+    """
+    barrios_geojson = load_barrios_geojson(file_path)
+    if barrios_geojson is None:
+        return None
+
+    from shapely.geometry import mapping, shape
+    from shapely.ops import unary_union
+
+    geometrias = {}
+    for feature in barrios_geojson['features']:
+        comuna = feature['properties']['comuna']
+        geometrias.setdefault(comuna, []).append(shape(feature['geometry']))
+
+    features = []
+    for comuna, partes in sorted(geometrias.items()):
+        features.append({
+            'type': 'Feature',
+            'properties': {'nombre': normalize_comuna_name(comuna)},
+            'geometry': mapping(unary_union(partes))
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+@st.cache_resource
+def published_geojson_url(nombre, _geojson):
+    """
+    Publica el GeoJSON como archivo estático (una vez por proceso) y devuelve
+    su URL. Las figuras referencian la geometría por URL: el navegador la
+    descarga una sola vez y la cachea, y cada rerun sólo envía los valores.
+    El hash del contenido en la URL invalida la caché si la geometría cambia
+    """
+    contenido = json.dumps(_geojson, separators=(',', ':')).encode('utf-8')
+    version = hashlib.sha1(contenido).hexdigest()[:12]
+
+    ruta = os.path.join(STATIC_DIR, 'geo', f'{nombre}.json')
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    return f"{STATIC_URL}/geo/{nombre}.json?v={version}"
+
+def barrio_features_for_comuna(barrios_geojson, comuna):
+    """
+    Subconjunto del GeoJSON de barrios con los barrios de una comuna.
+    Es lo único que se envía al navegador al hacer drilldown
+    """
+    return {
+        'type': 'FeatureCollection',
+        'features': [f for f in barrios_geojson['features'] if f['properties']['comuna'] == comuna]
+    }
+
+def aggregate_barrio_totals(df_filtered):
+    """
+    Totales de delitos por barrio (nivel más fino del drilldown).
+    Devuelve un DataFrame con columnas barrio, comuna y cantidad
+    """
+    totales = df_filtered.groupby(['comuna', 'barrio'], observed=True)['cantidad'].sum().reset_index()
+    totales['barrio'] = totales['barrio'].map(normalize_nombre)
+    return totales
+
+def rollup_to_comunas(barrio_totals, comunas):
+    """
+    Suma los totales por barrio hasta el nivel de comuna, incluyendo con 0
+    las comunas sin delitos. Devuelve un DataFrame con columnas Comuna y Delitos
+    """
+    por_comuna = barrio_totals.groupby('comuna', observed=True)['cantidad'].sum().reindex(comunas, fill_value=0)
+    return pd.DataFrame({
+        'Comuna': [normalize_comuna_name(c) for c in por_comuna.index],
+        'Delitos': por_comuna.values
+    })
+
+def project_to_meters(lat, lon):
+    """
+    Proyecta latitud/longitud (arrays) a metros respecto del centro de CABA
+    """
+    x = (np.asarray(lon, dtype=float) - LON_CENTRO) * METROS_POR_GRADO_LON
+    y = (np.asarray(lat, dtype=float) - LAT_CENTRO) * METROS_POR_GRADO_LAT
+    return x, y
+
+def unproject_from_meters(x, y):
+    """
+    Inversa de project_to_meters: devuelve (lat, lon)
+    """
+    lat = np.asarray(y, dtype=float) / METROS_POR_GRADO_LAT + LAT_CENTRO
+    lon = np.asarray(x, dtype=float) / METROS_POR_GRADO_LON + LON_CENTRO
+    return lat, lon
+
+def hex_cells(lat, lon, tamano):
+    """
+    Asigna cada punto a una celda hexagonal (orientación "pointy-top") de
+    radio `tamano` metros. Devuelve las coordenadas axiales (q, r) como arrays int
+    """
+    x, y = project_to_meters(lat, lon)
+    q = (np.sqrt(3) / 3 * x - y / 3) / tamano
+    r = (2 / 3 * y) / tamano
+
+    # Redondeo en coordenadas cúbicas (x + y + z = 0), vectorizado
+    cx, cz = q, r
+    cy = -cx - cz
+    rx, ry, rz = np.round(cx), np.round(cy), np.round(cz)
+    dx, dy, dz = np.abs(rx - cx), np.abs(ry - cy), np.abs(rz - cz)
+
+    corregir_x = (dx > dy) & (dx > dz)
+    corregir_z = ~corregir_x & (dz >= dy)
+    rx = np.where(corregir_x, -ry - rz, rx)
+    rz = np.where(corregir_z, -rx - ry, rz)
+    return rx.astype(np.int64), rz.astype(np.int64)
+
+def square_cells(lat, lon, tamano):
+    """
+    Asigna cada punto a una celda cuadrada de lado `tamano` metros
+    """
+    x, y = project_to_meters(lat, lon)
+    return np.floor(x / tamano).astype(np.int64), np.floor(y / tamano).astype(np.int64)
+
+def cell_polygon(q, r, tamano, forma='hex'):
+    """
+    Anillo de coordenadas [lon, lat] (formato GeoJSON) de una celda de la grilla
+    """
+    if forma == 'hex':
+        cx = tamano * np.sqrt(3) * (q + r / 2)
+        cy = tamano * 1.5 * r
+        angulos = np.radians(30 + 60 * np.arange(7))
+        xs = cx + tamano * np.cos(angulos)
+        ys = cy + tamano * np.sin(angulos)
+    else:
+        xs = tamano * np.array([q, q + 1, q + 1, q, q])
+        ys = tamano * np.array([r, r, r + 1, r + 1, r])
+    lats, lons = unproject_from_meters(xs, ys)
+    return [[round(lon, 6), round(lat, 6)] for lat, lon in zip(lats, lons)]
+
+def precompute_grid_cells(tamano, forma='hex'):
+    """
+    Índice fila -> celda de una resolución de la grilla: la celda (q, r) de
+    cada delito, en el mismo orden que load_data, calculada una vez sobre todo
+    el dataset. Ocupa 8 bytes por fila; los filtros se aplican sobre las
+    columnas del dataset ya cargadas (ver grid_counts_for_filters).
+
+    En modo multi-proceso se devuelve la tabla publicada tal cual, sin pasar
+    por una caché que la copie. La tabla es compartida: no se modifica
+    """
+    from utils.data_loader import dataset_version
+    from utils.shared_store import grid_table_name, shared_table
+
+    compartida = shared_table(grid_table_name(tamano, forma))
+    if compartida is not None:
+        return compartida
+    return load_grid_cells(tamano, forma, dataset_version())
+
+@st.cache_resource(max_entries=16)
+def load_grid_cells(tamano, forma, version):
+    """
+    Celdas calculadas sobre el dataset local, una vez por resolución y
+    versión. Se comparten entre sesiones sin copiarlas
+    """
+    from utils.data_loader import COLUMNAS_COORDENADAS, load_data
+
+    return compute_grid_cells(load_data(COLUMNAS_COORDENADAS), tamano, forma)
+
+def compute_grid_cells(df, tamano, forma='hex'):
+    """
+    Celda (q, r) de cada fila del DataFrame, como columnas int32
+    """
+    asignar = hex_cells if forma == 'hex' else square_cells
+    q, r = asignar(df['latitud'].to_numpy(), df['longitud'].to_numpy(), tamano)
+    return pd.DataFrame({'q': q.astype(np.int32), 'r': r.astype(np.int32)})
+
+def grid_counts_for_filters(tamano, forma='hex', tipo_delito=None, comuna=None, barrio=None,
+                            fecha_inicio=None, fecha_fin=None, por=()):
+    """
+    Conteos por celda (q, r, cantidad) de los delitos que pasan los filtros,
+    una fila por celda no vacía. Con `por` se abre además por esas columnas
+    (p. ej. ['comuna', 'barrio']).
+
+    Se filtran las columnas del dataset junto al índice de celdas, sin
+    copiarlas: el costo es el de filter_data más un groupby sobre las filas
+    filtradas, y las fechas conservan la resolución de un día
+    """
+    from utils.data_loader import filter_data, load_data
+
+    datos = load_data(['tipo', 'comuna', 'barrio', 'fecha', 'cantidad'])
+    celdas = precompute_grid_cells(tamano, forma)
+    # Las celdas están en el orden de las filas: se pegan por posición
+    filas = pd.DataFrame(
+        {**{columna: datos[columna] for columna in datos.columns},
+         'q': celdas['q'].to_numpy(), 'r': celdas['r'].to_numpy()},
+        copy=False
+    )
+    filtradas = filter_data(filas, tipo_delito, comuna, barrio, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    return (
+        filtradas.groupby(['q', 'r', *por], observed=True)['cantidad']
+        .sum()
+        .reset_index()
+    )
+
+def grid_to_geojson(grid_counts, tamano, forma='hex'):
+    """
+    Suma los conteos (ya filtrados) por celda y arma un FeatureCollection con
+    un polígono por celda no vacía y la propiedad 'cantidad'
+    """
+    por_celda = grid_counts.groupby(['q', 'r'])['cantidad'].sum()
+    por_celda = por_celda[por_celda > 0]
+
+    features = []
+    for (q, r), cantidad in por_celda.items():
+        features.append({
+            'type': 'Feature',
+            'properties': {'cantidad': int(cantidad)},
+            'geometry': {'type': 'Polygon', 'coordinates': [cell_polygon(q, r, tamano, forma)]}
+        })
+    return {'type': 'FeatureCollection', 'features': features}
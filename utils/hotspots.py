@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.geo_utils import cell_polygon, grid_counts_for_filters
+
+# Vecinos de una celda hexagonal en coordenadas axiales (q, r)
+VECINOS_HEX = [(1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1)]
+
+# Umbrales de |z| para clasificar (bilateral)
+NIVELES_CONFIANZA = [(2.576, '99%'), (1.960, '95%'), (1.645, '90%')]
+
+@st.cache_resource
+def build_spatial_weights(tamano):
+    """
+    Precalcula, una sola vez por resolución, el universo de celdas hexagonales
+    con algún delito y la matriz de pesos espaciales W (binaria, dispersa, con
+    la propia celda incluida como corresponde a Gi*).
+    Devuelve (celdas, W) donde celdas es un DataFrame con q, r, comuna y barrio
+    dominantes de cada celda, en el orden de las filas de W
+    """
+    from scipy import sparse
+
+    # Comuna y barrio dominantes de cada celda (para filtrar y para la tabla)
+    por_barrio = grid_counts_for_filters(tamano, 'hex', por=['comuna', 'barrio'])
+    dominantes = por_barrio.sort_values('cantidad', ascending=False)
+    celdas = (
+        dominantes.drop_duplicates(['q', 'r'])
+        .sort_values(['q', 'r'])
+        .drop(columns='cantidad')
+        .reset_index(drop=True)
+    )
+
+    indice = pd.MultiIndex.from_arrays([celdas['q'], celdas['r']])
+    q = celdas['q'].to_numpy()
+    r = celdas['r'].to_numpy()
+    n = len(celdas)
+
+    filas = [np.arange(n)]
+    columnas = [np.arange(n)]
+    for dq, dr in VECINOS_HEX:
+        vecino = indice.get_indexer(pd.MultiIndex.from_arrays([q + dq, r + dr]))
+        existe = vecino >= 0
+        filas.append(np.flatnonzero(existe))
+        columnas.append(vecino[existe])
+
+    filas = np.concatenate(filas)
+    columnas = np.concatenate(columnas)
+    W = sparse.csr_matrix((np.ones(len(filas)), (filas, columnas)), shape=(n, n))
+    return celdas, W
+
+def gi_star(x, W):
+    """
+    Estadístico Getis-Ord Gi* (z-score) de cada celda para el vector de
+    conteos x. Con W precalculada cuesta un producto matriz dispersa-vector
+    """
+    n = len(x)
+    if n < 2:
+        return np.zeros(n)
+
+    wi = np.asarray(W.sum(axis=1)).ravel()
+    # Pesos binarios: la suma de cuadrados coincide con la suma de pesos
+    wi2 = wi
+
+    media = x.mean()
+    desvio = np.sqrt((x ** 2).mean() - media ** 2)
+    if desvio == 0:
+        return np.zeros(n)
+
+    numerador = W @ x - media * wi
+    denominador = desvio * np.sqrt((n * wi2 - wi ** 2) / (n - 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(denominador > 0, numerador / denominador, 0.0)
+    return z
+
+def classify_hotspots(z):
+    """
+    Clasifica cada z-score en hotspot / coldspot con su nivel de confianza
+    """
+    categorias = np.full(len(z), 'No significativo', dtype=object)
+    # Se recorre de menor a mayor confianza para que prevalezca la más alta
+    for umbral, nivel in reversed(NIVELES_CONFIANZA):
+        categorias[z >= umbral] = f'Hotspot {nivel}'
+        categorias[z <= -umbral] = f'Coldspot {nivel}'
+    return categorias
+
+@st.cache_data(max_entries=32)
+def hotspots_for_filters(tipo_delito=None, comuna=None, barrio=None, fecha_inicio=None, fecha_fin=None,
+                         tamano=500):
+    """
+    Gi* por celda hexagonal para una combinación de filtros. Con comuna o
+    barrio seleccionados, el análisis se restringe a las celdas de esa zona.
+    Devuelve un DataFrame ordenado por z-score (mayor primero)
+    """
+    from scipy.special import ndtr
+
+    celdas, W = build_spatial_weights(tamano)
+
+    # Restringir el universo a la zona filtrada (submatriz de W)
+    mascara = np.ones(len(celdas), dtype=bool)
+    if comuna and comuna != "Todas":
+        mascara &= (celdas['comuna'] == comuna).to_numpy()
+    if barrio and barrio != "Todos":
+        mascara &= (celdas['barrio'] == barrio).to_numpy()
+    zona = celdas[mascara].reset_index(drop=True)
+    W_zona = W[mascara][:, mascara]
+
+    grid_counts = grid_counts_for_filters(
+        tamano, 'hex', tipo_delito, comuna, barrio, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+    )
+    por_celda = grid_counts.set_index(['q', 'r'])['cantidad']
+    indice = pd.MultiIndex.from_arrays([zona['q'], zona['r']])
+    x = por_celda.reindex(indice, fill_value=0).to_numpy(dtype=float)
+
+    z = gi_star(x, W_zona)
+    resultado = zona.assign(
+        cantidad=x.astype(int),
+        z=z,
+        p_valor=2 * ndtr(-np.abs(z)),
+        categoria=classify_hotspots(z)
+    )
+    return resultado.sort_values('z', ascending=False).reset_index(drop=True)
+
+def hotspots_to_geojson(hotspots, tamano):
+    """
+    FeatureCollection con las celdas estadísticamente significativas
+    """
+    significativas = hotspots[hotspots['categoria'] != 'No significativo']
+    features = []
+    for fila in significativas.itertuples(index=False):
+        features.append({
+            'type': 'Feature',
+            'properties': {
+                'categoria': fila.categoria,
+                'z': round(float(fila.z), 2),
+                'cantidad': int(fila.cantidad),
+                'barrio': fila.barrio
+            },
+            'geometry': {'type': 'Polygon', 'coordinates': [cell_polygon(fila.q, fila.r, tamano, 'hex')]}
+        })
+    return {'type': 'FeatureCollection', 'features': features}
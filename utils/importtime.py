@@ -0,0 +1,139 @@
+"""
+Reporte de tiempos de importación al arrancar (python -X importtime).
+
+Importa la portada (app.py), los imports de cada página y los módulos de
+utils en procesos nuevos y verifica que ninguno cargue las librerías de
+visualización y cálculo pesadas: esas se importan recién al dibujar un mapa
+o un gráfico. Las que ya carga la
+línea de base (streamlit y pandas: p. ej. streamlit importa plotly y pandas
+importa pyarrow) no se pueden diferir y no cuentan. Sale con código 1 si
+alguna aparece; el mismo chequeo corre como test en tests/test_importtime.py.
+
+Uso:
+    python -m utils.importtime [--top 15]
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+
+# Los objetivos se importan desde la raíz del repo (app.py usa rutas relativas)
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Librerías que no deben cargarse sólo por abrir la portada o importar utils
+MODULOS_PESADOS = ('plotly', 'folium', 'branca', 'streamlit_folium', 'scipy', 'pyarrow', 'shapely',
+                   'mapbox_vector_tile')
+
+# Lo que cualquier página importa de todos modos
+LINEA_DE_BASE = "import streamlit, pandas, numpy"
+
+def page_imports(pagina):
+    """
+    Código que ejecuta sólo los imports de nivel superior de una página (el
+    resto del script dibuja y necesita datos)
+    """
+    return (
+        "import ast; "
+        f"arbol = ast.parse(open({pagina!r}, encoding='utf-8').read()); "
+        "arbol.body = [n for n in arbol.body if isinstance(n, (ast.Import, ast.ImportFrom))]; "
+        f"exec(compile(arbol, {pagina!r}, 'exec'))"
+    )
+
+# Qué se importa en cada chequeo
+OBJETIVOS = {
+    'app.py': "import runpy; runpy.run_path('app.py')",
+    'utils.data_loader': "import utils.data_loader",
+    'utils.charts': "import utils.charts",
+    'utils.maps': "import utils.maps",
+    'utils.ui_utils': "import utils.ui_utils",
+    'utils.clustering': "import utils.clustering",
+    'utils.hotspots': "import utils.hotspots",
+    'utils.kde': "import utils.kde",
+    'utils.validation': "import utils.validation",
+    'utils.anomalies': "import utils.anomalies",
+    'utils.profiles': "import utils.profiles",
+    **{
+        os.path.relpath(pagina, RAIZ): page_imports(os.path.relpath(pagina, RAIZ))
+        for pagina in sorted(glob.glob(os.path.join(RAIZ, 'pages', '*.py')))
+    }
+}
+
+def measure_imports(codigo):
+    """
+    Ejecuta `codigo` en un intérprete nuevo con -X importtime. Devuelve una
+    lista de (módulo, nivel de anidamiento, microsegundos propios,
+    microsegundos acumulados) y el error si la importación falló
+    """
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        capture_output=True, text=True, cwd=RAIZ
+    )
+    modulos = []
+    otras = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or '|' not in linea:
+            otras.append(linea)
+            continue
+        partes = linea[len('import time:'):].split('|')
+        try:
+            propio, acumulado = int(partes[0]), int(partes[1])
+        except ValueError:
+            continue  # encabezado
+        nombre = partes[2].rstrip()
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        modulos.append((nombre.strip(), nivel, propio, acumulado))
+    error = (otras[-1] if otras else 'error') if proceso.returncode != 0 else None
+    return modulos, error
+
+def _raices(modulos):
+    return {nombre.split('.')[0] for nombre, _, _, _ in modulos}
+
+def baseline_heavy_modules():
+    """
+    Paquetes pesados que ya carga la línea de base (no se pueden diferir).
+    Lanza RuntimeError si la línea de base no se puede importar
+    """
+    modulos, error = measure_imports(LINEA_DE_BASE)
+    if error:
+        raise RuntimeError(f"no se pudo importar la línea de base: {error}")
+    return set(heavy_modules(modulos))
+
+def heavy_modules(modulos, base=()):
+    """
+    Paquetes pesados (nivel superior) presentes entre los importados, sin
+    contar los de la línea de base
+    """
+    return sorted(_raices(modulos).intersection(MODULOS_PESADOS).difference(base))
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempos de importación al arrancar")
+    parser.add_argument('--top', type=int, default=10, help="Módulos más lentos a mostrar por objetivo")
+    args = parser.parse_args()
+
+    base = baseline_heavy_modules()
+    print(f"Línea de base ({LINEA_DE_BASE}): ya carga {', '.join(sorted(base)) or 'ninguna pesada'}")
+
+    fallas = []
+    for objetivo, codigo in OBJETIVOS.items():
+        modulos, error = measure_imports(codigo)
+        # El tiempo total es la suma de los acumulados de primer nivel
+        total = sum(acumulado for _, nivel, _, acumulado in modulos if nivel == 0)
+        pesados = heavy_modules(modulos, base)
+        print(f"\n{objetivo}: {len(modulos)} módulos, {total / 1000:.0f} ms")
+        for nombre, _, _, acumulado in sorted(modulos, key=lambda m: -m[3])[:args.top]:
+            print(f"    {acumulado / 1000:8.1f} ms  {nombre}")
+        if error:
+            print(f"    ✗ la importación falló: {error}")
+            fallas.append(objetivo)
+        elif pesados:
+            print(f"    ✗ importa librerías pesadas: {', '.join(pesados)}")
+            fallas.append(objetivo)
+
+    if fallas:
+        print(f"\nChequeo fallido en: {', '.join(fallas)}")
+        sys.exit(1)
+    print("\nSin importaciones pesadas al arrancar")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+Trabajos en segundo plano para los cálculos pesados (mapa de marcadores,
+DBSCAN, KDE, exportaciones).
+
+- Corren en un pool de threads compartido por todo el proceso, fuera del
+  thread del script: la página muestra una barra de progreso en lugar de
+  quedar congelada.
+- Pedidos idénticos (misma clave) de cualquier sesión comparten el mismo
+  trabajo en curso.
+- Cada sesión tiene "ranuras" (p. ej. 'mapa'): al pedir una clave nueva en la
+  misma ranura, el trabajo anterior se libera y, si nadie más lo espera, se
+  cancela.
+- Cada trabajo registra qué sesiones lo esperan y cuándo lo consultaron por
+  última vez. Una sesión que cierra la pestaña nunca libera sus trabajos:
+  después de SESION_INACTIVA deja de contar, así sus trabajos en curso se
+  cancelan y los terminados (y sus archivos) se pueden descartar.
+
+Las funciones que corren como trabajo pueden llamar a report_progress(); fuera
+de un trabajo esa llamada no hace nada. Los trabajos no tienen sesión: no
+pueden dibujar elementos de Streamlit, y las funciones cacheadas que corren
+como trabajo se declaran con show_spinner=False (el progreso lo muestra
+await_job).
+"""
+import contextvars
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import streamlit as st
+
+# Trabajos terminados que se conservan (resultados reutilizables entre sesiones)
+MAX_TERMINADOS = 64
+# Espera inicial antes de mostrar el progreso: si el resultado ya estaba en
+# caché el trabajo termina enseguida y no hace falta otro rerun
+ESPERA_INICIAL = 0.15
+# Cada cuánto se consulta el progreso (segundos)
+INTERVALO_PROGRESO = 0.5
+# Segundos sin consultar un trabajo tras los cuales una sesión deja de esperarlo
+SESION_INACTIVA = 60
+
+_trabajo_actual = contextvars.ContextVar('trabajo_actual', default=None)
+
+class JobCancelled(Exception):
+    """
+    Se lanza dentro del trabajo cuando fue cancelado
+    """
+
+class Job:
+    """
+    Un cálculo en segundo plano con su progreso, cancelación y las sesiones
+    que lo esperan (id de sesión -> última consulta)
+    """
+    def __init__(self, clave, limpieza=None):
+        self.clave = clave
+        self.limpieza = limpieza
+        self.progreso = 0.0
+        self.mensaje = ""
+        self.cancelado = threading.Event()
+        self.esperas = {}
+        self.descartado = False
+        self.future = None
+
+    def done(self):
+        return self.future.done()
+
+def report_progress(fraccion, mensaje=""):
+    """
+    Informa el avance (0 a 1) del trabajo actual. Si el trabajo fue cancelado
+    lanza JobCancelled para cortar el cálculo
+    """
+    trabajo = _trabajo_actual.get()
+    if trabajo is None:
+        return
+    if trabajo.cancelado.is_set():
+        raise JobCancelled(trabajo.clave)
+    trabajo.progreso = min(max(fraccion, 0.0), 1.0)
+    if mensaje:
+        trabajo.mensaje = mensaje
+
+@st.cache_resource
+def get_job_registry():
+    """
+    Pool de threads y registro de trabajos, uno por proceso
+    """
+    return {
+        'executor': ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='job'),
+        'trabajos': OrderedDict(),
+        'lock': threading.Lock()
+    }
+
+def _run(trabajo, funcion, args, kwargs):
+    _trabajo_actual.set(trabajo)
+    if trabajo.cancelado.is_set():
+        raise JobCancelled(trabajo.clave)
+    resultado = funcion(*args, **kwargs)
+    trabajo.progreso = 1.0
+    return resultado
+
+def _session_id():
+    """
+    Id de la sesión actual (None fuera de una sesión de Streamlit)
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return None if ctx is None else ctx.session_id
+
+def _discard(registro, clave):
+    """
+    Saca un trabajo del registro (con el lock tomado) y libera su resultado;
+    si todavía no terminó, lo cancela
+    """
+    trabajo = registro['trabajos'].pop(clave, None)
+    if trabajo is None:
+        return
+    trabajo.descartado = True
+    if not trabajo.done():
+        trabajo.cancelado.set()
+        trabajo.future.cancel()
+    elif trabajo.limpieza is not None and not trabajo.future.cancelled() and trabajo.future.exception() is None:
+        trabajo.limpieza(trabajo.future.result())
+
+def _prune(registro, ahora):
+    """
+    Olvida las esperas de sesiones inactivas, cancela los trabajos en curso
+    que ya nadie espera y descarta los terminados sin esperas que exceden
+    MAX_TERMINADOS (los consultados hace más tiempo primero). Con el lock tomado
+    """
+    libres = []
+    for clave, trabajo in list(registro['trabajos'].items()):
+        trabajo.esperas = {s: t for s, t in trabajo.esperas.items() if ahora - t <= SESION_INACTIVA}
+        if trabajo.esperas:
+            continue
+        if trabajo.done():
+            libres.append(clave)
+        else:
+            _discard(registro, clave)
+    for clave in libres[:max(0, len(libres) - MAX_TERMINADOS)]:
+        _discard(registro, clave)
+
+def _touch(trabajo):
+    """
+    Registra que la sesión actual sigue esperando el trabajo
+    """
+    registro = get_job_registry()
+    with registro['lock']:
+        trabajo.esperas[_session_id()] = time.monotonic()
+        if trabajo.clave in registro['trabajos']:
+            registro['trabajos'].move_to_end(trabajo.clave)
+
+def submit_job(clave, funcion, *args, limpieza=None, **kwargs):
+    """
+    Devuelve el trabajo de esa clave, creándolo si no existe uno en curso o
+    terminado con éxito. `limpieza` recibe el resultado cuando el trabajo sale
+    del registro (p. ej. para borrar un archivo temporal)
+    """
+    registro = get_job_registry()
+    with registro['lock']:
+        trabajo = registro['trabajos'].get(clave)
+        if trabajo is not None and (trabajo.cancelado.is_set() or (
+                trabajo.done() and trabajo.future.exception() is not None)):
+            _discard(registro, clave)
+            trabajo = None
+
+        if trabajo is None:
+            trabajo = Job(clave, limpieza)
+            # Contexto vacío y no una copia del actual: la copia arrastra las
+            # variables de contexto de Streamlit (fragmento, contenedor activo)
+            # y las funciones cacheadas intentarían mostrar su spinner en una
+            # sesión que este thread no tiene
+            contexto = contextvars.Context()
+            trabajo.future = registro['executor'].submit(contexto.run, _run, trabajo, funcion, args, kwargs)
+            registro['trabajos'][clave] = trabajo
+
+        ahora = time.monotonic()
+        trabajo.esperas[_session_id()] = ahora
+        registro['trabajos'].move_to_end(clave)
+        _prune(registro, ahora)
+    return trabajo
+
+def release_job(trabajo):
+    """
+    La sesión deja de esperar el trabajo. Si no queda nadie esperándolo y no
+    terminó, se cancela
+    """
+    registro = get_job_registry()
+    with registro['lock']:
+        trabajo.esperas.pop(_session_id(), None)
+        if not trabajo.esperas and not trabajo.done() and registro['trabajos'].get(trabajo.clave) is trabajo:
+            _discard(registro, trabajo.clave)
+
+def session_job(ranura, clave, funcion, *args, **kwargs):
+    """
+    Trabajo de la sesión para una ranura. Si la ranura tenía otro trabajo
+    (los filtros cambiaron), se libera. Si el de la misma clave fue
+    descartado mientras la sesión estaba inactiva, se vuelve a pedir
+    """
+    ranuras = st.session_state.setdefault('_jobs', {})
+    anterior = ranuras.get(ranura)
+    if anterior is not None and anterior.clave == clave and not anterior.cancelado.is_set() \
+            and not anterior.descartado:
+        _touch(anterior)
+        return anterior
+
+    trabajo = submit_job(clave, funcion, *args, **kwargs)
+    ranuras[ranura] = trabajo
+    if anterior is not None:
+        release_job(anterior)
+    return trabajo
+
+@st.fragment(run_every=INTERVALO_PROGRESO)
+def _show_progress(trabajo, etiqueta):
+    """
+    Barra de progreso que se actualiza sola: cada intervalo se vuelve a
+    ejecutar sólo este fragmento (y la sesión renueva su espera). Cuando el
+    trabajo termina se vuelve a ejecutar la página para mostrar el resultado
+    """
+    if trabajo.done():
+        st.rerun()
+    _touch(trabajo)
+    texto = f"{etiqueta} {trabajo.mensaje}".strip()
+    st.progress(trabajo.progreso, text=texto)
+
+def await_job(ranura, clave, funcion, *args, etiqueta="Procesando...", **kwargs):
+    """
+    Resultado del trabajo si ya terminó; si no, muestra el progreso y
+    devuelve None: la página se vuelve a ejecutar sola cuando termina.
+    También devuelve None si el trabajo falló o fue cancelado
+    """
+    trabajo = session_job(ranura, clave, funcion, *args, **kwargs)
+    wait([trabajo.future], timeout=ESPERA_INICIAL)
+
+    if not trabajo.done():
+        _show_progress(trabajo, etiqueta)
+        return None
+
+    error = trabajo.future.exception() if not trabajo.future.cancelled() else None
+    if trabajo.future.cancelled() or isinstance(error, JobCancelled):
+        return None
+    if error is not None:
+        # Algunas excepciones no tienen mensaje: el tipo y la traza nunca faltan
+        st.error(f"Error al procesar: {type(error).__name__}: {error}".rstrip(': '))
+        with st.expander("Detalle del error"):
+            st.code(''.join(traceback.format_exception(error)))
+        return None
+    return trabajo.future.result()
@@ -0,0 +1,104 @@
+import numpy as np
+import streamlit as st
+from utils.geo_utils import project_to_meters, unproject_from_meters
+from utils.jobs import report_progress
+
+# Caja que contiene a CABA: (lat_min, lon_min, lat_max, lon_max)
+BBOX_CABA = (-34.706, -58.532, -34.526, -58.334)
+
+# Tamaño de celda del raster de densidad (metros)
+CELDA_KDE = 50
+
+def raster_bounds(celda=CELDA_KDE):
+    """
+    Índices de celda (q0, r0) de la esquina sudoeste y tamaño (nx, ny) del
+    raster que cubre la caja de CABA
+    """
+    lat_min, lon_min, lat_max, lon_max = BBOX_CABA
+    x0, y0 = project_to_meters(lat_min, lon_min)
+    x1, y1 = project_to_meters(lat_max, lon_max)
+    q0, r0 = int(np.floor(x0 / celda)), int(np.floor(y0 / celda))
+    nx = int(np.ceil(x1 / celda)) - q0
+    ny = int(np.ceil(y1 / celda)) - r0
+    return q0, r0, nx, ny
+
+def raster_latlon_bounds(celda=CELDA_KDE):
+    """
+    Límites [[lat_sur, lon_oeste], [lat_norte, lon_este]] del raster, en el
+    formato que espera folium.raster_layers.ImageOverlay
+    """
+    q0, r0, nx, ny = raster_bounds(celda)
+    lats, lons = unproject_from_meters([q0 * celda, (q0 + nx) * celda], [r0 * celda, (r0 + ny) * celda])
+    return [[float(lats[0]), float(lons[0])], [float(lats[1]), float(lons[1])]]
+
+def gaussian_smooth(raster, sigma):
+    """
+    Convolución del raster con un kernel gaussiano de desvío `sigma` (en
+    celdas) vía FFT. Se agrega un margen de 3 sigma para evitar que la
+    convolución circular mezcle bordes opuestos
+    """
+    pad = int(np.ceil(3 * sigma))
+    padded = np.pad(raster, pad)
+    fy = np.fft.fftfreq(padded.shape[0])[:, None]
+    fx = np.fft.rfftfreq(padded.shape[1])[None, :]
+    # Transformada de Fourier de la gaussiana: se evita construir el kernel
+    transfer = np.exp(-2 * np.pi ** 2 * sigma ** 2 * (fx ** 2 + fy ** 2))
+    suavizado = np.fft.irfft2(np.fft.rfft2(padded) * transfer, s=padded.shape)
+    return np.clip(suavizado[pad:pad + raster.shape[0], pad:pad + raster.shape[1]], 0, None)
+
+def kde_grid(grid_counts, bandwidth, celda=CELDA_KDE):
+    """
+    Estimación de densidad de kernel (binned KDE) a partir de los conteos por
+    celda cuadrada de `grid_counts_for_filters(celda, 'cuadrada')`, ponderados
+    por 'cantidad'. Devuelve un array (ny, nx) en delitos por km², con la fila
+    0 al sur de la caja
+    """
+    q0, r0, nx, ny = raster_bounds(celda)
+    raster = np.zeros((ny, nx), dtype=np.float64)
+
+    ix = grid_counts['q'].to_numpy() - q0
+    iy = grid_counts['r'].to_numpy() - r0
+    dentro = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+    np.add.at(raster, (iy[dentro], ix[dentro]), grid_counts['cantidad'].to_numpy()[dentro])
+
+    densidad = gaussian_smooth(raster, bandwidth / celda)
+    return densidad * 1e6 / celda ** 2
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def kde_for_filters(tipo_delito=None, comuna=None, barrio=None, fecha_inicio=None, fecha_fin=None,
+                    bandwidth=300, celda=CELDA_KDE):
+    """
+    Raster de densidad para una combinación de filtros (cacheado por filtros)
+    """
+    from utils.geo_utils import grid_counts_for_filters
+
+    grid_counts = grid_counts_for_filters(
+        celda, 'cuadrada', tipo_delito, comuna, barrio, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+    )
+    report_progress(0.5, "suavizando")
+    return kde_grid(grid_counts, bandwidth, celda).astype(np.float32)
+
+def density_to_rgba(densidad, umbral=0.05):
+    """
+    Colorea el raster con la misma escala que el heatmap (azul -> lima -> rojo).
+    Las celdas por debajo del umbral (relativo al máximo) quedan transparentes.
+    Devuelve un array uint8 (ny, nx, 4) con la fila 0 al norte, listo para ImageOverlay
+    """
+    maximo = densidad.max()
+    valores = densidad / maximo if maximo > 0 else densidad
+
+    puntos = [0.0, 0.4, 0.65, 1.0]
+    colores = np.array([
+        [0, 0, 255],    # azul
+        [0, 0, 255],    # azul
+        [0, 255, 0],    # lima
+        [255, 0, 0],    # rojo
+    ], dtype=float)
+
+    rgba = np.zeros(valores.shape + (4,), dtype=np.uint8)
+    for canal in range(3):
+        rgba[..., canal] = np.interp(valores, puntos, colores[:, canal])
+    rgba[..., 3] = np.where(valores < umbral, 0, (0.35 + 0.65 * valores) * 255)
+
+    # La imagen se dibuja de arriba hacia abajo: la fila 0 debe ser el norte
+    return rgba[::-1]
@@ -0,0 +1,232 @@
+"""
+Prueba de carga sin navegador: simula N sesiones concurrentes sobre las
+páginas usando el runner de pruebas de Streamlit (streamlit.testing.v1.AppTest).
+
+Cada sesión corre en su propio proceso: AppTest guarda el registro de
+widgets en variables globales y dos sesiones en threads del mismo proceso se
+pisan los ids. Cada proceso tiene sus cachés, como los workers del modo
+multi-proceso (con DELITOS_SHARED_STORE los procesos usan el dataset
+publicado en memoria compartida, igual que esos workers): el resultado indica
+cuántas sesiones simultáneas soporta la máquina antes de que los reruns
+empiecen a demorarse. Antes de medir, cada proceso abre la página una vez
+para que la carga de datos no cuente como latencia.
+
+Cada sesión abre la página y luego hace una secuencia de cambios de filtros
+al azar (selectbox, multiselect y rango de fechas de la barra lateral, radios
+de la capa o la fuente del mapa).
+Por cada cantidad de sesiones se informa throughput, percentiles de latencia
+por rerun, uso de CPU y memoria. Los reruns que fallan se cuentan como
+errores y no entran en los percentiles.
+
+Uso:
+    python -m utils.loadtest --sesiones 1 2 4 8 --acciones 10
+    python -m utils.loadtest --paginas "pages/📊 Dashboard.py" --sesiones 1 4 16 --csv carga.csv
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import resource
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# Raíz del repo: AppTest.from_file resuelve las rutas relativas contra el
+# directorio del archivo que lo llama (utils/), no contra el directorio actual
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINAS = sorted(glob.glob(os.path.join(RAIZ, 'pages', '*.py')))
+TIMEOUT_RERUN = 120
+
+def current_rss_mb():
+    """
+    Memoria residente actual del proceso (MB)
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def cpu_seconds():
+    """
+    Tiempo de CPU (usuario + sistema) consumido por el proceso
+    """
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    return uso.ru_utime + uso.ru_stime
+
+def random_action(at, rng, iniciales):
+    """
+    Aplica un cambio al azar sobre los filtros de la barra lateral o los
+    radios del mapa.
+    `iniciales` guarda los valores de la primera ejecución (opciones
+    completas de multiselect y rango de fechas completo)
+    """
+    candidatos = []
+    candidatos += [('selectbox', w) for w in at.sidebar.selectbox if len(w.options) > 1]
+    candidatos += [('multiselect', w) for w in at.sidebar.multiselect if w.label in iniciales]
+    candidatos += [('fecha', w) for w in at.sidebar.date_input if w.label in iniciales]
+    candidatos += [('radio', w) for w in at.radio if len(w.options) > 1]
+    if not candidatos:
+        return False
+
+    tipo, widget = rng.choice(candidatos)
+    if tipo == 'selectbox':
+        widget.select_index(rng.randrange(len(widget.options)))
+    elif tipo == 'multiselect':
+        todos = iniciales[widget.label]
+        widget.set_value(rng.sample(todos, rng.randint(1, len(todos))))
+    elif tipo == 'fecha':
+        inicio, fin = iniciales[widget.label]
+        dias = (fin - inicio).days
+        desde = inicio + timedelta(days=rng.randint(0, max(dias - 1, 0)))
+        hasta = desde + timedelta(days=rng.randint(1, max((fin - desde).days, 1)))
+        widget.set_value((desde, min(hasta, fin)))
+    else:
+        widget.set_value(rng.choice(widget.options))
+    return True
+
+def run_session(pagina, acciones, semilla, timeout=TIMEOUT_RERUN):
+    """
+    Una sesión: carga la página y aplica `acciones` cambios de filtros.
+    Devuelve (latencias en segundos de los reruns exitosos, cantidad de errores)
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(semilla)
+    latencias = []
+    errores = 0
+
+    def rerun():
+        # Una falla del propio AppTest cuenta como error del rerun en lugar
+        # de cortar toda la prueba. Un rerun fallido no mide la página: su
+        # latencia no se registra
+        inicio = time.perf_counter()
+        try:
+            at.run()
+        except Exception:
+            return 1
+        if at.exception:
+            return 1
+        latencias.append(time.perf_counter() - inicio)
+        return 0
+
+    at = AppTest.from_file(pagina, default_timeout=timeout)
+    errores += rerun()
+
+    iniciales = {w.label: list(w.value) for w in at.sidebar.multiselect}
+    iniciales.update({w.label: tuple(w.value) for w in at.sidebar.date_input
+                      if isinstance(w.value, tuple) and len(w.value) == 2})
+
+    for _ in range(acciones):
+        if not random_action(at, rng, iniciales):
+            break
+        errores += rerun()
+    return latencias, errores
+
+def _session_process(pagina, acciones, semilla, barrera):
+    """
+    Proceso de una sesión: abre la página una vez (carga de datos y cachés),
+    espera a las demás sesiones y mide la suya. Devuelve un dict con las
+    latencias, los errores, el intervalo medido (reloj de pared), la CPU
+    usada y la memoria del proceso al empezar y en el pico
+    """
+    run_session(pagina, 0, semilla)
+    memoria_inicial = current_rss_mb()
+    memoria_pico = [memoria_inicial]
+    terminado = threading.Event()
+
+    def muestrear_memoria():
+        while not terminado.wait(0.2):
+            memoria_pico[0] = max(memoria_pico[0], current_rss_mb())
+
+    muestreo = threading.Thread(target=muestrear_memoria, daemon=True)
+    muestreo.start()
+
+    barrera.wait()
+    cpu_inicial = cpu_seconds()
+    inicio = time.time()
+    latencias, errores = run_session(pagina, acciones, semilla)
+    fin = time.time()
+    cpu = cpu_seconds() - cpu_inicial
+    terminado.set()
+    muestreo.join()
+    return {
+        'latencias': latencias, 'errores': errores, 'inicio': inicio, 'fin': fin, 'cpu': cpu,
+        'rss_inicial': memoria_inicial, 'rss_pico': max(memoria_pico[0], current_rss_mb())
+    }
+
+def run_load(pagina, sesiones, acciones, semilla=0):
+    """
+    Corre `sesiones` sesiones concurrentes sobre la página, una por proceso,
+    y mide el conjunto
+    """
+    # Con `python -m utils.loadtest` este módulo es __main__: los procesos
+    # reciben la función por su nombre importable
+    from utils.loadtest import _session_process
+
+    # spawn y no fork: el proceso padre puede tener threads de Streamlit
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=sesiones, mp_context=contexto) as executor:
+        barrera = manager.Barrier(sesiones)
+        resultados = list(executor.map(
+            _session_process, [pagina] * sesiones, [acciones] * sesiones,
+            [semilla + i for i in range(sesiones)], [barrera] * sesiones
+        ))
+
+    duracion = max(r['fin'] for r in resultados) - min(r['inicio'] for r in resultados)
+    latencias = np.array([l for r in resultados for l in r['latencias']])
+    percentil = (lambda p: np.percentile(latencias, p) * 1000) if len(latencias) else (lambda p: np.nan)
+    return {
+        'pagina': os.path.basename(pagina),
+        'sesiones': sesiones,
+        'reruns': len(latencias),
+        'errores': sum(r['errores'] for r in resultados),
+        'throughput_rps': len(latencias) / duracion,
+        'p50_ms': percentil(50),
+        'p90_ms': percentil(90),
+        'p99_ms': percentil(99),
+        'max_ms': percentil(100),
+        'cpu_pct': 100 * sum(r['cpu'] for r in resultados) / duracion,
+        'rss_pico_mb': sum(r['rss_pico'] for r in resultados),
+        'rss_por_sesion_mb': np.mean([r['rss_pico'] - r['rss_inicial'] for r in resultados])
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de las páginas (sin navegador)")
+    parser.add_argument('--paginas', nargs='+', default=PAGINAS)
+    parser.add_argument('--sesiones', nargs='+', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--acciones', type=int, default=10, help="Cambios de filtros por sesión")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--csv', help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    filas = []
+    for pagina in map(os.path.abspath, args.paginas):
+        # Una pasada previa genera los archivos derivados (copia Parquet,
+        # metadata) antes de que los procesos de las sesiones los necesiten
+        run_session(pagina, 0, args.semilla)
+        for sesiones in args.sesiones:
+            fila = run_load(pagina, sesiones, args.acciones, args.semilla)
+            filas.append(fila)
+            print(
+                f"{fila['pagina']:<28} sesiones={sesiones:<3} "
+                f"{fila['throughput_rps']:6.2f} reruns/s  "
+                f"p50={fila['p50_ms']:7.0f}ms p90={fila['p90_ms']:7.0f}ms p99={fila['p99_ms']:7.0f}ms  "
+                f"cpu={fila['cpu_pct']:5.0f}%  rss={fila['rss_pico_mb']:7.0f}MB  errores={fila['errores']}"
+            )
+
+    resultados = pd.DataFrame(filas)
+    if args.csv:
+        resultados.to_csv(args.csv, index=False)
+
+if __name__ == '__main__':
+    main()
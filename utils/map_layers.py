@@ -0,0 +1,137 @@
+"""
+Capas de folium que reciben los puntos codificados por utils/point_encoding.py
+y los decodifican en el navegador.
+
+Este módulo importa folium al cargarse: utils/maps.py lo importa dentro de
+las funciones que arman los mapas.
+"""
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import HeatMap, MarkerCluster
+from jinja2 import Template
+
+# Decodificador de varints en base64 (inverso de encode_varints). Se usa
+# aritmética de punto flotante para no desbordar los enteros de 32 bits de JS
+DECODIFICADOR_JS = """
+function decodificarVarints(b64, n) {
+    var bin = atob(b64), salida = new Float64Array(n);
+    var valor = 0, factor = 1, k = 0;
+    for (var i = 0; i < bin.length; i++) {
+        var b = bin.charCodeAt(i);
+        valor += (b & 0x7F) * factor;
+        if (b & 0x80) { factor *= 128; } else { salida[k++] = valor; valor = 0; factor = 1; }
+    }
+    return salida;
+}
+function decodificarPuntos(datos) {
+    var n = datos.n, zz = decodificarVarints(datos.coords, 2 * n);
+    var lat = new Float64Array(n), lon = new Float64Array(n), qlat = 0, qlon = 0;
+    for (var i = 0; i < n; i++) {
+        var a = zz[2 * i], b = zz[2 * i + 1];
+        qlat += (a % 2) ? -(a + 1) / 2 : a / 2;
+        qlon += (b % 2) ? -(b + 1) / 2 : b / 2;
+        lat[i] = qlat / datos.escala;
+        lon[i] = qlon / datos.escala;
+    }
+    var atributos = {};
+    for (var nombre in datos.atributos) {
+        atributos[nombre] = {
+            diccionario: datos.atributos[nombre].diccionario,
+            codigos: decodificarVarints(datos.atributos[nombre].codigos, n)
+        };
+    }
+    return {n: n, lat: lat, lon: lon, pesos: decodificarVarints(datos.pesos, n), atributos: atributos};
+}
+"""
+
+class EncodedHeatLayer(JSCSSMixin, Layer):
+    """
+    Heatmap (Leaflet.heat) a partir de un payload de puntos codificados, con
+    el peso de cada punto como intensidad
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                """ + DECODIFICADOR_JS + """
+                var p = decodificarPuntos({{ this.payload|tojson }});
+                var puntos = new Array(p.n);
+                for (var i = 0; i < p.n; i++) { puntos[i] = [p.lat[i], p.lon[i], p.pesos[i]]; }
+                return L.heatLayer(puntos, {{ this.options|tojson }});
+            })();
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """)
+
+    default_js = HeatMap.default_js
+
+    def __init__(self, payload, name=None, overlay=True, control=True, show=True, **opciones):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'EncodedHeatLayer'
+        self.payload = payload
+        self.options = opciones
+
+class EncodedMarkerLayer(JSCSSMixin, Layer):
+    """
+    Marcadores agrupados (Leaflet.markercluster) a partir de un payload de
+    puntos codificados. El popup de cada marcador se arma recién al hacer
+    click, leyendo los atributos de la fila en las tablas decodificadas.
+
+    - colores: dict valor de `columna_color` -> color del ícono
+    - campos: lista de (etiqueta, atributo) que muestra el popup
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                """ + DECODIFICADOR_JS + """
+                var p = decodificarPuntos({{ this.payload|tojson }});
+                var colores = {{ this.colores|tojson }};
+                var campos = {{ this.campos|tojson }};
+                var columnaColor = {{ this.columna_color|tojson }};
+                var grupo = L.markerClusterGroup({{ this.options|tojson }});
+                var iconos = {};
+
+                function valor(nombre, i) {
+                    var a = p.atributos[nombre];
+                    return nombre === 'cantidad' ? p.pesos[i] : a.diccionario[a.codigos[i]];
+                }
+                function icono(color) {
+                    if (!iconos[color]) {
+                        iconos[color] = L.AwesomeMarkers.icon(
+                            {icon: 'info-sign', markerColor: color, iconColor: 'white', prefix: 'glyphicon'}
+                        );
+                    }
+                    return iconos[color];
+                }
+
+                var marcadores = new Array(p.n);
+                for (var i = 0; i < p.n; i++) {
+                    var categoria = valor(columnaColor, i);
+                    var m = L.marker([p.lat[i], p.lon[i]], {icon: icono(colores[categoria] || 'purple')});
+                    m.fila = i;
+                    m.bindTooltip(String(categoria));
+                    m.bindPopup(function(capa) {
+                        return campos.map(function(c) {
+                            return '<b>' + c[0] + ':</b> ' + valor(c[1], capa.fila);
+                        }).join('<br>');
+                    }, {maxWidth: 300});
+                    marcadores[i] = m;
+                }
+                grupo.addLayers(marcadores);
+                return grupo;
+            })();
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """)
+
+    default_js = MarkerCluster.default_js
+    default_css = MarkerCluster.default_css
+
+    def __init__(self, payload, colores, campos, columna_color='tipo', name=None,
+                 overlay=True, control=True, show=True, **opciones):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'EncodedMarkerLayer'
+        self.payload = payload
+        self.colores = colores
+        self.campos = campos
+        self.columna_color = columna_color
+        self.options = opciones
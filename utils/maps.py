@@ -0,0 +1,314 @@
+import streamlit as st
+from utils.geo_utils import grid_to_geojson
+from utils.jobs import report_progress
+
+# folium se importa dentro de cada función: las páginas que importan este
+# módulo no lo cargan hasta construir un mapa
+
+# Centro de CABA usado por todos los mapas
+CENTRO_CABA = [-34.6037, -58.3816]
+
+# Colores por tipo de delito
+COLORES_TIPO = {
+    'Hurto': 'red',
+    'Robo': 'blue',
+    'Lesiones': 'green',
+    'Homicidio': 'black',
+    'Violencia': 'orange',
+    'Otros': 'gray'
+}
+
+def obtener_color(tipo):
+    """
+    Devuelve el color del marcador según el tipo de delito
+    """
+    for key, color in COLORES_TIPO.items():
+        if key in tipo:
+            return color
+    return 'purple'  # Color por defecto
+
+def base_map(geojson):
+    """
+    Crea un mapa centrado en CABA con los límites de las comunas
+    (transparente con borde azul)
+    """
+    import folium
+
+    m = folium.Map(location=CENTRO_CABA, zoom_start=11)
+
+    folium.GeoJson(
+        geojson,
+        style_function=lambda feature: {
+            'fillColor': 'blue',
+            'color': 'blue',
+            'weight': 2,
+            'fillOpacity': 0.1,  # Muy transparente
+            'opacity': 0.7
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=['nombre'],
+            aliases=['Comuna:'],
+            localize=True
+        ),
+        name="Límites de Comunas"
+    ).add_to(m)
+
+    return m
+
+# Los mapas se cachean por combinación de filtros (argumento "filtros"): los
+# argumentos con guión bajo no se hashean, así que un rerun con los mismos
+# filtros reutiliza el mapa ya construido en lugar de recorrer todas las filas.
+@st.cache_resource(max_entries=16, show_spinner=False)
+def build_cluster_map(_df_map, _geojson, filtros):
+    """
+    Construye el mapa de clusters de marcadores para los filtros dados.
+    Los puntos viajan codificados (ver utils/point_encoding.py) y el popup de
+    cada marcador se arma en el navegador al hacer click
+    """
+    import folium
+    from utils.map_layers import EncodedMarkerLayer
+    from utils.point_encoding import encode_point_payload
+
+    m = base_map(_geojson)
+
+    mensaje = f"{len(_df_map):,} marcadores"
+    report_progress(0.1, mensaje)
+    # report_progress corta la codificación si el trabajo se cancela
+    payload = encode_point_payload(
+        _df_map, atributos=['tipo', 'barrio', 'comuna', 'fecha', 'franja'],
+        progreso=lambda fraccion: report_progress(0.1 + 0.8 * fraccion, mensaje)
+    )
+    colores = {tipo: obtener_color(tipo) for tipo in payload['atributos']['tipo']['diccionario']}
+
+    EncodedMarkerLayer(
+        payload,
+        colores=colores,
+        campos=[('Tipo', 'tipo'), ('Barrio', 'barrio'), ('Comuna', 'comuna'),
+                ('Fecha', 'fecha'), ('Franja', 'franja'), ('Cantidad', 'cantidad')],
+        name="Delitos",
+        maxClusterRadius=50,  # Radio máximo para clustering
+        disableClusteringAtZoom=18,  # Desactivar clustering a alto zoom
+        chunkedLoading=True
+    ).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+@st.cache_resource(max_entries=16)
+def build_heat_map(_df_map, _geojson, filtros):
+    """
+    Construye el mapa de calor para los filtros dados
+    """
+    import folium
+    from utils.map_layers import EncodedHeatLayer
+    from utils.point_encoding import encode_point_payload
+
+    m = base_map(_geojson)
+
+    # Un punto por coordenada (~1 m) con la cantidad de delitos como peso, en
+    # lugar de repetir el punto una vez por delito
+    EncodedHeatLayer(
+        encode_point_payload(_df_map, agrupar=True),
+        name="Mapa de calor",
+        minOpacity=0.2,
+        maxZoom=18,
+        radius=15,
+        blur=15,
+        gradient={0.4: 'blue', 0.65: 'lime', 1: 'red'}
+    ).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+@st.cache_resource(max_entries=16)
+def build_grid_map(_grid_counts, _geojson, filtros, tamano, forma='hex'):
+    """
+    Construye el mapa con la grilla espacial (hexágonos o cuadrados) coloreada
+    según la cantidad de delitos de cada celda
+    """
+    import branca.colormap as cm
+    import folium
+
+    m = base_map(_geojson)
+    grid_geojson = grid_to_geojson(_grid_counts, tamano, forma)
+
+    cantidades = [f['properties']['cantidad'] for f in grid_geojson['features']]
+    colormap = cm.LinearColormap(
+        ['blue', 'lime', 'red'],
+        vmin=0,
+        vmax=max(cantidades) if cantidades else 1,
+        caption='Cantidad de delitos por celda'
+    )
+
+    folium.GeoJson(
+        grid_geojson,
+        style_function=lambda feature: {
+            'fillColor': colormap(feature['properties']['cantidad']),
+            'color': colormap(feature['properties']['cantidad']),
+            'weight': 0.5,
+            'fillOpacity': 0.6
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=['cantidad'],
+            aliases=['Delitos:'],
+            localize=True
+        ),
+        name="Grilla espacial"
+    ).add_to(m)
+    colormap.add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+@st.cache_resource(max_entries=16)
+def build_kde_map(_densidad, _geojson, filtros):
+    """
+    Construye el mapa con la densidad KDE calculada en el servidor como una
+    imagen superpuesta (tamaño constante, independiente de la cantidad de puntos)
+    """
+    import folium
+    from utils.kde import density_to_rgba, raster_latlon_bounds
+
+    m = base_map(_geojson)
+
+    folium.raster_layers.ImageOverlay(
+        image=density_to_rgba(_densidad),
+        bounds=raster_latlon_bounds(),
+        # El raster es lineal en latitud: folium lo reproyecta a Web Mercator
+        mercator_project=True,
+        opacity=0.75,
+        name="Densidad (KDE)"
+    ).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+# Colores de las categorías de Gi* (rojos: hotspots, azules: coldspots)
+COLORES_HOTSPOT = {
+    'Hotspot 99%': '#b2182b',
+    'Hotspot 95%': '#ef8a62',
+    'Hotspot 90%': '#fddbc7',
+    'Coldspot 90%': '#d1e5f0',
+    'Coldspot 95%': '#67a9cf',
+    'Coldspot 99%': '#2166ac'
+}
+
+@st.cache_resource(max_entries=16)
+def build_hotspot_map(_hotspots, _geojson, filtros, tamano):
+    """
+    Construye el mapa con las celdas significativas del análisis Gi*
+    """
+    import folium
+    from utils.hotspots import hotspots_to_geojson
+
+    m = base_map(_geojson)
+
+    folium.GeoJson(
+        hotspots_to_geojson(_hotspots, tamano),
+        style_function=lambda feature: {
+            'fillColor': COLORES_HOTSPOT[feature['properties']['categoria']],
+            'color': COLORES_HOTSPOT[feature['properties']['categoria']],
+            'weight': 0.5,
+            'fillOpacity': 0.7
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=['categoria', 'z', 'cantidad', 'barrio'],
+            aliases=['Categoría:', 'Gi* (z):', 'Delitos:', 'Barrio:'],
+            localize=True
+        ),
+        name="Hotspots (Gi*)"
+    ).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+@st.cache_resource(max_entries=16)
+def build_dbscan_map(_envolventes, _geojson, filtros):
+    """
+    Construye el mapa con las envolventes convexas de los clusters DBSCAN
+    """
+    import folium
+
+    m = base_map(_geojson)
+
+    folium.GeoJson(
+        _envolventes,
+        style_function=lambda feature: {
+            'fillColor': obtener_color(feature['properties']['tipo']),
+            'color': obtener_color(feature['properties']['tipo']),
+            'weight': 2,
+            'fillOpacity': 0.35
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=['cluster', 'delitos', 'tipo', 'franja'],
+            aliases=['Cluster:', 'Delitos:', 'Tipo dominante:', 'Franja dominante:'],
+            localize=True
+        ),
+        name="Clusters (DBSCAN)"
+    ).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+def _fecha_a_entero(fecha, formato):
+    """
+    Fecha como entero AAAAMMDD (o AAAAMM), el formato de los atributos de las teselas
+    """
+    return int(fecha.strftime(formato)) if fecha else None
+
+@st.cache_resource(max_entries=16)
+def build_tiles_map(tiles_url, _geojson, filtros):
+    """
+    Construye el mapa de puntos servido como vector tiles: el HTML sólo lleva
+    la URL de las teselas y el estilo, el navegador descarga las teselas
+    visibles. Los filtros se aplican en el cliente sobre los atributos
+    """
+    import json
+
+    import folium
+    from folium.plugins import VectorGridProtobuf
+
+    tipo, comuna, barrio, fecha_rango = filtros
+    fecha_inicio, fecha_fin = fecha_rango if len(fecha_rango) == 2 else (None, None)
+
+    m = folium.Map(location=CENTRO_CABA, zoom_start=11)
+
+    condiciones = {
+        'tipo': tipo if tipo and tipo != "Todos" else None,
+        'comuna': comuna if comuna and comuna != "Todas" else None,
+        'barrio': barrio if barrio and barrio != "Todos" else None,
+        'desde': _fecha_a_entero(fecha_inicio, '%Y%m%d'),
+        'hasta': _fecha_a_entero(fecha_fin, '%Y%m%d'),
+        'mesDesde': _fecha_a_entero(fecha_inicio, '%Y%m'),
+        'mesHasta': _fecha_a_entero(fecha_fin, '%Y%m')
+    }
+    # Las teselas de zoom bajo sólo tienen mes (puntos agregados); las de
+    # detalle tienen la fecha exacta
+    estilo_delitos = f"""function(p, zoom) {{
+        var f = {json.dumps(condiciones)};
+        var colores = {json.dumps(COLORES_TIPO)};
+        var visible = (!f.tipo || p.tipo === f.tipo)
+            && (!f.comuna || p.comuna === f.comuna)
+            && (!f.barrio || p.barrio === f.barrio)
+            && (p.fecha !== undefined
+                ? (!f.desde || p.fecha >= f.desde) && (!f.hasta || p.fecha <= f.hasta)
+                : (!f.mesDesde || p.mes >= f.mesDesde) && (!f.mesHasta || p.mes <= f.mesHasta));
+        if (!visible) {{ return {{radius: 0, stroke: false, fill: false}}; }}
+        var color = 'purple';
+        for (var k in colores) {{ if (p.tipo.indexOf(k) >= 0) {{ color = colores[k]; break; }} }}
+        return {{radius: Math.min(3 + Math.sqrt(p.cantidad), 12), color: color, weight: 1,
+                 fill: true, fillColor: color, fillOpacity: 0.6}};
+    }}"""
+    opciones = f"""{{
+        "vectorTileLayerStyles": {{
+            "comunas": {{"color": "blue", "weight": 2, "opacity": 0.7, "fill": true,
+                         "fillColor": "blue", "fillOpacity": 0.1}},
+            "delitos": {estilo_delitos}
+        }},
+        "maxNativeZoom": 16
+    }}"""
+
+    VectorGridProtobuf(tiles_url, "Delitos (vector tiles)", opciones).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
@@ -0,0 +1,157 @@
+"""
+Codificación compacta de puntos para enviar al navegador.
+
+En lugar de listas JSON de floats con precisión completa, los puntos viajan
+así:
+- coordenadas cuantizadas a 1e-5 grados (~1 m), ordenadas en curva Z
+  (Morton) para que puntos cercanos queden seguidos
+- diferencias entre puntos consecutivos en zigzag + varint (1-3 bytes por
+  coordenada en lugar de ~18 caracteres)
+- atributos (tipo, barrio, fecha, ...) como códigos varint contra un
+  diccionario que viaja una sola vez
+- todo en base64 dentro del HTML del mapa
+
+El decodificador JavaScript correspondiente está en utils/map_layers.py.
+"""
+import base64
+
+import numpy as np
+import pandas as pd
+
+# 1e-5 grados: ~1,1 m en latitud y ~0,9 m en longitud en CABA
+ESCALA = 100_000
+# Valores por bloque al codificar varints (entre bloques se informa el avance)
+BLOQUE_VARINTS = 1 << 18
+
+def quantize(valores):
+    """
+    Coordenadas en grados a enteros en unidades de 1/ESCALA grados
+    """
+    return np.round(np.asarray(valores, dtype=float) * ESCALA).astype(np.int64)
+
+def _spread_bits(v):
+    """
+    Intercala ceros entre los bits de v (32 bits -> 64 bits) para la curva Z
+    """
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for desplazamiento, mascara in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                                    (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333),
+                                    (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(desplazamiento))) & np.uint64(mascara)
+    return v
+
+def morton_order(qlat, qlon):
+    """
+    Permutación que ordena los puntos según la curva Z
+    """
+    if len(qlat) == 0:
+        return np.arange(0)
+    clave = _spread_bits(qlat - qlat.min()) | (_spread_bits(qlon - qlon.min()) << np.uint64(1))
+    return np.argsort(clave, kind='stable')
+
+def zigzag(v):
+    """
+    Enteros con signo a sin signo intercalados (0, -1, 1, -2, ...) para que
+    las diferencias chicas negativas también ocupen pocos bytes
+    """
+    v = np.asarray(v, dtype=np.int64)
+    return ((v << 1) ^ (v >> 63)).astype(np.uint64)
+
+def encode_varints(valores, al_bloque=None):
+    """
+    Codifica enteros sin signo como varints (LEB128), vectorizado por
+    bloques de BLOQUE_VARINTS valores. `al_bloque(fraccion)` se llama después
+    de cada bloque (p. ej. para informar el avance o cortar un trabajo
+    cancelado). Devuelve bytes
+    """
+    valores = np.asarray(valores, dtype=np.uint64)
+    if len(valores) <= BLOQUE_VARINTS:
+        datos = _encode_varints_block(valores)
+        if al_bloque is not None:
+            al_bloque(1.0)
+        return datos
+    partes = []
+    for inicio in range(0, len(valores), BLOQUE_VARINTS):
+        partes.append(_encode_varints_block(valores[inicio:inicio + BLOQUE_VARINTS]))
+        if al_bloque is not None:
+            al_bloque(min(inicio + BLOQUE_VARINTS, len(valores)) / len(valores))
+    return b''.join(partes)
+
+def _encode_varints_block(valores):
+    if len(valores) == 0:
+        return b''
+    bytes_por_valor = np.ones(len(valores), dtype=np.int64)
+    for k in range(1, 10):
+        bytes_por_valor += valores >= np.uint64(1 << (7 * k))
+    inicio = np.concatenate([[0], np.cumsum(bytes_por_valor)[:-1]])
+
+    salida = np.zeros(int(bytes_por_valor.sum()), dtype=np.uint8)
+    for k in range(int(bytes_por_valor.max())):
+        presentes = bytes_por_valor > k
+        byte = (valores[presentes] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        continua = bytes_por_valor[presentes] > k + 1
+        salida[inicio[presentes] + k] = (byte | np.where(continua, 0x80, 0).astype(np.uint64)).astype(np.uint8)
+    return salida.tobytes()
+
+def _b64(datos):
+    return base64.b64encode(datos).decode('ascii')
+
+def encode_dictionary(serie, al_bloque=None):
+    """
+    Columna como (diccionario de valores, códigos varint en base64)
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        categorica = pd.Categorical(serie.dt.normalize())
+        diccionario = categorica.categories.strftime('%Y-%m-%d').tolist()
+    else:
+        categorica = pd.Categorical(serie)
+        diccionario = [v.item() if hasattr(v, 'item') else v for v in categorica.categories]
+    return {'diccionario': diccionario, 'codigos': _b64(encode_varints(categorica.codes.astype(np.int64), al_bloque))}
+
+def encode_point_payload(df, atributos=(), peso='cantidad', agrupar=False, progreso=None):
+    """
+    Payload compacto (dict serializable a JSON) de los puntos del DataFrame.
+
+    - atributos: columnas que viajan por punto (para tooltips y popups)
+    - peso: columna entera con la intensidad de cada punto
+    - agrupar: suma los pesos de los puntos que caen en la misma coordenada
+      cuantizada (para el heatmap, donde no hay atributos por punto)
+    - progreso: función que recibe el avance (0 a 1) durante la codificación
+    """
+    qlat = quantize(df['latitud'].to_numpy())
+    qlon = quantize(df['longitud'].to_numpy())
+    pesos = df[peso].to_numpy(dtype=np.int64)
+    filas = df
+
+    if agrupar:
+        agrupado = (
+            pd.DataFrame({'qlat': qlat, 'qlon': qlon, 'peso': pesos})
+            .groupby(['qlat', 'qlon'], sort=False)['peso'].sum()
+            .reset_index()
+        )
+        qlat, qlon = agrupado['qlat'].to_numpy(), agrupado['qlon'].to_numpy()
+        pesos = agrupado['peso'].to_numpy()
+        atributos = ()
+
+    orden = morton_order(qlat, qlon)
+    qlat, qlon, pesos = qlat[orden], qlon[orden], pesos[orden]
+    deltas = np.column_stack([np.diff(qlat, prepend=0), np.diff(qlon, prepend=0)]).ravel()
+
+    # Una etapa por columna codificada: coordenadas, pesos y cada atributo
+    etapas = 2 + len(atributos)
+
+    def etapa(i):
+        if progreso is None:
+            return None
+        return lambda fraccion: progreso((i + fraccion) / etapas)
+
+    return {
+        'n': int(len(qlat)),
+        'escala': ESCALA,
+        'coords': _b64(encode_varints(zigzag(deltas), etapa(0))),
+        'pesos': _b64(encode_varints(np.clip(pesos, 0, None), etapa(1))),
+        'atributos': {
+            columna: encode_dictionary(filas[columna].iloc[orden], etapa(2 + i))
+            for i, columna in enumerate(atributos)
+        }
+    }
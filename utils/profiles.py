@@ -0,0 +1,92 @@
+"""
+Perfiles temporales (día de la semana x franja horaria) de cada barrio y
+comuna, y búsqueda de zonas con un patrón parecido.
+
+Los perfiles se calculan una sola vez para todo el dataset en un tensor
+float32 de forma (unidades, 7, franjas) con un único bincount. Cada perfil
+se normaliza a norma L2 = 1, así la similitud coseno entre una zona y todas
+las demás es un producto matriz-vector.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.charts import DIAS_ORDEN
+from utils.data_loader import DATA_PATH, load_data
+
+# Niveles espaciales con perfil: etiqueta -> columna del dataset
+NIVELES = {'Barrio': 'barrio', 'Comuna': 'comuna'}
+
+def build_profiles(df, columna):
+    """
+    Tensor de perfiles de las unidades de `columna`. Devuelve un dict con
+    'unidades', 'franjas', 'totales' (delitos por unidad) y 'perfiles'
+    (float32, unidades x 7 x franjas, cada perfil con norma L2 = 1)
+    """
+    unidad = pd.Categorical(df[columna])
+    dia = pd.Categorical(df['dia'], categories=DIAS_ORDEN)
+    franja = pd.Categorical(df['franja'])
+    validas = (unidad.codes >= 0) & (dia.codes >= 0) & (franja.codes >= 0)
+
+    forma = (len(unidad.categories), len(DIAS_ORDEN), len(franja.categories))
+    indice = np.ravel_multi_index(
+        (unidad.codes[validas], dia.codes[validas], franja.codes[validas]), forma
+    )
+    conteos = np.bincount(
+        indice, weights=df['cantidad'].to_numpy(dtype=np.float64)[validas], minlength=int(np.prod(forma))
+    ).reshape(forma[0], -1)
+
+    normas = np.linalg.norm(conteos, axis=1, keepdims=True)
+    perfiles = np.divide(conteos, normas, out=np.zeros_like(conteos), where=normas > 0)
+    return {
+        'unidades': unidad.categories.tolist(),
+        'franjas': franja.categories.tolist(),
+        'totales': conteos.sum(axis=1).astype(np.int64),
+        'perfiles': perfiles.astype(np.float32).reshape(forma)
+    }
+
+@st.cache_resource(max_entries=4)
+def load_profiles(columna, version):
+    """
+    Perfiles de un nivel espacial para una versión del dataset (se calculan
+    una vez y se comparten entre sesiones: no se modifican)
+    """
+    df = load_data([columna, 'dia', 'franja', 'cantidad'])
+    if df is None or df.empty:
+        return None
+    return build_profiles(df, columna)
+
+def profiles_for_level(nivel):
+    """
+    Perfiles del nivel ('Barrio' o 'Comuna') del dataset actual
+    """
+    version = os.path.getmtime(DATA_PATH) if os.path.exists(DATA_PATH) else None
+    return load_profiles(NIVELES[nivel], version)
+
+def similar_units(perfiles, unidad, k=10):
+    """
+    Las k unidades con el patrón temporal más parecido al de `unidad`
+    (similitud coseno), sin incluirla. DataFrame (unidad, similitud, delitos)
+    """
+    i = perfiles['unidades'].index(unidad)
+    matriz = perfiles['perfiles'].reshape(len(perfiles['unidades']), -1)
+    similitud = matriz @ matriz[i]
+    similitud[i] = -np.inf
+
+    k = min(k, len(similitud) - 1)
+    mejores = np.argpartition(-similitud, k - 1)[:k] if k > 0 else np.arange(0)
+    mejores = mejores[np.argsort(-similitud[mejores])]
+    return pd.DataFrame({
+        'unidad': [perfiles['unidades'][j] for j in mejores],
+        'similitud': similitud[mejores].astype(float).round(3),
+        'delitos': perfiles['totales'][mejores]
+    })
+
+def profile_matrix(perfiles, unidad):
+    """
+    Perfil normalizado de una unidad como DataFrame día x franja (para el
+    mapa de calor)
+    """
+    i = perfiles['unidades'].index(unidad)
+    return pd.DataFrame(perfiles['perfiles'][i], index=DIAS_ORDEN, columns=perfiles['franjas'])
@@ -0,0 +1,184 @@
+"""
+Dataset compartido entre procesos (modo multi-proceso).
+
+Un proceso cargador publica el dataset y las tablas de conteos por celda en un
+segmento de memoria compartida (formato columnar: números tal cual, fechas
+como int64 y textos como códigos de categoría). Cada worker de Streamlit se
+adjunta en sólo lectura y arma los DataFrames sobre ese buffer sin copiarlo,
+así la memoria no crece con la cantidad de workers.
+
+Uso:
+    python -m utils.shared_store publish            # queda corriendo
+    DELITOS_SHARED_STORE=data/delitos_2024_clean.shm.json streamlit run app.py --server.port 8501
+    DELITOS_SHARED_STORE=data/delitos_2024_clean.shm.json streamlit run app.py --server.port 8502
+"""
+import argparse
+import json
+import os
+import signal
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MANIFEST_PATH = 'data/delitos_2024_clean.shm.json'
+# Si está definida, las páginas leen el dataset desde la memoria compartida
+SHARED_STORE_MANIFEST = os.environ.get('DELITOS_SHARED_STORE')
+
+# Cada columna empieza en un múltiplo de 64 bytes (alineación para NumPy)
+ALINEACION = 64
+
+def encode_column(serie):
+    """
+    Representación columnar de una Serie: (array contiguo, descripción).
+    Los textos y categorías se guardan como códigos con la lista de categorías
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype == object:
+        categorica = pd.Categorical(serie)
+        return categorica.codes, {'clase': 'categoria', 'categorias': categorica.categories.tolist()}
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.to_numpy('datetime64[ns]').view('int64'), {'clase': 'fecha'}
+    return np.ascontiguousarray(serie.to_numpy()), {'clase': 'numero'}
+
+def decode_column(array, descripcion):
+    """
+    Arma la columna a partir del array compartido sin copiarlo
+    """
+    if descripcion['clase'] == 'categoria':
+        tipo = pd.CategoricalDtype(descripcion['categorias'])
+        return pd.Categorical.from_codes(array, dtype=tipo)
+    if descripcion['clase'] == 'fecha':
+        return array.view('datetime64[ns]')
+    return array
+
+def publish_tables(tablas):
+    """
+    Copia las tablas (dict nombre -> DataFrame) a un segmento de memoria
+    compartida nuevo. Devuelve (segmento, manifest)
+    """
+    columnas = {}
+    desplazamiento = 0
+    for nombre, df in tablas.items():
+        columnas[nombre] = []
+        for columna in df.columns:
+            array, descripcion = encode_column(df[columna])
+            columnas[nombre].append((columna, array, descripcion, desplazamiento))
+            desplazamiento += -(-array.nbytes // ALINEACION) * ALINEACION
+
+    segmento = shared_memory.SharedMemory(create=True, size=max(desplazamiento, 1))
+    manifest = {'segmento': segmento.name, 'tablas': {}}
+    for nombre, df in tablas.items():
+        descripciones = []
+        for columna, array, descripcion, inicio in columnas[nombre]:
+            destino = np.ndarray(array.shape, dtype=array.dtype, buffer=segmento.buf, offset=inicio)
+            destino[:] = array
+            descripciones.append(dict(descripcion, nombre=columna, dtype=array.dtype.str, inicio=inicio))
+        manifest['tablas'][nombre] = {'filas': len(df), 'columnas': descripciones}
+    return segmento, manifest
+
+def attach_segment(nombre):
+    """
+    Se adjunta a un segmento existente sin registrarlo en el resource_tracker
+    (si no, el tracker lo borraría al terminar el worker)
+    """
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        # Python < 3.13: no existe track=False
+        segmento = shared_memory.SharedMemory(name=nombre)
+        resource_tracker.unregister(segmento._name, 'shared_memory')
+        return segmento
+
+def attach_tables(manifest):
+    """
+    DataFrames de sólo lectura construidos sobre el segmento compartido.
+    Devuelve (segmento, tablas); el segmento debe mantenerse vivo mientras se
+    usen las tablas
+    """
+    segmento = attach_segment(manifest['segmento'])
+    tablas = {}
+    for nombre, tabla in manifest['tablas'].items():
+        datos = {}
+        for descripcion in tabla['columnas']:
+            array = np.ndarray((tabla['filas'],), dtype=np.dtype(descripcion['dtype']),
+                               buffer=segmento.buf, offset=descripcion['inicio'])
+            array.flags.writeable = False
+            datos[descripcion['nombre']] = decode_column(array, descripcion)
+        # copy=False: cada columna queda como su propio bloque sobre el buffer
+        tablas[nombre] = pd.DataFrame(datos, copy=False)
+    return segmento, tablas
+
+@st.cache_resource
+def load_shared_store(manifest_path):
+    """
+    Se adjunta una vez por proceso al dataset publicado
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    segmento, tablas = attach_tables(manifest)
+    return {'segmento': segmento, 'tablas': tablas}
+
+def shared_table(nombre):
+    """
+    Tabla publicada en memoria compartida, o None si no se usa el modo
+    multi-proceso (o la tabla no fue publicada)
+    """
+    if not SHARED_STORE_MANIFEST:
+        return None
+    return load_shared_store(SHARED_STORE_MANIFEST)['tablas'].get(nombre)
+
+def grid_table_name(tamano, forma):
+    """
+    Nombre de la tabla de celdas por fila de una resolución de grilla
+    """
+    return f'grilla_{forma}_{tamano}'
+
+def main():
+    parser = argparse.ArgumentParser(description="Publica el dataset de delitos en memoria compartida")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    publish = sub.add_parser('publish', help="Publica el dataset y queda corriendo hasta recibir SIGTERM/SIGINT")
+    publish.add_argument('--manifest', default=MANIFEST_PATH)
+    publish.add_argument('--sin-grillas', action='store_true',
+                         help="No publicar las tablas de celdas de la grilla")
+    args = parser.parse_args()
+
+    from utils.data_loader import load_csv_data
+    from utils.geo_utils import RESOLUCIONES_GRILLA, compute_grid_cells
+    from utils.kde import CELDA_KDE
+
+    df = load_csv_data()
+    if df is None:
+        raise SystemExit("No se pudo cargar el dataset")
+    tablas = {'delitos': df}
+    if not args.sin_grillas:
+        grillas = [(tamano, forma) for tamano in RESOLUCIONES_GRILLA.values() for forma in ('hex', 'cuadrada')]
+        # La grilla fina sobre la que se calcula el KDE (utils/kde.py)
+        grillas.append((CELDA_KDE, 'cuadrada'))
+        for tamano, forma in grillas:
+            tablas[grid_table_name(tamano, forma)] = compute_grid_cells(df, tamano, forma)
+
+    segmento, manifest = publish_tables(tablas)
+    with open(args.manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    print(f"Dataset publicado en el segmento {segmento.name} ({segmento.size / 1e6:.1f} MB)")
+    print(f"Workers: DELITOS_SHARED_STORE={args.manifest} streamlit run app.py --server.port <puerto>")
+
+    def terminar(*_):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminar)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.manifest):
+            os.remove(args.manifest)
+        segmento.close()
+        segmento.unlink()
+
+if __name__ == '__main__':
+    main()
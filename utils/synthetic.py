@@ -0,0 +1,295 @@
+"""
+Generador de datasets sintéticos de delitos de CABA para pruebas de escala.
+
+Produce archivos con el mismo esquema que espera load_data (fecha, tipo,
+barrio, comuna, dia, mes, franja, latitud, longitud, cantidad) y de cualquier
+tamaño: las filas se generan y se escriben por bloques, así la memoria queda
+acotada por el tamaño del bloque y no por el total.
+
+- Los puntos caen dentro de los polígonos de data/caba.json (o de los barrios
+  de data/barrios.json si está disponible), una parte alrededor de unos pocos
+  focos por barrio para que los mapas de clusters y de densidad tengan
+  estructura.
+- Tipo, franja horaria, barrio y día de la semana siguen distribuciones
+  sesgadas fijas (pocos tipos y barrios concentran la mayoría de los casos,
+  picos de tarde y noche).
+- Con la misma semilla y el mismo tamaño de bloque el archivo es idéntico.
+
+Uso:
+    python -m utils.synthetic --filas 1000000 [--salida data/delitos_2024_clean.csv]
+    python -m utils.synthetic --filas 50000000 --salida data/delitos_50m.parquet --bloque 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from utils.charts import DIAS_ORDEN, MESES_ORDEN
+from utils.data_loader import DATA_PATH
+from utils.geo_utils import BARRIOS_PATH
+from utils.validation import LIMITES_PATH
+
+# Tipos de delito y su peso relativo
+TIPOS = {
+    'Robo': 0.38,
+    'Hurto': 0.33,
+    'Amenazas': 0.14,
+    'Lesiones': 0.12,
+    'Vialidad': 0.027,
+    'Homicidios': 0.003
+}
+
+# Peso relativo de cada hora del día (franja 0 a 23)
+PESOS_FRANJA = [
+    2.6, 2.0, 1.6, 1.3, 1.2, 1.5, 2.4, 3.4, 4.2, 4.5, 4.6, 4.8,
+    5.2, 5.0, 4.8, 4.9, 5.1, 5.4, 6.0, 6.2, 5.8, 4.9, 4.0, 3.2
+]
+
+# Peso relativo de cada día de la semana (lunes a domingo)
+PESOS_DIA = [1.04, 1.05, 1.05, 1.05, 1.10, 0.92, 0.79]
+
+# Barrios por comuna (nombres normalizados como en utils.geo_utils.normalize_nombre).
+# Se usan cuando no hay GeoJSON de barrios
+BARRIOS_POR_COMUNA = {
+    1: ['RETIRO', 'SAN NICOLAS', 'PUERTO MADERO', 'SAN TELMO', 'MONSERRAT', 'CONSTITUCION'],
+    2: ['RECOLETA'],
+    3: ['BALVANERA', 'SAN CRISTOBAL'],
+    4: ['BOCA', 'BARRACAS', 'PARQUE PATRICIOS', 'NUEVA POMPEYA'],
+    5: ['ALMAGRO', 'BOEDO'],
+    6: ['CABALLITO'],
+    7: ['FLORES', 'PARQUE CHACABUCO'],
+    8: ['VILLA SOLDATI', 'VILLA RIACHUELO', 'VILLA LUGANO'],
+    9: ['LINIERS', 'MATADEROS', 'PARQUE AVELLANEDA'],
+    10: ['VILLA REAL', 'MONTE CASTRO', 'VERSALLES', 'FLORESTA', 'VELEZ SARSFIELD', 'VILLA LURO'],
+    11: ['VILLA GENERAL MITRE', 'VILLA DEVOTO', 'VILLA DEL PARQUE', 'VILLA SANTA RITA'],
+    12: ['COGHLAN', 'SAAVEDRA', 'VILLA URQUIZA', 'VILLA PUEYRREDON'],
+    13: ['NUNEZ', 'BELGRANO', 'COLEGIALES'],
+    14: ['PALERMO'],
+    15: ['CHACARITA', 'VILLA CRESPO', 'PATERNAL', 'VILLA ORTUZAR', 'AGRONOMIA', 'PARQUE CHAS']
+}
+
+# Barrios con más delitos, en orden: encabezan la distribución de Zipf
+BARRIOS_PRINCIPALES = [
+    'PALERMO', 'BALVANERA', 'SAN NICOLAS', 'FLORES', 'CABALLITO', 'RECOLETA', 'MONSERRAT',
+    'BARRACAS', 'ALMAGRO', 'VILLA LUGANO', 'RETIRO', 'CONSTITUCION', 'BELGRANO', 'SAN CRISTOBAL'
+]
+# Exponente de la distribución de Zipf entre barrios
+EXPONENTE_BARRIOS = 0.9
+
+# Fracción de puntos alrededor de los focos de cada barrio, cantidad de focos
+# y dispersión alrededor de cada foco (grados, ~200 m)
+FRACCION_FOCOS = 0.4
+FOCOS_POR_BARRIO = 3
+DISPERSION_FOCO = 0.002
+
+# Probabilidad de cada valor de `cantidad` (1, 2, 3)
+PESOS_CANTIDAD = [0.95, 0.04, 0.01]
+
+BLOQUE = 500_000
+
+def _probabilidades(pesos):
+    pesos = np.asarray(pesos, dtype=float)
+    return pesos / pesos.sum()
+
+def load_units(limites_path=LIMITES_PATH, barrios_path=BARRIOS_PATH):
+    """
+    Unidades espaciales de muestreo: lista de dicts con comuna, barrio,
+    geometría (shapely, preparada) y caja. Con GeoJSON de barrios cada
+    barrio es su propio polígono; si no, los barrios de una comuna comparten
+    el polígono de la comuna
+    """
+    import shapely
+    from shapely.geometry import shape
+
+    unidades = []
+    if os.path.exists(barrios_path):
+        from utils.geo_utils import load_barrios_geojson
+
+        for feature in load_barrios_geojson(barrios_path)['features']:
+            unidades.append({
+                'comuna': feature['properties']['comuna'],
+                'barrio': feature['properties']['barrio'],
+                'geometria': shape(feature['geometry'])
+            })
+    else:
+        with open(limites_path, 'r', encoding='utf-8') as f:
+            geojson = json.load(f)
+        for feature in geojson['features']:
+            comuna = int(feature['properties']['nombre'].split()[-1])
+            geometria = shape(feature['geometry'])
+            for barrio in BARRIOS_POR_COMUNA[comuna]:
+                unidades.append({'comuna': comuna, 'barrio': barrio, 'geometria': geometria})
+
+    for unidad in unidades:
+        shapely.prepare(unidad['geometria'])
+        unidad['caja'] = unidad['geometria'].bounds
+    return unidades
+
+def barrio_weights(unidades):
+    """
+    Probabilidad de cada unidad: Zipf sobre el ranking de barrios (primero
+    BARRIOS_PRINCIPALES, después el resto en orden alfabético)
+    """
+    nombres = sorted({u['barrio'] for u in unidades},
+                     key=lambda b: (BARRIOS_PRINCIPALES.index(b) if b in BARRIOS_PRINCIPALES
+                                    else len(BARRIOS_PRINCIPALES), b))
+    rango = {barrio: i + 1 for i, barrio in enumerate(nombres)}
+    return _probabilidades([rango[u['barrio']] ** -EXPONENTE_BARRIOS for u in unidades])
+
+def sample_in_polygon(rng, unidad, n):
+    """
+    n puntos uniformes dentro del polígono de la unidad (muestreo por rechazo
+    sobre su caja, vectorizado). Devuelve (latitud, longitud)
+    """
+    import shapely
+
+    lon_min, lat_min, lon_max, lat_max = unidad['caja']
+    latitudes, longitudes = [np.empty(0)], [np.empty(0)]
+    faltan = n
+    while faltan > 0:
+        # Se sortean más candidatos que los necesarios: parte cae fuera del polígono
+        m = max(2 * faltan, 64)
+        lon = rng.uniform(lon_min, lon_max, m)
+        lat = rng.uniform(lat_min, lat_max, m)
+        dentro = shapely.contains_xy(unidad['geometria'], lon, lat)
+        latitudes.append(lat[dentro][:faltan])
+        longitudes.append(lon[dentro][:faltan])
+        faltan -= len(latitudes[-1])
+    return np.concatenate(latitudes), np.concatenate(longitudes)
+
+def sample_points(rng, unidad, n):
+    """
+    n puntos dentro de la unidad: FRACCION_FOCOS alrededor de sus focos y el
+    resto uniformes. Los puntos de foco que caen fuera del polígono se
+    reemplazan por uniformes
+    """
+    import shapely
+
+    en_focos = rng.binomial(n, FRACCION_FOCOS)
+    focos = unidad['focos'][rng.integers(0, len(unidad['focos']), en_focos)]
+    lat = focos[:, 0] + rng.normal(0, DISPERSION_FOCO, en_focos)
+    lon = focos[:, 1] + rng.normal(0, DISPERSION_FOCO, en_focos)
+    dentro = shapely.contains_xy(unidad['geometria'], lon, lat)
+
+    lat_u, lon_u = sample_in_polygon(rng, unidad, n - int(dentro.sum()))
+    return np.concatenate([lat[dentro], lat_u]), np.concatenate([lon[dentro], lon_u])
+
+def calendar(anio):
+    """
+    Días del año como columnas de texto (fecha, dia, mes) y la probabilidad
+    de cada día según PESOS_DIA. Las filas se arman indexando estos arrays
+    en lugar de formatear una fecha por fila
+    """
+    dias = pd.date_range(f'{anio}-01-01', f'{anio}-12-31', freq='D')
+    return {
+        'fecha': np.asarray(dias.strftime('%Y-%m-%d'), dtype=object),
+        'dia': np.array(DIAS_ORDEN, dtype=object)[dias.dayofweek],
+        'mes': np.array(MESES_ORDEN, dtype=object)[dias.month - 1],
+        'probabilidad': _probabilidades(np.asarray(PESOS_DIA)[dias.dayofweek])
+    }
+
+def generate_block(rng, unidades, pesos_unidades, calendario, n):
+    """
+    Un bloque de n filas con el esquema del dataset
+    """
+    conteos = rng.multinomial(n, pesos_unidades)
+    latitud = np.empty(n)
+    longitud = np.empty(n)
+    indice_unidad = np.repeat(np.arange(len(unidades)), conteos)
+    inicio = 0
+    for unidad, cantidad in zip(unidades, conteos):
+        if cantidad:
+            lat, lon = sample_points(rng, unidad, int(cantidad))
+            latitud[inicio:inicio + cantidad] = lat
+            longitud[inicio:inicio + cantidad] = lon
+            inicio += cantidad
+
+    # Las filas quedan agrupadas por unidad: se mezclan
+    orden = rng.permutation(n)
+    indice_unidad, latitud, longitud = indice_unidad[orden], latitud[orden], longitud[orden]
+
+    dia = rng.choice(len(calendario['fecha']), n, p=calendario['probabilidad'])
+    tipos = np.array(list(TIPOS), dtype=object)
+    comunas = np.array([u['comuna'] for u in unidades])
+    barrios = np.array([u['barrio'] for u in unidades], dtype=object)
+    return pd.DataFrame({
+        'fecha': calendario['fecha'][dia],
+        'tipo': tipos[rng.choice(len(tipos), n, p=_probabilidades(list(TIPOS.values())))],
+        'barrio': barrios[indice_unidad],
+        'comuna': comunas[indice_unidad],
+        'dia': calendario['dia'][dia],
+        'mes': calendario['mes'][dia],
+        'franja': rng.choice(24, n, p=_probabilidades(PESOS_FRANJA)),
+        'latitud': latitud.round(6),
+        'longitud': longitud.round(6),
+        'cantidad': rng.choice(len(PESOS_CANTIDAD), n, p=_probabilidades(PESOS_CANTIDAD)) + 1
+    })
+
+def generate_dataset(salida, filas, semilla=42, anio=2024, bloque=BLOQUE, formato=None):
+    """
+    Escribe `filas` filas sintéticas en `salida` (CSV o Parquet según
+    `formato` o la extensión), de a `bloque` filas por vez
+    """
+    formato = formato or ('parquet' if salida.endswith('.parquet') else 'csv')
+    semillas = np.random.SeedSequence(semilla)
+
+    unidades = load_units()
+    pesos_unidades = barrio_weights(unidades)
+    calendario = calendar(anio)
+    # Los focos de cada barrio dependen sólo de la semilla
+    rng_focos = np.random.default_rng(semillas.spawn(1)[0])
+    for unidad in unidades:
+        lat, lon = sample_in_polygon(rng_focos, unidad, FOCOS_POR_BARRIO)
+        unidad['focos'] = np.column_stack([lat, lon])
+
+    escritor = None
+    archivo = open(salida, 'w', encoding='utf-8', newline='') if formato == 'csv' else None
+    inicio = time.perf_counter()
+    try:
+        escritas = 0
+        # Al menos un bloque: con filas=0 el archivo igual lleva el encabezado
+        # (o el esquema, en Parquet)
+        for semilla_bloque in semillas.spawn(max(1, (filas + bloque - 1) // bloque)):
+            n = min(bloque, filas - escritas)
+            df = generate_block(np.random.default_rng(semilla_bloque), unidades, pesos_unidades, calendario, n)
+            if formato == 'csv':
+                df.to_csv(archivo, header=escritas == 0, index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                tabla = pa.Table.from_pandas(df, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(salida, tabla.schema)
+                escritor.write_table(tabla)
+            escritas += n
+            print(f"\r{escritas:,} / {filas:,} filas ({time.perf_counter() - inicio:.0f} s)",
+                  end='', file=sys.stderr, flush=True)
+        print(file=sys.stderr)
+    finally:
+        if archivo is not None:
+            archivo.close()
+        if escritor is not None:
+            escritor.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset sintético de delitos CABA")
+    parser.add_argument('--filas', type=int, required=True, help="Cantidad de filas a generar")
+    parser.add_argument('--salida', default=DATA_PATH, help="Archivo .csv o .parquet")
+    parser.add_argument('--formato', choices=['csv', 'parquet'], help="Por defecto, según la extensión")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--anio', type=int, default=2024)
+    parser.add_argument('--bloque', type=int, default=BLOQUE, help="Filas generadas por vez (memoria)")
+    parser.add_argument('--forzar', action='store_true', help="Sobrescribir la salida si existe")
+    args = parser.parse_args()
+
+    if os.path.exists(args.salida) and not args.forzar:
+        parser.error(f"{args.salida} ya existe (usar --forzar para sobrescribirlo)")
+    generate_dataset(args.salida, args.filas, args.semilla, args.anio, args.bloque, args.formato)
+    print(f"Dataset sintético en {args.salida}")
+
+if __name__ == '__main__':
+    main()
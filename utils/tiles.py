@@ -0,0 +1,282 @@
+"""
+Vector tiles (MVT) de los delitos y de los límites de comunas.
+
+Genera un archivo .mbtiles con una capa 'delitos' (puntos) y una capa
+'comunas' (polígonos) por nivel de zoom, y lo sirve con un servidor HTTP
+mínimo. Los mapas de folium consumen las teselas con Leaflet.VectorGrid, así
+el navegador sólo descarga las teselas visibles sin importar el tamaño del
+dataset.
+
+Uso:
+    python -m utils.tiles build [--salida data/delitos.mbtiles]
+    python -m utils.tiles serve [--mbtiles data/delitos.mbtiles] [--puerto 8765]
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import sqlite3
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+MBTILES_PATH = 'data/delitos.mbtiles'
+PUERTO_TILES = 8765
+# URL que usan las páginas; se puede cambiar con la variable de entorno TILES_URL
+TILES_URL = os.environ.get('TILES_URL', f'http://localhost:{PUERTO_TILES}/tiles/{{z}}/{{x}}/{{y}}.pbf')
+
+ZOOM_MIN = 10
+ZOOM_MAX = 16
+# Desde este zoom se incluye cada delito; por debajo los puntos se agregan
+# por píxel de la tesela (raleo)
+ZOOM_DETALLE = 14
+PIXELES_RALEO = 256
+EXTENT = 4096
+
+RADIO_TIERRA = 6378137.0
+ORIGEN = math.pi * RADIO_TIERRA
+
+def lonlat_to_mercator(lon, lat):
+    """
+    Convierte lon/lat (arrays) a Web Mercator (metros)
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    x = RADIO_TIERRA * np.radians(lon)
+    y = RADIO_TIERRA * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+def tile_size(z):
+    """
+    Tamaño de una tesela en metros Mercator en el zoom z
+    """
+    return 2 * ORIGEN / (2 ** z)
+
+def tile_bounds(z, x, y):
+    """
+    Límites (minx, miny, maxx, maxy) en metros Mercator de la tesela z/x/y (esquema XYZ)
+    """
+    tamano = tile_size(z)
+    minx = -ORIGEN + x * tamano
+    maxy = ORIGEN - y * tamano
+    return minx, maxy - tamano, minx + tamano, maxy
+
+def point_tiles(mx, my, z, subdivisiones=1):
+    """
+    Índices globales de celda para cada punto: con subdivisiones=1 es la
+    tesela; con subdivisiones=256 es el píxel dentro del mundo a ese zoom
+    """
+    tamano = tile_size(z) / subdivisiones
+    gx = np.floor((mx + ORIGEN) / tamano).astype(np.int64)
+    gy = np.floor((ORIGEN - my) / tamano).astype(np.int64)
+    return gx, gy
+
+def prepare_points(df, z):
+    """
+    Puntos a incluir en el zoom z, con sus atributos y tesela. Por debajo de
+    ZOOM_DETALLE se agregan por píxel, tipo, zona y mes (posición promedio),
+    así los filtros de la página siguen aplicando sobre las teselas raleadas
+    """
+    mx, my = lonlat_to_mercator(df['longitud'].to_numpy(), df['latitud'].to_numpy())
+    puntos = df[['tipo', 'comuna', 'barrio', 'franja', 'cantidad']].assign(
+        mx=mx, my=my,
+        mes=(df['fecha'].dt.year * 100 + df['fecha'].dt.month).to_numpy(),
+        fecha=(df['fecha'].dt.year * 10000 + df['fecha'].dt.month * 100 + df['fecha'].dt.day).to_numpy()
+    )
+
+    if z < ZOOM_DETALLE:
+        px, py = point_tiles(mx, my, z, PIXELES_RALEO)
+        puntos = (
+            puntos.assign(px=px, py=py)
+            .groupby(['px', 'py', 'tipo', 'comuna', 'barrio', 'mes'], observed=True)
+            .agg(mx=('mx', 'mean'), my=('my', 'mean'), cantidad=('cantidad', 'sum'))
+            .reset_index()
+            .drop(columns=['px', 'py'])
+        )
+
+    tx, ty = point_tiles(puntos['mx'].to_numpy(), puntos['my'].to_numpy(), z)
+    return puntos.assign(tx=tx, ty=ty)
+
+def encode_tile(z, x, y, puntos, comunas):
+    """
+    Codifica una tesela MVT con las capas 'delitos' y 'comunas'.
+    `comunas` es una lista de (nombre, geometría shapely en Mercator)
+    """
+    import mapbox_vector_tile
+    from shapely.geometry import Point, box
+
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    # Margen para que los bordes de los polígonos no se corten en el límite
+    margen = (maxx - minx) * 0.02
+    recorte = box(minx - margen, miny - margen, maxx + margen, maxy + margen)
+
+    columnas_props = [c for c in ('tipo', 'comuna', 'barrio', 'franja', 'cantidad', 'mes', 'fecha')
+                      if c in puntos.columns]
+    features_delitos = []
+    for fila in puntos.itertuples(index=False):
+        features_delitos.append({
+            'geometry': Point(fila.mx, fila.my),
+            'properties': {c: (v.item() if hasattr(v, 'item') else v)
+                           for c, v in ((c, getattr(fila, c)) for c in columnas_props)}
+        })
+
+    features_comunas = []
+    for nombre, geometria in comunas:
+        if geometria.intersects(recorte):
+            features_comunas.append({
+                'geometry': geometria.intersection(recorte),
+                'properties': {'nombre': nombre}
+            })
+
+    capas = [
+        {'name': 'comunas', 'features': features_comunas},
+        {'name': 'delitos', 'features': features_delitos}
+    ]
+    return mapbox_vector_tile.encode(
+        capas,
+        default_options={'quantize_bounds': (minx, miny, maxx, maxy), 'extents': EXTENT}
+    )
+
+def load_comunas_mercator(geojson):
+    """
+    Geometrías de las comunas proyectadas a Web Mercator
+    """
+    from shapely.geometry import shape
+    from shapely.ops import transform
+
+    def proyectar(lon, lat, z=None):
+        return lonlat_to_mercator(lon, lat)
+
+    return [(f['properties']['nombre'], transform(proyectar, shape(f['geometry'])))
+            for f in geojson['features']]
+
+def build_mbtiles(df, geojson, salida=MBTILES_PATH, zoom_min=ZOOM_MIN, zoom_max=ZOOM_MAX):
+    """
+    Genera todas las teselas de los niveles de zoom pedidos y las guarda en un
+    archivo MBTiles (SQLite, teselas comprimidas con gzip, filas en esquema TMS)
+    """
+    comunas = load_comunas_mercator(geojson)
+    # Teselas que cubren los límites de CABA en cada zoom
+    minx, miny, maxx, maxy = np.array([g.bounds for _, g in comunas]).T
+    minx, miny, maxx, maxy = minx.min(), miny.min(), maxx.max(), maxy.max()
+
+    if os.path.exists(salida):
+        os.remove(salida)
+    conexion = sqlite3.connect(salida)
+    conexion.executescript("""
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+        CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+    """)
+    lat_min, lat_max = df['latitud'].min(), df['latitud'].max()
+    lon_min, lon_max = df['longitud'].min(), df['longitud'].max()
+    metadata = {
+        'name': 'delitos_caba',
+        'format': 'pbf',
+        'minzoom': str(zoom_min),
+        'maxzoom': str(zoom_max),
+        'bounds': f'{lon_min},{lat_min},{lon_max},{lat_max}',
+        'json': json.dumps({'vector_layers': [
+            {'id': 'delitos', 'fields': {'tipo': 'String', 'comuna': 'Number', 'barrio': 'String',
+                                         'franja': 'Number', 'cantidad': 'Number',
+                                         'mes': 'Number', 'fecha': 'Number'}},
+            {'id': 'comunas', 'fields': {'nombre': 'String'}}
+        ]})
+    }
+    conexion.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+
+    for z in range(zoom_min, zoom_max + 1):
+        puntos = prepare_points(df, z)
+        por_tesela = {clave: grupo for clave, grupo in puntos.groupby(['tx', 'ty'])}
+
+        (x0, x1), (y1, y0) = point_tiles(np.array([minx, maxx]), np.array([miny, maxy]), z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                grupo = por_tesela.get((x, y), puntos.iloc[0:0])
+                datos = encode_tile(z, x, y, grupo, comunas)
+                fila_tms = (2 ** z - 1) - y
+                conexion.execute(
+                    "INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                    (z, x, fila_tms, sqlite3.Binary(gzip.compress(datos)))
+                )
+        conexion.commit()
+    conexion.close()
+
+class TileHandler(BaseHTTPRequestHandler):
+    """
+    Sirve /tiles/{z}/{x}/{y}.pbf desde el archivo MBTiles
+    """
+    mbtiles = MBTILES_PATH
+
+    def do_GET(self):
+        partes = self.path.split('?')[0].strip('/').split('/')
+        if len(partes) != 4 or partes[0] != 'tiles' or not partes[3].endswith('.pbf'):
+            self.send_error(404)
+            return
+        try:
+            z, x, y = int(partes[1]), int(partes[2]), int(partes[3][:-4])
+        except ValueError:
+            self.send_error(400)
+            return
+
+        conexion = sqlite3.connect(f'file:{self.mbtiles}?mode=ro', uri=True)
+        try:
+            fila = conexion.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, (2 ** z - 1) - y)
+            ).fetchone()
+        finally:
+            conexion.close()
+
+        if fila is None:
+            self.send_response(204)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-protobuf')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(fila[0])))
+        self.send_header('Cache-Control', 'public, max-age=86400')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(fila[0])
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_tiles(mbtiles=MBTILES_PATH, puerto=PUERTO_TILES):
+    """
+    Levanta el servidor de teselas (bloqueante)
+    """
+    TileHandler.mbtiles = mbtiles
+    servidor = ThreadingHTTPServer(('0.0.0.0', puerto), TileHandler)
+    print(f"Sirviendo {mbtiles} en http://localhost:{puerto}/tiles/{{z}}/{{x}}/{{y}}.pbf")
+    servidor.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector tiles de delitos CABA")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    build = sub.add_parser('build', help="Genera el archivo MBTiles")
+    build.add_argument('--salida', default=MBTILES_PATH)
+    build.add_argument('--zoom-min', type=int, default=ZOOM_MIN)
+    build.add_argument('--zoom-max', type=int, default=ZOOM_MAX)
+    serve = sub.add_parser('serve', help="Sirve las teselas por HTTP")
+    serve.add_argument('--mbtiles', default=MBTILES_PATH)
+    serve.add_argument('--puerto', type=int, default=PUERTO_TILES)
+    args = parser.parse_args()
+
+    if args.comando == 'build':
+        from utils.data_loader import load_data
+
+        with open('data/caba.json', 'r', encoding='utf-8') as f:
+            geojson = json.load(f)
+        build_mbtiles(load_data(), geojson, args.salida, args.zoom_min, args.zoom_max)
+        print(f"Teselas generadas en {args.salida}")
+    else:
+        serve_tiles(args.mbtiles, args.puerto)
+
+if __name__ == '__main__':
+    main()
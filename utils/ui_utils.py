@@ -0,0 +1,176 @@
+import html
+import os
+
+import streamlit as st
+from utils.charts import build_temporal_figures, build_geographic_figures
+from utils.data_loader import dataset_version
+from utils.export import FORMATOS_EXPORTACION, export_to_path, remove_export
+from utils.geo_utils import STATIC_DIR, STATIC_URL
+from utils.jobs import await_job
+
+# Los archivos exportados se sirven como estáticos: Streamlit los envía desde
+# el disco por bloques, sin cargarlos en la memoria del servidor
+CARPETA_EXPORTACIONES = os.path.join(STATIC_DIR, 'exportaciones')
+URL_EXPORTACIONES = f"{STATIC_URL}/exportaciones"
+# Tamaño máximo que sirve server.enableStaticServing (200 MB)
+MAX_ARCHIVO_ESTATICO = 200 * 1024 * 1024
+
+def lazy_section(titulo, key, build, deps=()):
+    """
+    Sección diferida: los gráficos sólo se calculan y se envían al navegador
+    cuando el usuario abre la sección.
+
+    - build: función sin argumentos que devuelve una lista de (subtítulo, contenido),
+      donde el contenido es una figura de Plotly o un DataFrame
+    - deps: tupla con los filtros de los que dependen los gráficos. Mientras no
+      cambien, se reutilizan las figuras ya calculadas en la sesión.
+    """
+    abierta = st.checkbox(titulo, value=False, key=f"lazy_{key}")
+    if not abierta:
+        return
+
+    cache = st.session_state.setdefault('_lazy_sections', {})
+    entrada = cache.get(key)
+    if entrada is None or entrada[0] != deps:
+        entrada = (deps, build())
+        cache[key] = entrada
+
+    for subtitulo, contenido in entrada[1]:
+        st.subheader(subtitulo)
+        if hasattr(contenido, 'to_plotly_json'):
+            st.plotly_chart(contenido, use_container_width=True)
+        else:
+            st.dataframe(contenido)
+
+def render_kpis(df_filtered):
+    """
+    Muestra el resumen de métricas de las páginas de mapas
+    """
+    st.header("Resumen")
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("Total de delitos", df_filtered['cantidad'].sum())
+
+    with col2:
+        st.metric("Tipos de delitos", df_filtered['tipo'].nunique())
+
+    with col3:
+        st.metric("Barrios afectados", df_filtered['barrio'].nunique())
+
+    with col4:
+        st.metric("Comunas afectadas", df_filtered['comuna'].nunique())
+
+# Etiquetas del reporte de validación de la ingesta (utils/validation.py)
+MOTIVOS_DESCARTE = {
+    'fecha_invalida': "fecha inválida",
+    'coordenadas_invalidas': "coordenadas inválidas",
+    'fuera_de_caja': "fuera de la caja de CABA",
+    'fuera_de_ciudad': "fuera de los límites de la ciudad",
+    'comuna_fuera_de_rango': "comuna fuera de 1-15"
+}
+
+def render_validation_report(validacion):
+    """
+    Muestra el resumen de la validación hecha al cargar el dataset
+    """
+    if not validacion:
+        st.caption("Sin reporte de validación (metadata generada sin pasar por la ingesta del CSV).")
+        return
+
+    descartadas = sum(validacion['descartadas'].values())
+    lineas = [
+        f"- **Filas leídas:** {validacion['filas_leidas']:,}",
+        f"- **Filas válidas:** {validacion['filas_validas']:,}",
+        f"- **Filas descartadas:** {descartadas:,}"
+    ]
+    lineas += [
+        f"    - {MOTIVOS_DESCARTE.get(motivo, motivo)}: {cantidad:,}"
+        for motivo, cantidad in validacion['descartadas'].items() if cantidad
+    ]
+    for columna in ('dia', 'mes'):
+        lineas.append(
+            f"- **{columna.capitalize()}:** {validacion['normalizadas'][columna]:,} normalizados (tildes/mayúsculas), "
+            f"{validacion['corregidas'][columna]:,} corregidos según la fecha"
+        )
+    if not validacion['test_poligono']:
+        lineas.append("- Límites de la ciudad no disponibles: sólo se verificó la caja de CABA")
+    st.markdown("\n".join(lineas))
+
+# Los fragmentos se re-ejecutan solos cuando cambia un widget propio (abrir una
+# sección, mostrar datos crudos) sin volver a correr filtros ni mapa. Sus
+# argumentos son las entradas declaradas: sólo cambian en un rerun completo.
+@st.fragment
+def render_chart_sections(df_filtered, selected_tipo, filtros, prefijo, titulo_geo="Análisis Geográfico"):
+    """
+    Secciones diferidas de análisis temporal y geográfico de las páginas de mapas
+    """
+    st.header("Análisis Temporal")
+    lazy_section(
+        "Mostrar análisis temporal", f"{prefijo}_temporal",
+        lambda: build_temporal_figures(df_filtered, selected_tipo), filtros
+    )
+
+    st.header(titulo_geo)
+    lazy_section(
+        "Mostrar análisis geográfico", f"{prefijo}_geografico",
+        lambda: build_geographic_figures(df_filtered, selected_tipo), filtros
+    )
+
+@st.fragment
+def render_raw_data(df_filtered, filtros):
+    """
+    Tabla opcional con los datos crudos filtrados y su descarga
+    """
+    if st.checkbox("Mostrar datos crudos"):
+        st.subheader("Datos Crudos")
+        st.dataframe(df_filtered)
+
+    render_download(df_filtered, "delitos_filtrados", "crudos", filtros)
+
+@st.fragment
+def render_download(df, nombre_base, key, filtros, etiqueta="📥 Descargar datos filtrados"):
+    """
+    Descarga del DataFrame en CSV, CSV comprimido o Parquet. El archivo se
+    genera por bloques en segundo plano y sólo cuando el usuario lo pide; dos
+    sesiones que piden los mismos datos comparten el mismo archivo.
+
+    `filtros` es la tupla de parámetros de los que sale `df`: junto con la
+    versión del dataset identifica el contenido sin tener que recorrerlo
+    """
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        formato = st.selectbox("Formato", list(FORMATOS_EXPORTACION), key=f"{key}_formato")
+    with col2:
+        st.write("")
+        preparar = st.button("Preparar descarga", key=f"{key}_preparar")
+
+    pendiente = f"{key}_pendiente"
+    if not preparar and pendiente not in st.session_state:
+        return
+    # La clave identifica el contenido: si los filtros, los datos o el formato
+    # cambiaron, el archivo pedido antes ya no corresponde
+    clave = ('exportar', nombre_base, key, formato, filtros, dataset_version(), len(df))
+    if preparar:
+        st.session_state[pendiente] = clave
+    elif st.session_state[pendiente] != clave:
+        del st.session_state[pendiente]
+        return
+
+    ruta = await_job(
+        f"exportar_{key}", clave, export_to_path, df, formato, carpeta=CARPETA_EXPORTACIONES,
+        limpieza=remove_export, etiqueta="Generando archivo..."
+    )
+    if ruta is None:
+        return
+    if os.path.getsize(ruta) > MAX_ARCHIVO_ESTATICO:
+        st.warning("El archivo supera los 200 MB que se pueden descargar: elegí CSV comprimido o Parquet, o ajustá los filtros.")
+        return
+    # Enlace al archivo estático (no st.download_button, que lo leería entero
+    # para mandarlo por el websocket); `download` le da el nombre
+    extension, _ = FORMATOS_EXPORTACION[formato]
+    url = f"{URL_EXPORTACIONES}/{os.path.basename(ruta)}"
+    st.markdown(
+        f'<a href="{html.escape(url)}" download="{html.escape(nombre_base)}.{extension}">{html.escape(etiqueta)}</a>',
+        unsafe_allow_html=True
+    )
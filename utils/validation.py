@@ -0,0 +1,141 @@
+"""
+Validación y limpieza del dataset al cargarlo (una sola vez por ingesta).
+
+Todas las verificaciones son vectorizadas sobre columnas completas:
+- coordenadas numéricas, dentro de la caja de CABA y dentro del polígono de
+  la ciudad (unión de las comunas de data/caba.json)
+- comuna entre 1 y 15
+- fecha válida, y día y mes coherentes con la fecha (si no coinciden se
+  corrigen a partir de la fecha)
+- día y mes en mayúsculas y sin tildes ('MIÉRCOLES' -> 'MIERCOLES'), el
+  formato de charts.DIAS_ORDEN y charts.MESES_ORDEN
+
+Las filas que no pasan se descartan y se cuentan en un reporte que se guarda
+en la metadata del dataset. Las páginas no repiten estas verificaciones.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from utils.charts import DIAS_ORDEN, MESES_ORDEN
+from utils.geo_utils import normalize_nombre
+from utils.kde import BBOX_CABA
+
+# Límites de la ciudad para el test de punto en polígono
+LIMITES_PATH = 'data/caba.json'
+
+# Margen alrededor del polígono (grados, ~100 m) para no descartar puntos
+# geocodificados sobre la costa o justo en el borde
+TOLERANCIA_LIMITE = 0.001
+
+# Rango válido de comunas
+COMUNA_MIN, COMUNA_MAX = 1, 15
+
+def normalize_categories(serie):
+    """
+    Aplica normalize_nombre a una columna categórica. La normalización se
+    calcula una vez por valor distinto y se expande con los códigos, así el
+    costo no depende de la cantidad de filas
+    """
+    codigos, valores = pd.factorize(serie)
+    normalizados = np.array([normalize_nombre(v) for v in valores] + [None], dtype=object)
+    # Los nulos (código -1) toman el último elemento
+    return pd.Series(normalizados[codigos], index=serie.index, name=serie.name)
+
+def load_city_boundary(path=LIMITES_PATH):
+    """
+    Polígono de la ciudad (unión de las comunas) preparado para consultas
+    vectorizadas, o None si el GeoJSON no está disponible
+    """
+    if not os.path.exists(path):
+        return None
+
+    import shapely
+    from shapely.geometry import shape
+    from shapely.ops import unary_union
+
+    with open(path, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+    limite = unary_union([shape(feature['geometry']) for feature in geojson['features']])
+    limite = limite.buffer(TOLERANCIA_LIMITE)
+    shapely.prepare(limite)
+    return limite
+
+def points_in_city(latitud, longitud, limite=None):
+    """
+    Máscaras (dentro de la caja, dentro de la ciudad) para arrays de
+    coordenadas. El test de polígono sólo se evalúa sobre los puntos que
+    pasaron el de la caja; sin polígono, la ciudad es la caja
+    """
+    lat_min, lon_min, lat_max, lon_max = BBOX_CABA
+    en_caja = (latitud >= lat_min) & (latitud <= lat_max) & (longitud >= lon_min) & (longitud <= lon_max)
+    if limite is None:
+        return en_caja, en_caja
+
+    import shapely
+
+    en_ciudad = np.zeros(len(latitud), dtype=bool)
+    en_ciudad[en_caja] = shapely.contains_xy(limite, longitud[en_caja], latitud[en_caja])
+    return en_caja, en_ciudad
+
+def validate_dataset(df, limites_path=LIMITES_PATH):
+    """
+    Valida y normaliza el dataset crudo. Devuelve (DataFrame limpio, reporte).
+
+    Cada fila descartada se cuenta una sola vez, por el primer motivo que
+    aplica: fecha inválida, coordenadas inválidas, fuera de la caja de CABA,
+    fuera del polígono de la ciudad, comuna fuera de rango
+    """
+    filas_leidas = len(df)
+
+    df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
+    df['latitud'] = pd.to_numeric(df['latitud'], errors='coerce')
+    df['longitud'] = pd.to_numeric(df['longitud'], errors='coerce')
+    comuna = pd.to_numeric(df['comuna'], errors='coerce')
+
+    latitud = df['latitud'].to_numpy(dtype=float)
+    longitud = df['longitud'].to_numpy(dtype=float)
+    limite = load_city_boundary(limites_path)
+    en_caja, en_ciudad = points_in_city(latitud, longitud, limite)
+
+    motivos = {
+        'fecha_invalida': df['fecha'].isna().to_numpy(),
+        'coordenadas_invalidas': np.isnan(latitud) | np.isnan(longitud),
+        'fuera_de_caja': ~en_caja,
+        'fuera_de_ciudad': ~en_ciudad,
+        'comuna_fuera_de_rango': ~comuna.between(COMUNA_MIN, COMUNA_MAX).to_numpy()
+    }
+    descartar = np.zeros(filas_leidas, dtype=bool)
+    descartadas = {}
+    for motivo, mascara in motivos.items():
+        nuevas = mascara & ~descartar
+        descartadas[motivo] = int(nuevas.sum())
+        descartar |= nuevas
+
+    df = df[~descartar].assign(comuna=comuna[~descartar].astype(int))
+
+    # Día y mes: primero se normaliza el texto y después se contrasta con la fecha
+    normalizadas = {}
+    corregidas = {}
+    esperados = {
+        'dia': np.array(DIAS_ORDEN, dtype=object)[df['fecha'].dt.dayofweek.to_numpy()],
+        'mes': np.array(MESES_ORDEN, dtype=object)[df['fecha'].dt.month.to_numpy() - 1]
+    }
+    for columna, esperado in esperados.items():
+        original = df[columna]
+        normalizada = normalize_categories(original)
+        normalizadas[columna] = int((normalizada != original).sum())
+        distinta = normalizada.to_numpy() != esperado
+        corregidas[columna] = int(distinta.sum())
+        df[columna] = np.where(distinta, esperado, normalizada.to_numpy())
+
+    reporte = {
+        'filas_leidas': int(filas_leidas),
+        'filas_validas': int(len(df)),
+        'descartadas': descartadas,
+        'normalizadas': normalizadas,
+        'corregidas': corregidas,
+        'test_poligono': limite is not None
+    }
+    return df, reporte